@@ -17,6 +17,7 @@ from flask_cors import CORS
 import subprocess
 import threading
 import os
+import re
 import requests
 from datetime import datetime
 from dotenv import load_dotenv
@@ -87,40 +88,18 @@ def ejecutar_proceso_completo():
             print(f"[PROCESO] {linea}")
             
             # Detectar progreso según patrones en la salida
-            if "[1/7]" in linea or "celudmovil" in linea.lower():
-                proceso_estado["paso_actual"] = "Scraping: Celudmovil"
-                proceso_estado["progreso"] = 10
-                proceso_estado["mensaje"] = "Extrayendo productos de Celudmovil..."
-            
-            elif "[2/7]" in linea or ("tooho" in linea.lower() and "spider" in linea.lower()):
-                proceso_estado["paso_actual"] = "Scraping: Tooho"
-                proceso_estado["progreso"] = 20
-                proceso_estado["mensaje"] = "Extrayendo productos de Tooho..."
-            
-            elif "[3/7]" in linea or ("clevercel" in linea.lower() and "spider" in linea.lower()):
-                proceso_estado["paso_actual"] = "Scraping: Clevercel"
-                proceso_estado["progreso"] = 30
-                proceso_estado["mensaje"] = "Extrayendo productos de Clevercel..."
-            
-            elif "[4/7]" in linea or ("itech" in linea.lower() and "spider" in linea.lower()):
-                proceso_estado["paso_actual"] = "Scraping: iTech"
-                proceso_estado["progreso"] = 40
-                proceso_estado["mensaje"] = "Extrayendo productos de iTech..."
-            
-            elif "[5/7]" in linea or ("phoneelectric" in linea.lower() and "spider" in linea.lower()):
-                proceso_estado["paso_actual"] = "Scraping: PhoneElectric"
-                proceso_estado["progreso"] = 50
-                proceso_estado["mensaje"] = "Extrayendo productos de PhoneElectric..."
-            
-            elif "[6/7]" in linea or ("celetiene" in linea.lower() and "spider" in linea.lower()):
-                proceso_estado["paso_actual"] = "Scraping: Celetiene"
-                proceso_estado["progreso"] = 60
-                proceso_estado["mensaje"] = "Extrayendo productos de Celetiene..."
-            
-            elif "[7/7]" in linea or ("celucambio" in linea.lower() and "spider" in linea.lower()):
-                proceso_estado["paso_actual"] = "Scraping: Celucambio"
-                proceso_estado["progreso"] = 65
-                proceso_estado["mensaje"] = "Extrayendo productos de Celucambio..."
+            # Los spiders corren en paralelo: "[3/7] [OK] Spider itech finalizado: ..."
+            avance_spider = re.match(r'\[(\d+)/(\d+)\] \[\w+\] Spider (\w+) finalizado', linea)
+            if avance_spider:
+                terminados, total, spider = avance_spider.groups()
+                proceso_estado["paso_actual"] = f"Scraping: {terminados}/{total} tiendas"
+                proceso_estado["progreso"] = 5 + int(60 * int(terminados) / int(total))
+                proceso_estado["mensaje"] = f"Tienda {spider.capitalize()} finalizada ({terminados}/{total})"
+            
+            elif "ejecutando spider" in linea.lower():
+                proceso_estado["paso_actual"] = "Scraping en paralelo"
+                proceso_estado["progreso"] = max(proceso_estado["progreso"], 10)
+                proceso_estado["mensaje"] = "Extrayendo productos de todas las tiendas..."
             
             elif "scraping completado" in linea.lower() or "7/7 spiders exitosos" in linea.lower():
                 proceso_estado["paso_actual"] = "Scraping completado"
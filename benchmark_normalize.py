@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BENCHMARK DE NORMALIZACIÓN
+==========================
+
+Mide la velocidad del normalizador con un corpus fijo:
+
+- Snapshots reales: price_comparison/results_scrap/*_2025-07-11.json
+- Corpus sintético: variaciones deterministas (misma semilla, mismo corpus) de
+  los nombres reales, escalado a --sintetico nombres (100k a 1M)
+
+Para cada corpus se mide normalize_product (sin caché, el costo real de
+normalizar) y normalize_store_data (lectura + normalización + escritura), en
+productos por segundo. Además se reporta la latencia por etapa de
+normalize_fields (p50/p90/p99/máx en microsegundos) y el pico de memoria de
+normalize_store_data (tracemalloc, en una pasada aparte para no afectar los
+tiempos).
+
+Los resultados se guardan en price_comparison/benchmarks/benchmark_<fecha>.json.
+Si existe price_comparison/benchmarks/baseline.json, el script termina con
+código 1 cuando algún throughput cae más de --tolerancia % por debajo del
+baseline. La baseline depende de la máquina y no viene en el repositorio:
+generarla con --guardar-baseline. Sin baseline solo se avisa y el código es 0,
+salvo con --exigir-baseline (para usarlo como control en CI).
+
+Ejecutar con:
+    python benchmark_normalize.py
+    python benchmark_normalize.py --sintetico 1000000 --motor tokens
+    python benchmark_normalize.py --guardar-baseline
+    python benchmark_normalize.py --exigir-baseline
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from normalize_data import NORMALIZE_ENGINE, SCRAP_FOLDER, StageProfiler, create_normalizer, iter_json_records
+
+SNAPSHOTS = os.path.join(SCRAP_FOLDER, '*_2025-07-11.json')
+CARPETA_BENCHMARK = 'price_comparison/benchmarks'
+BASELINE_FILE = os.path.join(CARPETA_BENCHMARK, 'baseline.json')
+
+# Caída máxima de throughput (en %) respecto a la baseline antes de fallar
+TOLERANCIA = 10.0
+
+MOTORES = ['regex', 'tokens']
+
+# Variaciones que se aplican a los nombres reales para armar el corpus sintético
+PREFIJOS = ['', '', '', 'CELULAR ', 'EXH ', 'OTRAS MARCAS - ', 'NUEVO ']
+SUFIJOS = ['', '', ' - ', ' NEGRO', ' AZUL', ' DUAL SIM', ' 5G', ' ESIM', ' 8GB', ' USADO', ' OPEN BOX']
+
+
+def cargar_snapshots(patron=SNAPSHOTS):
+    """Productos de los snapshots fechados: {tienda: [productos]}"""
+    corpus = {}
+    for archivo in sorted(glob.glob(patron)):
+        tienda = os.path.basename(archivo).rsplit('_', 1)[0]
+        corpus[tienda] = list(iter_json_records(archivo))
+    return corpus
+
+
+def generar_sintetico(base, cantidad, semilla=0):
+    """Corpus sintético de `cantidad` productos a partir de los productos reales de `base`"""
+    rng = random.Random(semilla)
+    productos = []
+    for i in range(cantidad):
+        producto = base[rng.randrange(len(base))]
+        nombre = producto.get('name') or ''
+        # Un número de modelo distinto cada tanto: nombres únicos como en un catálogo grande
+        modelo = f' M{rng.randrange(cantidad)}' if rng.random() < 0.5 else ''
+        nombre = f"{rng.choice(PREFIJOS)}{nombre}{modelo}{rng.choice(SUFIJOS)}"
+        if rng.random() < 0.3:
+            nombre = nombre.lower()
+        productos.append({'name': nombre, 'brand': producto.get('brand', ''),
+                          'price': producto.get('price', '0'), 'url': f'https://ejemplo.com/p/{i}'})
+    return productos
+
+
+def escribir_jsonl(productos, ruta):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for producto in productos:
+            f.write(json.dumps(producto, ensure_ascii=False))
+            f.write('\n')
+
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+
+def medir_normalize_product(normalizer, productos, vueltas=3):
+    """Mejor throughput (productos/s de CPU) de normalize_product en `vueltas` pasadas"""
+    mejor = None
+    for _ in range(vueltas):
+        inicio = time.process_time()
+        for producto in productos:
+            normalizer.normalize_product(producto.get('name', ''), producto.get('brand', ''),
+                                         producto.get('price', '0'), 'benchmark', producto.get('url', ''))
+        duracion = time.process_time() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return len(productos) / mejor if mejor else 0.0
+
+
+def medir_normalize_store_data(normalizer, archivos, carpeta_salida, vueltas=3):
+    """Mejor throughput (productos/s de CPU) de normalize_store_data sobre todos los `archivos`"""
+    total = sum(1 for archivo in archivos for _ in iter_json_records(archivo))
+    mejor = None
+    for _ in range(vueltas):
+        inicio = time.process_time()
+        for archivo in archivos:
+            salida = os.path.join(carpeta_salida, os.path.basename(archivo) + '.normalized.json')
+            normalizer.normalize_store_data(archivo, salida)
+        duracion = time.process_time() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return total / mejor if mejor else 0.0
+
+
+def medir_etapas(normalizer, productos):
+    """Latencias por etapa de normalize_fields en microsegundos: {etapa: {p50, p90, p99, max, llamadas}}
+
+    Las etapas son las mismas del perfilado (profile_stages del motor), cronometradas con StageProfiler.
+    """
+    perfil = StageProfiler(keep_samples=True)
+    perfil.instrument(normalizer, normalizer.profile_stages)
+    try:
+        for producto in productos:
+            if producto.get('name'):
+                normalizer.normalize_fields(producto['name'], producto.get('brand', ''))
+    finally:
+        perfil.restore(normalizer, normalizer.profile_stages)
+
+    resumen = {}
+    # En el orden de profile_stages; las etapas que nunca se llamaron no aparecen
+    for etapa in normalizer.profile_stages:
+        valores = sorted(perfil.samples.get(etapa, []))
+        if not valores:
+            continue
+        resumen[etapa] = {
+            'llamadas': len(valores),
+            'p50_us': round(_percentil(valores, 50) * 1e6, 2),
+            'p90_us': round(_percentil(valores, 90) * 1e6, 2),
+            'p99_us': round(_percentil(valores, 99) * 1e6, 2),
+            'max_us': round((valores[-1] if valores else 0.0) * 1e6, 2)
+        }
+    return resumen
+
+
+def medir_memoria(normalizer, archivo, carpeta_salida):
+    """Pico de memoria (MB, tracemalloc) de normalize_store_data sobre un archivo"""
+    tracemalloc.start()
+    try:
+        normalizer.normalize_store_data(archivo, os.path.join(carpeta_salida, 'memoria.normalized.json'))
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / (1024 * 1024), 2)
+
+
+def ejecutar_benchmark(cantidad_sintetica=100000, motor=None, vueltas=3, semilla=0, patron=SNAPSHOTS):
+    """Corre el benchmark completo y devuelve los resultados (dict serializable a JSON)"""
+    motor = motor or NORMALIZE_ENGINE
+    snapshots = cargar_snapshots(patron)
+    if not snapshots:
+        raise FileNotFoundError(f"No hay snapshots que coincidan con {patron}")
+    reales = [producto for productos in snapshots.values() for producto in productos]
+    sintetico = generar_sintetico(reales, cantidad_sintetica, semilla)
+    print(f"📦 Corpus: {len(reales)} productos reales de {len(snapshots)} snapshots, "
+          f"{len(sintetico)} sintéticos (semilla {semilla})")
+
+    # Sin caché ni manifiesto: se mide el costo de normalizar, no el de reutilizar resultados
+    normalizer = create_normalizer(motor, cache_size=0, manifest_file=None, profile=False)
+    throughput = {}
+    with tempfile.TemporaryDirectory() as carpeta, \
+            open(os.devnull, 'w', encoding='utf-8') as devnull:
+        archivo_sintetico = os.path.join(carpeta, 'sintetico.jsonl')
+        escribir_jsonl(sintetico, archivo_sintetico)
+        archivos_reales = sorted(glob.glob(patron))
+
+        print("⏱️ Midiendo normalize_product...")
+        with contextlib.redirect_stdout(devnull):
+            throughput['normalize_product/snapshots'] = medir_normalize_product(normalizer, reales, vueltas)
+            throughput['normalize_product/sintetico'] = medir_normalize_product(normalizer, sintetico, vueltas)
+
+        print("⏱️ Midiendo normalize_store_data...")
+        with contextlib.redirect_stdout(devnull):
+            throughput['normalize_store_data/snapshots'] = medir_normalize_store_data(
+                normalizer, archivos_reales, carpeta, vueltas)
+            throughput['normalize_store_data/sintetico'] = medir_normalize_store_data(
+                normalizer, [archivo_sintetico], carpeta, vueltas)
+
+        print("⏱️ Midiendo latencia por etapa y memoria...")
+        with contextlib.redirect_stdout(devnull):
+            etapas = medir_etapas(normalizer, reales + sintetico)
+            memoria = medir_memoria(normalizer, archivo_sintetico, carpeta)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'motor': motor,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'corpus': {'snapshots': len(reales), 'sintetico': len(sintetico), 'semilla': semilla},
+        'throughput': {clave: round(valor, 1) for clave, valor in throughput.items()},
+        'etapas': etapas,
+        'memoria_pico_mb': memoria
+    }
+
+
+def comparar_con_baseline(resultados, baseline, tolerancia=TOLERANCIA):
+    """Regresiones de throughput frente a la baseline: lista de (métrica, baseline, actual, caída %)"""
+    regresiones = []
+    for clave, referencia in baseline.get('throughput', {}).items():
+        actual = resultados['throughput'].get(clave)
+        if actual is None or not referencia:
+            continue
+        caida = (referencia - actual) / referencia * 100
+        if caida > tolerancia:
+            regresiones.append((clave, referencia, actual, caida))
+    return regresiones
+
+
+def mostrar_resultados(resultados):
+    print("-" * 64)
+    for clave, valor in resultados['throughput'].items():
+        print(f"{clave:<36} {valor:>14,.0f} productos/s")
+    print("-" * 64)
+    print(f"{'Etapa':<32} {'p50':>7} {'p90':>7} {'p99':>8} {'máx':>8}  (µs)")
+    for etapa, medida in resultados['etapas'].items():
+        print(f"{etapa:<32} {medida['p50_us']:>7.1f} {medida['p90_us']:>7.1f} "
+              f"{medida['p99_us']:>8.1f} {medida['max_us']:>8.1f}")
+    print("-" * 64)
+    print(f"💾 Pico de memoria de normalize_store_data: {resultados['memoria_pico_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de normalización con corpus fijo")
+    parser.add_argument("--sintetico", type=int, default=100000, help="Productos del corpus sintético")
+    parser.add_argument("--motor", choices=MOTORES, default=NORMALIZE_ENGINE, help="Motor de normalización")
+    parser.add_argument("--vueltas", type=int, default=3, help="Pasadas por medición (se toma la mejor)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del corpus sintético")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="Caída máxima de throughput (%%) frente a la baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Archivo de baseline")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guardar estos resultados como baseline")
+    parser.add_argument("--exigir-baseline", action="store_true",
+                        help="Fallar si no hay baseline (sin este flag, sin baseline solo se avisa)")
+    args = parser.parse_args()
+
+    resultados = ejecutar_benchmark(args.sintetico, args.motor, args.vueltas, args.semilla)
+    mostrar_resultados(resultados)
+
+    os.makedirs(CARPETA_BENCHMARK, exist_ok=True)
+    salida = os.path.join(CARPETA_BENCHMARK, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"📁 Resultados guardados en {salida}")
+
+    if args.guardar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"[OK] Baseline guardada en {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        if args.exigir_baseline:
+            print(f"[ERROR] No hay baseline en {args.baseline}: generarla con --guardar-baseline")
+            sys.exit(1)
+        print(f"[ADVERTENCIA] No hay baseline en {args.baseline}: generarla con --guardar-baseline "
+              f"(sin baseline no se compara el throughput)")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('motor') != resultados['motor'] or baseline.get('corpus') != resultados['corpus']:
+        print(f"[ADVERTENCIA] La baseline es de otro motor o corpus ({baseline.get('motor')}, "
+              f"{baseline.get('corpus')}): la comparación no es directa")
+
+    regresiones = comparar_con_baseline(resultados, baseline, args.tolerancia)
+    for clave, referencia, actual, caida in regresiones:
+        print(f"❌ {clave}: {actual:,.0f} productos/s vs {referencia:,.0f} de la baseline (-{caida:.1f}%)")
+    if regresiones:
+        print(f"[ERROR] {len(regresiones)} métricas más de {args.tolerancia}% por debajo de la baseline")
+        sys.exit(1)
+    print(f"[OK] Throughput dentro del {args.tolerancia}% de la baseline")
+
+
+if __name__ == "__main__":
+    main()
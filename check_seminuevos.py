@@ -13,6 +13,7 @@ import json
 import os
 import re
 from colorama import init, Fore, Style
+from normalize_data import iter_json_records, scrap_file
 
 # Inicializar colorama para colores en terminal
 init()
@@ -46,11 +47,11 @@ def detect_seminuevo_patterns(text):
 
 def analyze_store(store_name):
     """Analiza los archivos originales y normalizados de una tienda"""
-    original_file = f"price_comparison/results_scrap/{store_name}.json"
+    original_file = scrap_file(store_name)
     normalized_file = f"price_comparison/results_normalized/{store_name}_normalized.json"
     
     # Cargar datos
-    original_data = load_json_file(original_file)
+    original_data = list(iter_json_records(original_file)) if os.path.exists(original_file) else []
     normalized_data = load_json_file(normalized_file)
     
     # Contar productos originales con patrones de seminuevo
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+COMPARACIÓN DE PRECIOS ENTRE TIENDAS
+====================================
+
+Reemplaza los nodos "organiza el json" y "Code" del workflow de n8n
+(AutomatizacionWebscrapping.json): carga todos los results_normalized/*_normalized.json
+y arma la matriz producto × tienda con el precio de cada tienda.
+
+Los productos se cruzan por una clave canónica (marca, modelo, condición, tipo
+de SIM, almacenamiento) tomada de los campos que ya calculó la normalización,
+sin volver a parsear los nombres. Antes, product_matching reemplaza cada
+normalized_name por el nombre canónico de su producto, así las variantes de
+nombre entre tiendas caen en la misma fila (--sin-emparejar lo desactiva). El
+cruce es un diccionario por clave. Si un producto se repite en una tienda se
+toma su precio mínimo.
+
+Orden de la matriz (claves numéricas, no por texto): marca, modelo, tipo de
+SIM (sin SIM, física, virtual), almacenamiento en GB y condición.
+
+Ejecutar con:
+    python compare_prices.py
+    python compare_prices.py --salida price_comparison/results_comparison
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+
+from normalize_data import iter_json_records
+from price_delta import parse_price
+from product_matching import ARCHIVO_IDS, ProductMatcher
+
+CARPETA_NORMALIZED = 'price_comparison/results_normalized'
+CARPETA_COMPARACION = 'price_comparison/results_comparison'
+
+CLAVE = ['brand', 'model', 'condition', 'sim_type', 'storage_capacity']
+
+# Campos que se leen de cada producto normalizado
+CAMPOS = ['normalized_name', 'brand', 'condition', 'sim_type', 'storage_capacity', 'price']
+
+# Orden de los tipos de SIM (los desconocidos van al final)
+SIM_ORDEN = {'': 0, 'SIM FISICA': 1, 'SIM VIRTUAL': 2}
+SIM_DESCONOCIDA = 3
+
+# Orden de las condiciones dentro del mismo producto
+CONDICION_ORDEN = {'NUEVO': 0, 'SEMINUEVO': 1}
+
+
+def archivos_normalizados(carpeta=CARPETA_NORMALIZED):
+    """{TIENDA: archivo} de los normalizados actuales (sin los snapshots fechados)"""
+    archivos = {}
+    for archivo in sorted(glob.glob(os.path.join(carpeta, '*_normalized.json'))):
+        tienda = os.path.basename(archivo)[:-len('_normalized.json')].upper()
+        archivos[tienda] = archivo
+    return archivos
+
+
+def almacenamiento_gb(capacidad):
+    """'256GB' → 256, '1TB' → 1024, '' → 0"""
+    capacidad = (capacidad or '').upper()
+    digitos = ''.join(c for c in capacidad if c.isdigit())
+    if not digitos:
+        return 0
+    return int(digitos) * (1024 if capacidad.endswith('TB') else 1)
+
+
+def modelo(nombre, marca, sim_type, condicion, capacidad):
+    """normalized_name sin la marca inicial ni el sufijo 'SIM CONDICIÓN CAPACIDAD' que agrega normalize_fields"""
+    if marca and nombre.startswith(marca + ' '):
+        nombre = nombre[len(marca) + 1:]
+    sufijo = ' '.join(parte for parte in (sim_type, condicion, capacidad) if parte)
+    if sufijo and nombre.endswith(' ' + sufijo):
+        nombre = nombre[:-len(sufijo) - 1]
+    elif sufijo == nombre:
+        nombre = ''
+    return nombre
+
+
+def _cargar_registros(archivo):
+    """Registros de un normalizado: json.load (array JSON) o, si no es un array, lectura incremental"""
+    try:
+        with open(archivo, 'r', encoding='utf-8') as f:
+            registros = json.load(f)
+        if isinstance(registros, list):
+            return registros
+    except ValueError:
+        pass
+    return list(iter_json_records(archivo))
+
+
+def _parsear_precios(valores):
+    """Precios numéricos de una secuencia de textos (cada texto distinto se parsea una vez)"""
+    precios = {}
+    for valor in valores:
+        if valor not in precios:
+            precios[valor] = parse_price(valor)
+    return [precios[valor] for valor in valores]
+
+
+def cargar_filas(archivos):
+    """Filas (tienda, producto, marca, condición, sim, capacidad, precio) de todos los normalizados"""
+    filas = []
+    for tienda, archivo in archivos.items():
+        registros = _cargar_registros(archivo)
+        precios = _parsear_precios([producto.get('price') for producto in registros])
+        for producto, precio in zip(registros, precios):
+            nombre = producto.get('normalized_name')
+            if not nombre or precio is None:
+                continue
+            filas.append((tienda, nombre, producto.get('brand') or '', producto.get('condition') or '',
+                          producto.get('sim_type') or '', producto.get('storage_capacity') or '', precio))
+    return filas
+
+
+def canonizar(filas, ids_file=ARCHIVO_IDS, por_tienda=None, use_lsh=None):
+    """Nombre canónico de cada normalized_name e id de cada nombre canónico (ver product_matching)
+
+    filas: tuplas (tienda, nombre, marca, condición, sim, capacidad, ...) como las de cargar_filas.
+    Sin por_tienda ({tienda: productos}) se cuenta de las filas.
+    """
+    contar = por_tienda is None
+    por_tienda = {} if contar else por_tienda
+    unicas = {}
+    for fila in filas:
+        if contar:
+            por_tienda[fila[0]] = por_tienda.get(fila[0], 0) + 1
+        if fila[1] not in unicas:
+            unicas[fila[1]] = fila[1:6]
+
+    matcher = ProductMatcher(ids_file)
+    # El modelo solo hace falta para los nombres que todavía no tienen id
+    productos = [fila + (None if fila[0] in matcher.names else modelo(fila[0], fila[1], fila[3], fila[2], fila[4]),)
+                 for fila in unicas.values()]
+    ids = matcher.resolve(productos, por_tienda, use_lsh)
+    matcher.save()
+    nombres = {nombre: matcher.canonical_name(product_id) for nombre, product_id in ids.items()}
+    return nombres, {matcher.canonical_name(product_id): product_id for product_id in set(ids.values())}
+
+
+def _orden(marca, modelo_, condicion, sim_type, capacidad):
+    return (marca, modelo_, SIM_ORDEN.get(sim_type, SIM_DESCONOCIDA), almacenamiento_gb(capacidad),
+            CONDICION_ORDEN.get(condicion, len(CONDICION_ORDEN)))
+
+
+def _matriz_python(filas, tiendas, ids=None):
+    grupos = {}
+    modelos = {}
+    for tienda, nombre, marca, condicion, sim_type, capacidad, precio in filas:
+        campos = (nombre, marca, sim_type, condicion, capacidad)
+        if campos not in modelos:
+            modelos[campos] = modelo(*campos)
+        clave = (marca, modelos[campos], condicion, sim_type, capacidad)
+        grupo = grupos.get(clave)
+        if grupo is None:
+            grupo = grupos[clave] = {'product': nombre}
+        if precio < grupo.get(tienda, float('inf')):
+            grupo[tienda] = precio
+
+    matriz = []
+    for clave in sorted(grupos, key=lambda clave: _orden(*clave)):
+        marca, modelo_, condicion, sim_type, capacidad = clave
+        grupo = grupos[clave]
+        fila = {'product': grupo['product']}
+        if ids is not None:
+            fila['product_id'] = ids.get(grupo['product'])
+        fila.update({'brand': marca, 'model': modelo_, 'condition': condicion,
+                     'sim_type': sim_type, 'storage_capacity': capacidad})
+        precios = {tienda: grupo[tienda] for tienda in tiendas if tienda in grupo}
+        for tienda in tiendas:
+            fila[tienda] = precios.get(tienda)
+        mejor_tienda = min(precios, key=precios.get)
+        fila.update({'sim_orden': SIM_ORDEN.get(sim_type, SIM_DESCONOCIDA),
+                     'almacenamiento_gb': almacenamiento_gb(capacidad),
+                     'mejor_precio': precios[mejor_tienda], 'mejor_tienda': mejor_tienda, 'tiendas': len(precios)})
+        matriz.append(fila)
+    return matriz
+
+
+def matriz_precios(archivos, emparejar=True, ids_file=ARCHIVO_IDS):
+    """Matriz producto × tienda: una fila por clave canónica con el precio mínimo de cada tienda
+
+    Devuelve una lista de dicts (celdas vacías = None). Con emparejar, los nombres que
+    product_matching considera el mismo producto se cruzan con su nombre canónico y la
+    matriz lleva la columna product_id.
+    """
+    tiendas = list(archivos)
+    ids = None
+    filas = cargar_filas(archivos)
+    if emparejar and filas:
+        nombres, ids = canonizar(filas, ids_file)
+        filas = [(fila[0], nombres[fila[1]]) + fila[2:] for fila in filas]
+    return (_matriz_python(filas, tiendas, ids) if filas else []), len(filas)
+
+
+def guardar_matriz(matriz, tiendas, carpeta=CARPETA_COMPARACION):
+    """Guarda la matriz como JSON y CSV; devuelve las dos rutas"""
+    os.makedirs(carpeta, exist_ok=True)
+    ruta_json = os.path.join(carpeta, 'comparacion_precios.json')
+    ruta_csv = os.path.join(carpeta, 'comparacion_precios.csv')
+    with open(ruta_json, 'w', encoding='utf-8') as f:
+        json.dump(matriz, f, ensure_ascii=False, indent=2)
+    columnas = ['product'] + CLAVE + list(tiendas) + ['mejor_precio', 'mejor_tienda', 'tiendas']
+    if matriz and 'product_id' in matriz[0]:
+        columnas.insert(1, 'product_id')
+    with open(ruta_csv, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columnas, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(matriz)
+    return ruta_json, ruta_csv
+
+
+def comparar_tiendas(carpeta=CARPETA_NORMALIZED, carpeta_salida=CARPETA_COMPARACION, emparejar=True):
+    """Carga los normalizados, arma la matriz y la guarda; devuelve la matriz"""
+    archivos = archivos_normalizados(carpeta)
+    if not archivos:
+        print(f"⚠️ No se encontraron archivos normalizados en {carpeta}")
+        return []
+
+    inicio = time.perf_counter()
+    matriz, precios = matriz_precios(archivos, emparejar)
+    duracion = time.perf_counter() - inicio
+
+    ruta_json, ruta_csv = guardar_matriz(matriz, list(archivos), carpeta_salida)
+    en_varias = sum(1 for fila in matriz if fila['tiendas'] > 1)
+    print(f"🔀 {precios} precios de {len(archivos)} tiendas → {len(matriz)} productos "
+          f"({en_varias} en más de una tienda)")
+    print(f"⏱️ Carga y cruce en {duracion * 1000:.0f} ms")
+    print(f"📁 Comparación guardada en {ruta_json} y {ruta_csv}")
+    return matriz
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matriz de precios producto × tienda")
+    parser.add_argument("--entrada", default=CARPETA_NORMALIZED, help="Carpeta con los *_normalized.json")
+    parser.add_argument("--salida", default=CARPETA_COMPARACION, help="Carpeta de salida")
+    parser.add_argument("--sin-emparejar", action="store_true",
+                        help="Cruzar solo por clave exacta, sin unir nombres parecidos")
+    args = parser.parse_args()
+    comparar_tiendas(args.entrada, args.salida, not args.sin_emparejar)
+
+
+if __name__ == "__main__":
+    main()
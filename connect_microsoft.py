@@ -1,8 +1,15 @@
 import requests
+from requests.adapters import HTTPAdapter
 import msal
 import os
+import json
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -16,36 +23,371 @@ CLIENTE_SECRETO = os.getenv('CLIENTE_SECRETO')
 TENANT_ID = os.getenv('TENANT_ID')
 SITE_NAME = os.getenv('SITE_NAME')
 
-def obtener_token():
-    """Obtiene el token de acceso usando MSAL"""
-    app = msal.ConfidentialClientApplication(
-        client_id=CLIENTE_ID,
-        client_credential=CLIENTE_SECRETO,
-        authority=f"https://login.microsoftonline.com/{TENANT_ID}"
-    )
-    
-    scopes = ['https://graph.microsoft.com/.default']
-    result = app.acquire_token_for_client(scopes=scopes)
-    
-    if "access_token" in result:
-        return result["access_token"]
-    else:
-        raise Exception("Error al obtener el token de acceso")
+# Caché en disco de los ids de sitio y drive (cambian muy rara vez)
+CACHE_IDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_comparison", "sharepoint_ids.json")
+IDS_TTL = 24 * 3600  # segundos
 
-def crear_carpeta_sharepoint(headers, drive_id, ruta_carpeta):
-    """Crea una carpeta en SharePoint si no existe"""
-    try:
-        # Verificar si la carpeta existe
-        check_response = requests.get(
-            f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{ruta_carpeta}",
-            headers=headers
-        )
-        
+# El token se renueva este margen antes de vencer
+MARGEN_TOKEN = 300  # segundos
+
+# GRAPH_URL permite apuntar a un servidor local que imite Graph (pruebas de latencia)
+GRAPH_URL = os.getenv('GRAPH_URL', "https://graph.microsoft.com/v1.0").rstrip('/')
+SHAREPOINT_HOST = "micelu.sharepoint.com"
+
+# Archivos subiendo a la vez
+SUBIDAS_SIMULTANEAS = int(os.getenv('SHAREPOINT_SUBIDAS', '4'))
+
+# Archivos más grandes que esto se suben por sesión de carga en fragmentos
+LIMITE_SUBIDA_SIMPLE = 4 * 1024 * 1024
+# Graph exige fragmentos múltiplos de 320 KiB
+TAMANO_FRAGMENTO = 10 * 320 * 1024
+REINTENTOS_FRAGMENTO = 5
+# Sesiones nuevas que se abren para un mismo archivo cuando la anterior vence (404)
+SESIONES_POR_ARCHIVO = 3
+
+# Limitación de Graph (429/503): reintentos que se permiten en toda la ejecución y por petición
+REINTENTOS_POR_EJECUCION = int(os.getenv('SHAREPOINT_REINTENTOS', '50'))
+REINTENTOS_PETICION = 8
+# Espera sin Retry-After: ESPERA_BASE * 2^intento, hasta ESPERA_MAXIMA (Retry-After se respeta completo)
+ESPERA_BASE = 1.0  # segundos
+ESPERA_MAXIMA = 60.0  # segundos
+CODIGOS_LIMITACION = (429, 503)
+
+# Sesiones de carga abiertas: si el proceso se corta, la próxima subida del mismo archivo continúa
+SESIONES_CARGA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_comparison", "upload_sessions.json")
+
+# Manifiesto de subidas: hash del contenido y eTag/cTag remotos de lo último que se subió a cada destino
+MANIFEST_SUBIDAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_comparison", "upload_manifest.json")
+
+class UploadManifest:
+    """Manifiesto JSON de la última subida de cada destino de SharePoint
+
+    Guarda el SHA-256 del archivo subido y el eTag/cTag que devolvió Graph. Si
+    el archivo local tiene el mismo hash, volver a subirlo dejaría el mismo
+    contenido y se puede omitir.
+    """
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.entries = self._load()
+        self.updated = {}
+        self._lock = threading.Lock()
+        # (ruta, tamaño, mtime) → hash: cada archivo se lee una sola vez por ejecución
+        self._hashes = {}
+
+    def file_hash(self, ruta_archivo_local):
+        stat = os.stat(ruta_archivo_local)
+        key = (os.path.abspath(ruta_archivo_local), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            digest = hashlib.sha256()
+            with open(ruta_archivo_local, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            self._hashes[key] = digest.hexdigest()
+        return self._hashes[key]
+
+    def unchanged(self, ruta_archivo_local, ruta_destino_sharepoint):
+        """Entrada del manifiesto si el destino ya tiene este mismo contenido, o None si hay que subir"""
+        entry = self.entries.get(ruta_destino_sharepoint)
+        if entry is None or not os.path.exists(ruta_archivo_local):
+            return None
+        if os.path.getsize(ruta_archivo_local) != entry['size']:
+            return None
+        if self.file_hash(ruta_archivo_local) != entry['sha256']:
+            return None
+        return entry
+
+    def record(self, ruta_archivo_local, ruta_destino_sharepoint, item):
+        """Registra una subida completa con el driveItem que devolvió Graph"""
+        entry = {
+            'sha256': self.file_hash(ruta_archivo_local),
+            'size': os.path.getsize(ruta_archivo_local),
+            'id': item.get('id'),
+            'eTag': item.get('eTag'),
+            'cTag': item.get('cTag'),
+            'subido': datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            self.updated[ruta_destino_sharepoint] = self.entries[ruta_destino_sharepoint] = entry
+
+    def forget(self, ruta_destino_sharepoint):
+        with self._lock:
+            self.entries.pop(ruta_destino_sharepoint, None)
+            self.updated[ruta_destino_sharepoint] = None
+
+    def save(self):
+        """Escritura atómica; conserva las entradas que otros procesos guardaron"""
+        with self._lock:
+            if not self.manifest_file or not self.updated:
+                return
+            merged = self._load()
+            for key, entry in self.updated.items():
+                if entry is None:
+                    merged.pop(key, None)
+                else:
+                    merged[key] = entry
+            os.makedirs(os.path.dirname(self.manifest_file) or '.', exist_ok=True)
+            tmp_file = f'{self.manifest_file}.{os.getpid()}.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.manifest_file)
+            self.entries = merged
+            self.updated = {}
+
+    def _load(self):
+        if not self.manifest_file or not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+class UploadThrottle:
+    """Control de concurrencia AIMD para las peticiones a Graph
+
+    Cada petición ocupa un cupo. Con una respuesta 429/503 el cupo se reduce a la
+    mitad y todas las peticiones esperan lo que pidió Retry-After; cada `limit`
+    respuestas buenas seguidas el cupo sube en uno, hasta `max_limit`. Los
+    reintentos salen de un presupuesto compartido por toda la ejecución.
+    """
+
+    def __init__(self, max_limit, retry_budget=REINTENTOS_POR_EJECUCION):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.retry_budget = retry_budget
+        self.retries = 0
+        self.throttled_count = 0
+        self.min_limit_seen = self.limit
+        self._active = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                espera = self._paused_until - time.monotonic()
+                if espera <= 0 and self._active < self.limit:
+                    self._active += 1
+                    return
+                self._cond.wait(espera if espera > 0 else None)
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def throttled(self, espera):
+        """Registra una respuesta 429/503; devuelve False si ya no quedan reintentos"""
+        with self._cond:
+            self.throttled_count += 1
+            ahora = time.monotonic()
+            # Varias respuestas de la misma ráfaga reducen el cupo una sola vez
+            if ahora >= self._paused_until:
+                self.limit = max(1, self.limit // 2)
+                self.min_limit_seen = min(self.min_limit_seen, self.limit)
+            self._successes = 0
+            self._paused_until = max(self._paused_until, ahora + espera)
+            if self.retries >= self.retry_budget:
+                return False
+            self.retries += 1
+            return True
+
+    def resize(self, max_limit):
+        """Cambia el techo de concurrencia; si la ejecución ya fue limitada no sube el cupo de golpe"""
+        with self._cond:
+            self.max_limit = max(1, max_limit)
+            self.limit = min(self.limit, self.max_limit) if self.throttled_count else self.max_limit
+            self._cond.notify_all()
+
+    def summary(self):
+        return (f"{self.throttled_count} respuestas limitadas, {self.retries}/{self.retry_budget} reintentos, "
+                f"concurrencia mínima {self.min_limit_seen} y actual {self.limit} de {self.max_limit}")
+
+def espera_reintento(response, intento):
+    """Segundos a esperar antes de reintentar: Retry-After tal como lo pide Graph (segundos o fecha HTTP),
+    o backoff exponencial hasta ESPERA_MAXIMA si no viene"""
+    valor = response.headers.get("Retry-After")
+    if valor:
+        try:
+            return max(float(valor), 0.0)
+        except ValueError:
+            try:
+                fecha = parsedate_to_datetime(valor)
+                return max((fecha - datetime.now(timezone.utc)).total_seconds(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    return min(ESPERA_BASE * 2 ** intento, ESPERA_MAXIMA)
+
+class SharePointClient:
+    """Cliente de Microsoft Graph para SharePoint: un token, un sitio/drive y una sesión HTTP para todas las subidas"""
+
+    def __init__(self, site_name=None, cache_file=CACHE_IDS, ids_ttl=IDS_TTL, pool_size=10,
+                 base_url=None, access_token=None, sessions_file=SESIONES_CARGA,
+                 simple_limit=LIMITE_SUBIDA_SIMPLE, chunk_size=TAMANO_FRAGMENTO, manifest_file=MANIFEST_SUBIDAS,
+                 retry_budget=REINTENTOS_POR_EJECUCION):
+        self.site_name = site_name or SITE_NAME
+        self.cache_file = cache_file
+        self.ids_ttl = ids_ttl
+        self.sessions_file = sessions_file
+        self.simple_limit = simple_limit
+        self.chunk_size = chunk_size
+        self.manifest = UploadManifest(manifest_file)
+        self.throttle = UploadThrottle(min(pool_size, SUBIDAS_SIMULTANEAS), retry_budget)
+        self.base_url = (base_url or GRAPH_URL).rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._app = None
+        self._token = None
+        self._token_expira = 0
+        self._site_id = None
+        self._drive_id = None
+        self._carpetas = set()
+        # Varias subidas en paralelo comparten el cliente: token, ids y carpetas se resuelven una sola vez
+        self._lock = threading.RLock()
+        if access_token:
+            # Token fijo (servidor de pruebas): no se usa MSAL
+            self._token, self._token_expira = access_token, float('inf')
+
+    def token(self, forzar=False):
+        """Token de acceso; se pide uno nuevo solo si no hay o está por vencer"""
+        if not forzar and self._token and time.time() < self._token_expira - MARGEN_TOKEN:
+            return self._token
+        with self._lock:
+            return self._renovar_token(forzar)
+
+    def _renovar_token(self, forzar):
+        # Otro hilo pudo renovarlo mientras se esperaba el lock
+        if not forzar and self._token and time.time() < self._token_expira - MARGEN_TOKEN:
+            return self._token
+        if self._token_expira == float('inf'):
+            return self._token
+        if self._app is None:
+            self._app = msal.ConfidentialClientApplication(
+                client_id=CLIENTE_ID,
+                client_credential=CLIENTE_SECRETO,
+                authority=f"https://login.microsoftonline.com/{TENANT_ID}"
+            )
+        result = self._app.acquire_token_for_client(scopes=['https://graph.microsoft.com/.default'])
+        if "access_token" not in result:
+            raise Exception("Error al obtener el token de acceso")
+        self._token = result["access_token"]
+        self._token_expira = time.time() + int(result.get("expires_in", 3600))
+        print("🔑 Token obtenido exitosamente")
+        return self._token
+
+    def request(self, method, url, **kwargs):
+        """Petición autenticada por la sesión compartida; con 401 renueva el token y reintenta una vez"""
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Authorization"] = f"Bearer {self.token()}"
+        response = self.send(method, url, headers=headers, **kwargs)
+        if response.status_code == 401:
+            headers["Authorization"] = f"Bearer {self.token(forzar=True)}"
+            response = self.send(method, url, headers=headers, **kwargs)
+        return response
+
+    def send(self, method, url, **kwargs):
+        """Petición dentro del cupo de concurrencia; con 429/503 espera Retry-After y reintenta mientras haya presupuesto
+
+        Si se agotan los reintentos devuelve la última respuesta limitada y el
+        llamador decide (raise_for_status).
+        """
+        for intento in range(REINTENTOS_PETICION + 1):
+            self.throttle.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            finally:
+                self.throttle.release()
+            if response.status_code not in CODIGOS_LIMITACION:
+                self.throttle.success()
+                return response
+            espera = espera_reintento(response, intento)
+            if intento == REINTENTOS_PETICION or not self.throttle.throttled(espera):
+                break
+            print(f"⏳ Graph respondió {response.status_code}: se reintenta en {espera:.1f} s "
+                  f"(concurrencia {self.throttle.limit})")
+        return response
+
+    def _leer_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cache.get("site_name") != self.site_name or time.time() - cache.get("guardado", 0) > self.ids_ttl:
+            return None
+        return cache
+
+    def _guardar_cache(self):
+        if not self.cache_file:
+            return
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"site_name": self.site_name, "site_id": self._site_id, "drive_id": self._drive_id,
+                       "guardado": time.time()}, f, indent=2)
+        os.replace(tmp_file, self.cache_file)
+
+    def drive_id(self):
+        """Id de la drive de documentos del sitio (memoria → caché en disco → Graph)"""
+        if self._drive_id:
+            return self._drive_id
+        with self._lock:
+            if not self._drive_id:
+                self._resolver_ids()
+            return self._drive_id
+
+    def _resolver_ids(self):
+        cache = self._leer_cache()
+        if cache:
+            self._site_id, self._drive_id = cache["site_id"], cache["drive_id"]
+            return
+
+        print(f"🔍 Intentando obtener el sitio: {SHAREPOINT_HOST}:/sites/{self.site_name}")
+        site_response = self.request("GET", f"{self.base_url}/sites/{SHAREPOINT_HOST}:/sites/{self.site_name}")
+        site_response.raise_for_status()
+        self._site_id = site_response.json()["id"]
+        print(f"✅ ID del sitio obtenido: {self._site_id}")
+
+        print("📂 Obteniendo drives del sitio...")
+        drive_response = self.request("GET", f"{self.base_url}/sites/{self._site_id}/drives")
+        drive_response.raise_for_status()
+        self._drive_id = drive_response.json()["value"][0]["id"]
+        print(f"✅ ID de drive obtenido: {self._drive_id}")
+        self._guardar_cache()
+
+    def ensure_folder(self, ruta_carpeta):
+        """Crea la carpeta (y sus padres) si no existe; cada carpeta se verifica una vez por cliente"""
+        if not ruta_carpeta or ruta_carpeta in self._carpetas:
+            return
+        with self._lock:
+            if ruta_carpeta not in self._carpetas:
+                self._crear_carpeta(ruta_carpeta)
+
+    def _crear_carpeta(self, ruta_carpeta):
+        padre = os.path.dirname(ruta_carpeta)
+        self.ensure_folder(padre)
+
+        drive_id = self.drive_id()
+        check_response = self.request("GET", f"{self.base_url}/drives/{drive_id}/root:/{ruta_carpeta}")
         if check_response.status_code == 404:
-            # Crear la carpeta
-            create_response = requests.post(
-                f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root/children",
-                headers=headers,
+            destino = f"root:/{padre}:" if padre else "root"
+            create_response = self.request(
+                "POST",
+                f"{self.base_url}/drives/{drive_id}/{destino}/children",
                 json={
                     "name": os.path.basename(ruta_carpeta),
                     "folder": {},
@@ -54,66 +396,285 @@ def crear_carpeta_sharepoint(headers, drive_id, ruta_carpeta):
             )
             create_response.raise_for_status()
             print(f"📁 Carpeta '{ruta_carpeta}' creada exitosamente")
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error al crear/verificar carpeta: {str(e)}")
-        raise
+        else:
+            check_response.raise_for_status()
+        self._carpetas.add(ruta_carpeta)
 
-def subir_archivo(ruta_archivo_local, ruta_destino_sharepoint):
-    """Sube un archivo a SharePoint"""
-    try:
-        # Obtener token de acceso
-        access_token = obtener_token()
-        print("🔑 Token obtenido exitosamente")
-        
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
+    def upload(self, ruta_archivo_local, ruta_destino_sharepoint, force=False, verify_remote=False):
+        """Sube un archivo y devuelve el item de Graph (PUT simple o sesión de carga si es grande)
 
-        # Obtener el ID del sitio usando el nombre
-        print(f"🔍 Intentando obtener el sitio: micelu.sharepoint.com:/sites/{SITE_NAME}")
-        site_response = requests.get(
-            f"https://graph.microsoft.com/v1.0/sites/micelu.sharepoint.com:/sites/{SITE_NAME}",
-            headers=headers
-        )
-        site_response.raise_for_status()
-        site_id = site_response.json()["id"]
-        print(f"✅ ID del sitio obtenido: {site_id}")
+        Si el manifiesto dice que el destino ya tiene este contenido no sube nada y
+        devuelve la entrada del manifiesto con 'omitido': True. Con verify_remote
+        se confirma antes que el cTag remoto siga siendo el de la última subida.
+        """
+        if not force:
+            entry = self.manifest.unchanged(ruta_archivo_local, ruta_destino_sharepoint)
+            if entry is not None and (not verify_remote or self.remote_unchanged(ruta_destino_sharepoint, entry)):
+                print(f"⏭️ Sin cambios, se omite {ruta_destino_sharepoint}")
+                return dict(entry, omitido=True)
 
-        # Obtener la drive de documentos
-        print("📂 Obteniendo drives del sitio...")
-        drive_response = requests.get(
-            f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives",
-            headers=headers
+        if os.path.getsize(ruta_archivo_local) > self.simple_limit:
+            item = self.upload_session(ruta_archivo_local, ruta_destino_sharepoint)
+        else:
+            item = self._upload_simple(ruta_archivo_local, ruta_destino_sharepoint)
+        self.manifest.record(ruta_archivo_local, ruta_destino_sharepoint, item)
+        return item
+
+    def remote_unchanged(self, ruta_destino_sharepoint, entry):
+        """Consulta barata de metadatos: el archivo remoto sigue siendo el que se subió (mismo cTag y tamaño)"""
+        response = self.request(
+            "GET",
+            f"{self.base_url}/drives/{self.drive_id()}/root:/{ruta_destino_sharepoint}",
+            params={"$select": "id,eTag,cTag,size"}
         )
-        drive_response.raise_for_status()
-        drive_id = drive_response.json()["value"][0]["id"]
-        print(f"✅ ID de drive obtenido: {drive_id}")
+        if response.status_code == 404:
+            self.manifest.forget(ruta_destino_sharepoint)
+            return False
+        response.raise_for_status()
+        remoto = response.json()
+        # cTag cambia solo con el contenido; sin cTag se compara el eTag
+        if entry.get('cTag') and remoto.get('cTag'):
+            iguales = remoto['cTag'] == entry['cTag']
+        else:
+            iguales = remoto.get('eTag') == entry.get('eTag')
+        return iguales and remoto.get('size', entry['size']) == entry['size']
 
-        # Crear la estructura de carpetas si no existe
-        ruta_carpetas = os.path.dirname(ruta_destino_sharepoint)
-        if ruta_carpetas:
-            crear_carpeta_sharepoint(headers, drive_id, ruta_carpetas)
+    def _upload_simple(self, ruta_archivo_local, ruta_destino_sharepoint, reintentar=True):
+        self.ensure_folder(os.path.dirname(ruta_destino_sharepoint))
 
-        # Leer el archivo local
         with open(ruta_archivo_local, 'rb') as file:
             file_content = file.read()
 
-        # Subir el archivo
-        upload_response = requests.put(
-            f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{ruta_destino_sharepoint}:/content",
-            headers={"Authorization": f"Bearer {access_token}"},
+        upload_response = self.request(
+            "PUT",
+            f"{self.base_url}/drives/{self.drive_id()}/root:/{ruta_destino_sharepoint}:/content",
             data=file_content
         )
+        if upload_response.status_code == 404 and reintentar:
+            # Los ids en caché pueden haber quedado viejos: se descartan y se resuelven de nuevo
+            self.invalidate()
+            return self._upload_simple(ruta_archivo_local, ruta_destino_sharepoint, reintentar=False)
         upload_response.raise_for_status()
         print(f"📤 Archivo subido exitosamente a {ruta_destino_sharepoint}")
+        return upload_response.json()
+
+    def upload_session(self, ruta_archivo_local, ruta_destino_sharepoint):
+        """Sube un archivo por sesión de carga: fragmentos leídos del disco, reanudando desde el último rango confirmado"""
+        self.ensure_folder(os.path.dirname(ruta_destino_sharepoint))
+        tamano = os.path.getsize(ruta_archivo_local)
+        huella = [tamano, os.path.getmtime(ruta_archivo_local)]
+
+        sesion = self._sesion_guardada(ruta_destino_sharepoint, huella)
+        inicio = self._siguiente_byte(sesion["uploadUrl"]) if sesion else None
+        if inicio is None:
+            sesion = self._crear_sesion(ruta_destino_sharepoint, huella)
+            inicio = 0
+        else:
+            print(f"↩️ Reanudando {ruta_destino_sharepoint} desde el byte {inicio:,} de {tamano:,}")
+
+        fallos = 0
+        sesiones_nuevas = 0
+        with open(ruta_archivo_local, 'rb') as file:
+            while True:
+                file.seek(inicio)
+                fragmento = file.read(min(self.chunk_size, tamano - inicio))
+                fin = inicio + len(fragmento) - 1
+                try:
+                    # La uploadUrl ya viene autorizada: no lleva el header Authorization
+                    response = self.send("PUT", sesion["uploadUrl"], data=fragmento, headers={
+                        "Content-Length": str(len(fragmento)),
+                        "Content-Range": f"bytes {inicio}-{fin}/{tamano}"
+                    })
+                except requests.exceptions.RequestException as e:
+                    response, error = None, str(e)
+                else:
+                    error = f"HTTP {response.status_code}"
+
+                if response is not None and response.status_code in (200, 201):
+                    self._olvidar_sesion(ruta_destino_sharepoint)
+                    print(f"📤 Archivo subido exitosamente a {ruta_destino_sharepoint} "
+                          f"({tamano:,} bytes en sesión de carga)")
+                    return response.json()
+                if response is not None and response.status_code == 202:
+                    fallos = 0
+                    inicio = self._primer_byte(response.json().get("nextExpectedRanges"), fin + 1)
+                    continue
+                if response is not None and response.status_code == 404:
+                    # La sesión venció: se empieza una nueva (pocas veces, para no reintentar para siempre)
+                    self._olvidar_sesion(ruta_destino_sharepoint)
+                    sesiones_nuevas += 1
+                    if sesiones_nuevas > SESIONES_POR_ARCHIVO:
+                        raise Exception(f"Subida de {ruta_destino_sharepoint}: la sesión de carga venció "
+                                        f"{sesiones_nuevas} veces")
+                    sesion, inicio = self._crear_sesion(ruta_destino_sharepoint, huella), 0
+                    continue
+                if response is not None and response.status_code < 500 and response.status_code != 416:
+                    response.raise_for_status()
+
+                # Corte o error del servidor: se pregunta qué rango quedó confirmado y se sigue desde ahí
+                fallos += 1
+                if fallos > REINTENTOS_FRAGMENTO:
+                    raise Exception(f"Subida de {ruta_destino_sharepoint} interrumpida en el byte {inicio:,}: {error}")
+                time.sleep(min(2 ** fallos, 30) * 0.5)
+                siguiente = self._siguiente_byte(sesion["uploadUrl"])
+                if siguiente is not None:
+                    inicio = siguiente
+
+    def _crear_sesion(self, ruta_destino_sharepoint, huella):
+        response = self.request(
+            "POST",
+            f"{self.base_url}/drives/{self.drive_id()}/root:/{ruta_destino_sharepoint}:/createUploadSession",
+            json={"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+        )
+        response.raise_for_status()
+        datos = response.json()
+        sesion = {"uploadUrl": datos["uploadUrl"], "expira": datos.get("expirationDateTime"), "huella": huella}
+        self._guardar_sesion(ruta_destino_sharepoint, sesion)
+        return sesion
+
+    def _siguiente_byte(self, upload_url):
+        """Primer byte que la sesión todavía espera (None si la sesión ya no existe)"""
+        try:
+            response = self.send("GET", upload_url)
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        return self._primer_byte(response.json().get("nextExpectedRanges"), None)
+
+    @staticmethod
+    def _primer_byte(rangos, defecto):
+        # nextExpectedRanges: ["26-"] o ["0-9", "20-"]
+        if not rangos:
+            return defecto
+        return int(str(rangos[0]).split('-')[0])
+
+    def _sesiones(self):
+        if not self.sessions_file or not os.path.exists(self.sessions_file):
+            return {}
+        try:
+            with open(self.sessions_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _escribir_sesiones(self, sesiones):
+        os.makedirs(os.path.dirname(self.sessions_file) or '.', exist_ok=True)
+        tmp_file = f"{self.sessions_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(sesiones, f, indent=2)
+        os.replace(tmp_file, self.sessions_file)
+
+    def _sesion_guardada(self, ruta_destino_sharepoint, huella):
+        """Sesión abierta para este destino, solo si es del mismo archivo (tamaño y fecha) y no venció"""
+        sesion = self._sesiones().get(ruta_destino_sharepoint)
+        if not sesion or sesion.get("huella") != huella:
+            return None
+        try:
+            expira = datetime.fromisoformat(sesion["expira"].replace('Z', '+00:00')).timestamp()
+        except (KeyError, AttributeError, ValueError):
+            expira = None  # si no se puede leer, el servidor dirá si sigue viva
+        if expira is not None and expira <= time.time():
+            return None
+        return sesion
+
+    def _guardar_sesion(self, ruta_destino_sharepoint, sesion):
+        if not self.sessions_file:
+            return
+        with self._lock:
+            sesiones = self._sesiones()
+            sesiones[ruta_destino_sharepoint] = sesion
+            self._escribir_sesiones(sesiones)
+
+    def _olvidar_sesion(self, ruta_destino_sharepoint):
+        if not self.sessions_file:
+            return
+        with self._lock:
+            sesiones = self._sesiones()
+            if sesiones.pop(ruta_destino_sharepoint, None) is not None:
+                self._escribir_sesiones(sesiones)
+
+    def invalidate(self):
+        """Olvida los ids de sitio/drive y las carpetas verificadas (también en disco)"""
+        with self._lock:
+            self._site_id = self._drive_id = None
+            self._carpetas.clear()
+            if self.cache_file and os.path.exists(self.cache_file):
+                os.remove(self.cache_file)
+
+    def close(self):
+        self.session.close()
+
+_cliente = None
+
+def obtener_cliente():
+    """Cliente compartido por todas las subidas del proceso"""
+    global _cliente
+    if _cliente is None:
+        _cliente = SharePointClient()
+    return _cliente
 
+def obtener_token():
+    """Obtiene el token de acceso usando MSAL (reutiliza el del cliente mientras no venza)"""
+    return obtener_cliente().token()
+
+def crear_carpeta_sharepoint(headers, drive_id, ruta_carpeta):
+    """Crea una carpeta en SharePoint si no existe"""
+    try:
+        obtener_cliente().ensure_folder(ruta_carpeta)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Error al crear/verificar carpeta: {str(e)}")
+        raise
+
+def subir_archivo(ruta_archivo_local, ruta_destino_sharepoint, cliente=None, forzar=False, verificar_remoto=False):
+    """Sube un archivo a SharePoint (se omite si no cambió desde la última subida, salvo con forzar)"""
+    cliente = cliente or obtener_cliente()
+    try:
+        item = cliente.upload(ruta_archivo_local, ruta_destino_sharepoint, forzar, verificar_remoto)
+        cliente.manifest.save()
+        return item
     except Exception as e:
         print(f"❌ Error al subir el archivo: {str(e)}")
         raise
 
-def subir_archivos_normalizados():
-    """Sube todos los archivos JSON normalizados a SharePoint"""
+def subir_archivos(pares, max_workers=SUBIDAS_SIMULTANEAS, cliente=None, forzar=False, verificar_remoto=False):
+    """Sube [(ruta_local, ruta_sharepoint)] con hasta max_workers archivos a la vez
+
+    Con 429/503 las peticiones esperan Retry-After y la concurrencia baja a la
+    mitad (luego vuelve a subir de a uno); ver UploadThrottle. Devuelve
+    {ruta_local: {'ok': bool, 'omitido': bool, 'segundos': float, 'error': str|None}}.
+    """
+    cliente = cliente or obtener_cliente()
+    # El cupo del cliente no pasa de los hilos que hay; bajo limitación de Graph se reduce por debajo
+    cliente.throttle.resize(max_workers)
+    # Ids y carpetas antes de repartir (los hilos no compiten por resolverlos), solo si algo se va a subir
+    pendientes = [destino for ruta_local, destino in pares
+                  if forzar or cliente.manifest.unchanged(ruta_local, destino) is None]
+    if pendientes or verificar_remoto:
+        cliente.drive_id()
+    for carpeta in sorted({os.path.dirname(destino) for destino in pendientes}):
+        cliente.ensure_folder(carpeta)
+
+    def _subir(ruta_local, ruta_sharepoint):
+        inicio = time.perf_counter()
+        try:
+            item = cliente.upload(ruta_local, ruta_sharepoint, forzar, verificar_remoto)
+            return {'ok': True, 'omitido': bool(item.get('omitido')), 'segundos': time.perf_counter() - inicio,
+                    'error': None}
+        except Exception as e:
+            return {'ok': False, 'omitido': False, 'segundos': time.perf_counter() - inicio, 'error': str(e)}
+
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futuros = {executor.submit(_subir, ruta_local, ruta_sharepoint): ruta_local
+                   for ruta_local, ruta_sharepoint in pares}
+        for futuro in as_completed(futuros):
+            resultados[futuros[futuro]] = futuro.result()
+    cliente.manifest.save()
+    return resultados
+
+def subir_archivos_normalizados(max_workers=SUBIDAS_SIMULTANEAS, forzar=False, verificar_remoto=False):
+    """Sube los archivos JSON normalizados que cambiaron a SharePoint (hasta max_workers a la vez)"""
     try:
         # Obtener la fecha actual
         fecha_actual = datetime.now().strftime("%Y-%m-%d")
@@ -135,28 +696,24 @@ def subir_archivos_normalizados():
         print(f"\n📊 Encontrados {len(archivos_json)} archivos normalizados para subir")
         print("=" * 60)
         
-        # Subir cada archivo
-        archivos_subidos = 0
-        for archivo in archivos_json:
-            try:
-                # Crear nombre del archivo sin fecha (sobrescribe el anterior)
-                nombre_base = os.path.splitext(archivo)[0]
-                nombre_archivo_sharepoint = f"{nombre_base}.json"
-                
-                # Rutas completas
-                ruta_local = os.path.join(carpeta_normalized, archivo)
-                ruta_sharepoint = f"results_normalized/{nombre_archivo_sharepoint}"
-                
-                print(f"\n📤 Subiendo archivo: {archivo}")
-                subir_archivo(ruta_local, ruta_sharepoint)
-                archivos_subidos += 1
-                
-            except Exception as e:
-                print(f"❌ Error subiendo {archivo}: {str(e)}")
-                continue
-        
+        # Nombre sin fecha: sobrescribe el anterior
+        pares = [(os.path.join(carpeta_normalized, archivo), f"results_normalized/{archivo}")
+                 for archivo in archivos_json]
+
+        inicio = time.perf_counter()
+        resultados = subir_archivos(pares, max_workers, forzar=forzar, verificar_remoto=verificar_remoto)
+        for ruta_local, resultado in sorted(resultados.items()):
+            if not resultado['ok']:
+                print(f"❌ Error subiendo {os.path.basename(ruta_local)}: {resultado['error']}")
+        archivos_subidos = sum(1 for resultado in resultados.values() if resultado['ok'])
+        omitidos = sum(1 for resultado in resultados.values() if resultado['omitido'])
+        print(f"\n⏱️ Subida en {time.perf_counter() - inicio:.1f} s ({max_workers} archivos a la vez)")
+        if obtener_cliente().throttle.throttled_count:
+            print(f"🚦 Limitación de Graph: {obtener_cliente().throttle.summary()}")
+
         print("\n" + "=" * 60)
-        print(f"✅ {archivos_subidos} de {len(archivos_json)} archivos subidos exitosamente")
+        print(f"✅ {archivos_subidos} de {len(archivos_json)} archivos subidos exitosamente"
+              f" ({omitidos} sin cambios, omitidos)")
         print("=" * 60)
         
         return archivos_subidos > 0
@@ -165,6 +722,22 @@ def subir_archivos_normalizados():
         print(f"❌ Error al procesar los archivos: {str(e)}")
         return False
 
+def subir_reporte_comparacion(ruta_local=None):
+    """Sube el reporte Excel generado por excel_report.py a competition_comparison/ (reemplaza el del workflow de n8n)"""
+    ruta_local = ruta_local or os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_comparison",
+                                            "results_comparison", "results_comparison_complete.xlsx")
+    if not os.path.exists(ruta_local):
+        print(f"⚠️ No se encontró el reporte {ruta_local}")
+        return False
+
+    try:
+        print(f"\n📤 Subiendo reporte: {os.path.basename(ruta_local)}")
+        subir_archivo(ruta_local, "competition_comparison/results_comparison_complete.xlsx")
+        return True
+    except Exception as e:
+        print(f"❌ Error subiendo el reporte: {str(e)}")
+        return False
+
 def subir_archivos_results_scrap():
     """Sube todos los archivos JSON de la carpeta results_scrap a SharePoint (función legacy)"""
     try:
@@ -179,7 +752,7 @@ def subir_archivos_results_scrap():
             raise FileNotFoundError(f"La carpeta {carpeta_results} no existe")
         
         # Obtener lista de archivos JSON
-        archivos_json = [f for f in os.listdir(carpeta_results) if f.endswith('.json')]
+        archivos_json = [f for f in os.listdir(carpeta_results) if f.endswith(('.json', '.jsonl'))]
         
         if not archivos_json:
             print("⚠️ No se encontraron archivos JSON en la carpeta results_scrap")
@@ -190,8 +763,8 @@ def subir_archivos_results_scrap():
         # Subir cada archivo
         for archivo in archivos_json:
             # Crear nombre del archivo con fecha
-            nombre_base = os.path.splitext(archivo)[0]
-            nombre_archivo_sharepoint = f"{nombre_base}_{fecha_actual}.json"
+            nombre_base, extension = os.path.splitext(archivo)
+            nombre_archivo_sharepoint = f"{nombre_base}_{fecha_actual}{extension}"
             
             # Rutas completas
             ruta_local = os.path.join(carpeta_results, archivo)
@@ -209,6 +782,15 @@ def subir_archivos_results_scrap():
 
 # Ejecutar el script
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sube los archivos normalizados a SharePoint")
+    parser.add_argument("--forzar", action="store_true", help="Subir también los archivos sin cambios")
+    parser.add_argument("--verificar-remoto", action="store_true",
+                        help="Confirmar con los metadatos de SharePoint que los archivos omitidos siguen iguales")
+    parser.add_argument("--subidas", type=int, default=SUBIDAS_SIMULTANEAS, help="Archivos subiendo a la vez")
+    args = parser.parse_args()
+
     print("🚀 SUBIENDO ARCHIVOS NORMALIZADOS A SHAREPOINT")
     print("=" * 60)
-    subir_archivos_normalizados()
\ No newline at end of file
+    subir_archivos_normalizados(args.subidas, args.forzar, args.verificar_remoto)
\ No newline at end of file
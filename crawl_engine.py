@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MOTOR DE CRAWLING CONCURRENTE
+=============================
+
+Ejecuta todos los spiders dentro de un único CrawlerProcess (un solo
+reactor de Twisted), en lugar de lanzar un subproceso `scrapy crawl` por
+tienda. Como cada tienda es un dominio distinto, los spiders avanzan en
+paralelo y el paso de scraping tarda lo que tarde la tienda más lenta.
+
+IMPORTANTE: el reactor de Twisted no se puede reiniciar, así que
+`ejecutar_spiders` solo puede llamarse una vez por proceso de Python.
+
+Ejecutar con: python crawl_engine.py [spider1 spider2 ...]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROYECTO_SCRAPY = os.path.join(BASE_DIR, "price_comparison")
+CARPETA_SCRAP = os.path.join(PROYECTO_SCRAPY, "results_scrap")
+
+# Spiders disponibles en el proyecto (mismo orden que el proceso completo)
+SPIDERS = [
+    "celudmovil",
+    "tooho",
+    "clevercel",
+    "itech",
+    "phoneelectric",
+    "celetiene",
+    "celucambio"
+]
+
+
+def obtener_configuracion():
+    """Carga la configuración del proyecto Scrapy sin depender del directorio actual"""
+    if PROYECTO_SCRAPY not in sys.path:
+        sys.path.insert(0, PROYECTO_SCRAPY)
+    os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "price_comparison.settings")
+
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+
+    # Solo en este camino los spiders normalizan en streaming (ver NormalizationPipeline)
+    settings.set("NORMALIZE_IN_PIPELINE", True)
+
+    # Un feed JSON Lines por spider: %(name)s se reemplaza con el nombre de cada spider
+    os.makedirs(CARPETA_SCRAP, exist_ok=True)
+    settings.set("FEEDS", {
+        Path(CARPETA_SCRAP).as_uri() + "/%(name)s.jsonl": {
+            "format": "jsonlines",
+            "encoding": "utf-8",
+            "overwrite": True
+        }
+    })
+    return settings
+
+
+def _registrar_spider(crawler, resultado, resultados, total):
+    """Conecta las señales del crawler para llevar las estadísticas de un spider"""
+    from scrapy import signals
+
+    def spider_opened(spider):
+        resultado["inicio"] = time.time()
+        print(f"🕷️ Ejecutando spider: {spider.name}")
+
+    def item_scraped(item, response, spider):
+        resultado["items"] += 1
+
+    def spider_error(failure, response, spider):
+        resultado["errores"] += 1
+
+    def spider_closed(spider, reason):
+        resultado["razon"] = reason
+        # None si la normalización en streaming no estaba activa o no hubo productos
+        resultado["normalizados"] = crawler.stats.get_value("normalizacion/productos")
+        resultado["duracion"] = time.time() - (resultado["inicio"] or time.time())
+        resultado["exitoso"] = reason == "finished"
+        terminados = sum(1 for r in resultados.values() if r["razon"] is not None)
+        estado = "OK" if resultado["exitoso"] else "ERROR"
+        print(f"[{terminados}/{total}] [{estado}] Spider {spider.name} finalizado: "
+              f"{resultado['items']} productos en {resultado['duracion']:.1f}s ({reason})")
+
+    # weak=False: los closures solo viven mientras el crawler exista
+    crawler.signals.connect(spider_opened, signal=signals.spider_opened, weak=False)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped, weak=False)
+    crawler.signals.connect(spider_error, signal=signals.spider_error, weak=False)
+    crawler.signals.connect(spider_closed, signal=signals.spider_closed, weak=False)
+
+
+def ejecutar_spiders(spiders=None):
+    """Ejecuta todos los spiders a la vez en un solo reactor y devuelve el resultado de cada uno"""
+    from scrapy.crawler import CrawlerProcess
+
+    spiders = spiders or SPIDERS
+    process = CrawlerProcess(obtener_configuracion())
+
+    resultados = {}
+    for spider_name in spiders:
+        resultados[spider_name] = {
+            "exitoso": False,
+            "items": 0,
+            "errores": 0,
+            "razon": None,
+            "inicio": None,
+            "duracion": 0.0,
+            "normalizados": None,
+            "error": None
+        }
+
+    for spider_name in spiders:
+        resultado = resultados[spider_name]
+        try:
+            crawler = process.create_crawler(spider_name)
+        except KeyError:
+            resultado["error"] = f"Spider no encontrado: {spider_name}"
+            resultado["razon"] = "no_encontrado"
+            print(f"[ERROR] {resultado['error']}")
+            continue
+
+        _registrar_spider(crawler, resultado, resultados, len(spiders))
+        deferred = process.crawl(crawler)
+
+        def registrar_fallo(failure, resultado=resultado, spider_name=spider_name):
+            resultado["error"] = failure.getErrorMessage()
+            resultado["razon"] = resultado["razon"] or "error"
+            print(f"[ERROR] Error inesperado al ejecutar spider {spider_name}: {resultado['error']}")
+
+        deferred.addErrback(registrar_fallo)
+
+    inicio = time.time()
+    process.start()
+    duracion_total = time.time() - inicio
+
+    suma_secuencial = sum(r["duracion"] for r in resultados.values())
+    print(f"\n[INFO] Scraping concurrente: {duracion_total:.1f}s "
+          f"(suma de spiders: {suma_secuencial:.1f}s)")
+
+    return resultados
+
+
+def mostrar_resumen(resultados):
+    """Imprime una tabla con el resultado de cada spider"""
+    print("-" * 60)
+    for spider_name, resultado in resultados.items():
+        estado = "OK" if resultado["exitoso"] else "ERROR"
+        print(f"{spider_name:<15} {estado:<6} {resultado['items']:>6} productos "
+              f"{resultado['duracion']:>7.1f}s  {resultado['razon'] or ''}")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    print(f"🚀 Iniciando scraping concurrente: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    resultados = ejecutar_spiders(sys.argv[1:] or None)
+    mostrar_resumen(resultados)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+REPORTE EXCEL DE LA COMPARACIÓN DE PRECIOS
+==========================================
+
+Genera localmente results_comparison_complete.xlsx a partir de la matriz de
+compare_prices (que ya lee los normalizados de results_normalized), sin pasar
+por n8n: antes el workflow descargaba cada normalizado de SharePoint, lo
+convertía con "Convert to File" y volvía a subir el resultado.
+
+El libro se escribe con openpyxl en modo write-only: cada fila se serializa al
+agregarla y no queda en memoria. Tiene una hoja TODOS con la matriz completa y
+una hoja por marca, en el mismo orden de la comparación de n8n (nombre, tipo
+de SIM, almacenamiento en GB).
+
+Ejecutar con:
+    python excel_report.py
+    python excel_report.py --salida price_comparison/results_comparison/reporte.xlsx
+"""
+
+import argparse
+import os
+import re
+import time
+
+from compare_prices import CARPETA_COMPARACION, CARPETA_NORMALIZED, archivos_normalizados, matriz_precios
+
+# openpyxl es opcional: sin él no se puede generar el reporte
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+    OPENPYXL_DISPONIBLE = True
+except ImportError:
+    OPENPYXL_DISPONIBLE = False
+
+ARCHIVO_REPORTE = os.path.join(CARPETA_COMPARACION, 'results_comparison_complete.xlsx')
+
+HOJA_TODOS = 'TODOS'
+HOJA_SIN_MARCA = 'OTROS'
+
+# Columnas después de las tiendas (las de la clave que no son product)
+COLUMNAS_FINALES = ['mejor_precio', 'mejor_tienda', 'tiendas', 'condition', 'sim_type', 'storage_capacity']
+
+FORMATO_PRECIO = '#,##0'
+ANCHO_PRODUCTO = 60
+ANCHO_COLUMNA = 14
+
+RE_CARACTERES_HOJA = re.compile(r'[\[\]:*?/\\]')
+
+
+def nombre_hoja(marca):
+    """Nombre válido de hoja de Excel para una marca (máximo 31 caracteres, sin []:*?/\\)"""
+    nombre = RE_CARACTERES_HOJA.sub(' ', marca or '').strip()[:31]
+    return nombre or HOJA_SIN_MARCA
+
+
+def _filas(matriz, columnas):
+    """Tuplas de la matriz en el orden de columnas (None en las celdas vacías)"""
+    for fila in matriz:
+        yield tuple(fila.get(columna) for columna in columnas)
+
+
+def _nueva_hoja(libro, titulo, columnas, precios):
+    """Hoja write-only con encabezado; devuelve (hoja, {índice de columna de precio: celda con formato})"""
+    hoja = libro.create_sheet(titulo)
+    # En write-only los anchos y paneles se fijan antes de la primera fila
+    hoja.column_dimensions['A'].width = ANCHO_PRODUCTO
+    for indice in range(2, len(columnas) + 1):
+        hoja.column_dimensions[get_column_letter(indice)].width = ANCHO_COLUMNA
+    hoja.freeze_panes = 'B2'
+
+    encabezado = []
+    for columna in columnas:
+        celda = WriteOnlyCell(hoja, value=columna)
+        celda.font = Font(bold=True)
+        encabezado.append(celda)
+    hoja.append(encabezado)
+
+    # append() serializa la fila en el momento: la misma celda con formato sirve para todas las filas
+    formatos = {}
+    for indice in precios:
+        formatos[indice] = WriteOnlyCell(hoja)
+        formatos[indice].number_format = FORMATO_PRECIO
+    return hoja, formatos
+
+
+def _agregar(hoja, formatos, fila):
+    celdas = list(fila)
+    for indice, celda in formatos.items():
+        if celdas[indice] is not None:
+            celda.value = celdas[indice]
+            celdas[indice] = celda
+    hoja.append(celdas)
+
+
+def escribir_reporte(matriz, tiendas, ruta=ARCHIVO_REPORTE):
+    """Escribe el libro (hoja TODOS + una por marca) en modo write-only; devuelve {hoja: filas}"""
+    columnas = ['product'] + list(tiendas) + COLUMNAS_FINALES
+    if matriz and 'product_id' in matriz[0]:
+        columnas.append('product_id')
+    precios = [columnas.index(columna) for columna in list(tiendas) + ['mejor_precio']]
+
+    marcas = [fila['brand'] for fila in matriz]
+    hojas_marca = sorted({nombre_hoja(marca) for marca in marcas} - {HOJA_SIN_MARCA})
+    if HOJA_SIN_MARCA in {nombre_hoja(marca) for marca in marcas}:
+        hojas_marca.append(HOJA_SIN_MARCA)
+
+    libro = Workbook(write_only=True)
+    todos = _nueva_hoja(libro, HOJA_TODOS, columnas, precios)
+    hojas = {titulo: _nueva_hoja(libro, titulo, columnas, precios) for titulo in hojas_marca}
+    conteo = {titulo: 0 for titulo in [HOJA_TODOS] + hojas_marca}
+
+    # Cada fila va a TODOS y a la hoja de su marca; la matriz ya viene ordenada
+    for marca, fila in zip(marcas, _filas(matriz, columnas)):
+        titulo = nombre_hoja(marca)
+        _agregar(*todos, fila)
+        _agregar(*hojas[titulo], fila)
+        conteo[HOJA_TODOS] += 1
+        conteo[titulo] += 1
+
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    tmp_file = f'{ruta}.{os.getpid()}.tmp'
+    libro.save(tmp_file)
+    os.replace(tmp_file, ruta)
+    return conteo
+
+
+def generar_reporte(carpeta=CARPETA_NORMALIZED, ruta=ARCHIVO_REPORTE, emparejar=True, matriz=None):
+    """Arma la matriz de precios y la guarda como Excel; devuelve la ruta (None si no se pudo)
+
+    Con `matriz` (la que devolvió comparar_tiendas sobre la misma carpeta) no se
+    vuelven a cargar ni a cruzar los normalizados.
+    """
+    if not OPENPYXL_DISPONIBLE:
+        print("❌ openpyxl no está instalado: pip install openpyxl")
+        return None
+
+    archivos = archivos_normalizados(carpeta)
+    if not archivos:
+        print(f"⚠️ No se encontraron archivos normalizados en {carpeta}")
+        return None
+
+    inicio = time.perf_counter()
+    if matriz is None:
+        matriz, _ = matriz_precios(archivos, emparejar)
+    conteo = escribir_reporte(matriz, list(archivos), ruta)
+    duracion = time.perf_counter() - inicio
+
+    print(f"📊 Reporte Excel: {conteo[HOJA_TODOS]} productos en {len(conteo) - 1} hojas por marca "
+          f"({duracion:.1f} s) → {ruta}")
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte Excel de la comparación de precios entre tiendas")
+    parser.add_argument("--entrada", default=CARPETA_NORMALIZED, help="Carpeta con los *_normalized.json")
+    parser.add_argument("--salida", default=ARCHIVO_REPORTE, help="Archivo .xlsx de salida")
+    parser.add_argument("--sin-emparejar", action="store_true",
+                        help="Cruzar solo por clave exacta, sin unir nombres parecidos")
+    args = parser.parse_args()
+    generar_reporte(args.entrada, args.salida, not args.sin_emparejar)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,181 @@
+import hashlib
+import heapq
+import itertools
 import json
 import re
 import os
+import time
+import unicodedata
+from collections import OrderedDict
 from datetime import datetime
 
+SCRAP_FOLDER = 'price_comparison/results_scrap'
+
+# Caché persistente de normalize_product (ruta absoluta: el pipeline de Scrapy corre desde otra carpeta)
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_comparison', 'normalize_cache.json')
+CACHE_SIZE = 100000
+
+# Manifiesto de normalización incremental: hash del feed y versión de reglas de cada salida
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_comparison', 'normalize_manifest.json')
+
+# Subir este número al cambiar la LÓGICA de normalización (las tablas de __init__ ya se versionan solas)
+RULES_VERSION = 1
+
+# Motor de normalize_fields: 'regex' (DataNormalizer) o 'tokens' (token_normalize.TokenNormalizer)
+NORMALIZE_ENGINE = os.environ.get('NORMALIZE_ENGINE', 'regex')
+
+# Perfilado por etapa (NORMALIZE_PROFILE=1): apagado no agrega ningún costo por producto
+PROFILE_NORMALIZATION = os.environ.get('NORMALIZE_PROFILE', '') not in ('', '0')
+PROFILE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_comparison', 'profiles')
+
+class _CombiningMarks(dict):
+    """Tabla de str.translate que borra las marcas diacríticas (categoría Mn)
+    
+    Cada carácter se clasifica la primera vez que aparece: los nombres usan un
+    puñado de caracteres distintos y no hace falta recorrer todo Unicode.
+    """
+
+    def __missing__(self, code):
+        mark = None if unicodedata.category(chr(code)) == 'Mn' else code
+        self[code] = mark
+        return mark
+
+COMBINING_MARKS = _CombiningMarks()
+
+def scrap_file(store_name, folder=SCRAP_FOLDER):
+    """Ruta del feed crudo de una tienda: <tienda>.jsonl, o el <tienda>.json legacy si solo existe ese"""
+    jsonl_file = os.path.join(folder, f'{store_name}.jsonl')
+    legacy_file = os.path.join(folder, f'{store_name}.json')
+    if not os.path.exists(jsonl_file) and os.path.exists(legacy_file):
+        return legacy_file
+    return jsonl_file
+
+def profile_file(store_name, folder=PROFILE_FOLDER):
+    """Ruta del perfil por etapa de una tienda"""
+    return os.path.join(folder, f'{store_name}_profile.json')
+
+def iter_json_records(input_file, chunk_size=1 << 16):
+    """Recorre los registros de un feed uno a uno, sin cargar el archivo completo
+    
+    Soporta JSON Lines (un objeto por línea, formato actual de los spiders) y el
+    formato legacy de Scrapy `-o archivo.json`, que agrega un array nuevo en cada
+    ejecución y deja varios arrays concatenados en el mismo archivo.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        first_char = ''
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                first_char = char
+                break
+        f.seek(0)
+        
+        if first_char == '[':
+            yield from _iter_json_arrays(f, input_file, chunk_size)
+            return
+        
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # Normalmente la última línea de un crawl interrumpido
+                print(f"⚠️ Línea {line_number} inválida en {input_file}: {e}")
+
+def split_jsonl(input_file, chunk_bytes):
+    """Divide un feed JSON Lines en rangos de bytes (inicio, fin) que terminan en un fin de línea
+    
+    Devuelve None si el archivo es del formato legacy de arrays concatenados,
+    que no se puede partir sin decodificarlo entero.
+    """
+    with open(input_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                break
+        if char == b'[':
+            return None
+        
+        ranges = []
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+def iter_jsonl_range(input_file, start, end):
+    """Recorre los registros JSON Lines entre los bytes `start` y `end` (rango de split_jsonl)"""
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            line = line.decode('utf-8').strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Línea inválida en {input_file} (byte {offset}): {e}")
+
+def _iter_json_arrays(f, input_file, chunk_size):
+    """Decodificador incremental de arrays JSON concatenados ([...][...])"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    in_array = False
+    eof = False
+    
+    while True:
+        # Saltar espacios y comas entre elementos
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        
+        if pos < len(buffer):
+            char = buffer[pos]
+            if char == '[' and not in_array:
+                in_array = True
+                pos += 1
+                continue
+            if char == ']' and in_array:
+                in_array = False
+                pos += 1
+                continue
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+                yield record
+                continue
+            except json.JSONDecodeError as e:
+                if eof:
+                    print(f"⚠️ Error parseando {input_file}: {e}")
+                    return
+        elif eof:
+            return
+        
+        # Buffer agotado o registro cortado entre dos bloques: leer el siguiente
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
 class DataNormalizer:
-    def __init__(self):
+    # Métodos que cronometra el perfilado (tiempo inclusivo: una etapa incluye las que llama)
+    profile_stages = [
+        'normalize_product', 'normalize_fields', 'clean_name', 'extract_brand',
+        'detect_brand_from_product_name', 'extract_condition_with_priority', 'extract_sim_type',
+        'extract_storage_capacity', 'clean_final_name', 'clean_unwanted_words', 'remove_brand_duplication',
+        'remove_final_duplications'
+    ]
+    
+    def __init__(self, cache_file=CACHE_FILE, cache_size=CACHE_SIZE, profile=None, manifest_file=MANIFEST_FILE):
         # Diccionario de mapeo de marcas
         self.brand_mapping = {
             'IPHONE': 'APPLE',
@@ -135,40 +306,18 @@ class DataNormalizer:
         
         # Orden de prioridad para condiciones (de mayor a menor prioridad)
         self.condition_priority = ['USADO', 'COMO NUEVO', 'SEMINUEVO', 'NUEVO']
-
-    def remove_accents(self, text):
-        """Elimina tildes y caracteres especiales"""
-        import unicodedata
-        return ''.join(c for c in unicodedata.normalize('NFD', text)
-                      if unicodedata.category(c) != 'Mn')
-
-    def detect_brand_from_product_name(self, product_name):
-        """Detecta la marca a partir del nombre del producto - UNA SOLA MARCA"""
-        product_upper = product_name.upper()
         
-        # PRIMERO: Buscar marcas implícitas (más específicas)
-        for product_key, brand in self.implicit_brands.items():
-            if product_key in product_upper:
-                return brand
-        
-        # SEGUNDO: Buscar patrones de marca en ORDEN DE PRIORIDAD
-        # Esto evita que XIAOMI capture HONOR, MOTOROLA, etc.
-        for brand, patterns in self.brand_patterns.items():
-            for pattern in patterns:
-                if f' {pattern} ' in f' {product_upper} ' or product_upper.startswith(pattern + ' ') or product_upper.endswith(' ' + pattern):
-                    return brand
-                
-        return None
-
-    def is_mobile_device(self, name):
-        """Detecta si es un dispositivo móvil que usa SIM"""
-        if not name:
-            return False
-            
-        name_upper = name.upper()
+        # Mapeo de condiciones con prioridad (mayor número = mayor prioridad)
+        self.condition_rank = {
+            'USADO': 4,      # OUTLET se convierte a USADO
+            'COMO NUEVO': 3, 
+            'SEMINUEVO': 2,  # EXH se convierte a SEMINUEVO
+            'SEMI NUEVO': 2,
+            'NUEVO': 1
+        }
         
         # Palabras que indican que ES un celular/móvil
-        mobile_keywords = [
+        self.mobile_keywords = [
             'IPHONE', 'GALAXY', 'REDMI', 'POCO', 'XIAOMI', 'HUAWEI', 'HONOR',
             'MOTOROLA', 'MOTO', 'OPPO', 'REALME', 'ONEPLUS', 'VIVO', 'IQOO',
             'NOKIA', 'TECNO', 'INFINIX', 'NOTHING', 'BLACKBERRY', 'LG',
@@ -176,7 +325,7 @@ class DataNormalizer:
         ]
         
         # Palabras que indican que NO es un celular
-        non_mobile_keywords = [
+        self.non_mobile_keywords = [
             'AIRPODS', 'AUDIFONOS', 'EARBUDS', 'HEADPHONES', 'BUDS',
             'WATCH', 'SMARTWATCH', 'RELOJ', 'RELOJES',
             'IPAD', 'TABLET', 'TAB',
@@ -191,17 +340,241 @@ class DataNormalizer:
             'PENCIL', 'STYLUS'
         ]
         
+        # Patrones de SIM por tipo (el primero que aparezca en el nombre gana)
+        self.sim_patterns = {
+            'SIM VIRTUAL': ['E-SIM', 'ESIM', 'SIM VIRTUAL', 'VIRTUAL'],
+            'SIM FISICA': ['SIM FISICA', 'SIM FÍSICO', 'S-FIS', 'SFIS', 'FISICA', 'FÍSICO'],
+            'DUAL SIM': ['DUAL SIM']
+        }
+        
+        # Patrones de condición: más específicos primero - ORDEN IMPORTANTE
+        # (regex, condición, literal que debe aparecer en el nombre para que pueda coincidir)
+        self.condition_patterns = [
+            (r'\b(COMO\s+NUEVO)\b', 'COMO NUEVO', 'NUEVO'),
+            (r'\b(SEMI\s*NUEVO)\b', 'SEMINUEVO', 'SEMI'),
+            (r'\b(SEMINUEVO)\b', 'SEMINUEVO', 'SEMINUEVO'),
+            (r'\bDE\s+EXH\s*PREMIUM\b', 'SEMINUEVO', 'EXH'),  # Mejorado: DE EXH PREMIUM
+            (r'\bDE\s+EXH\b', 'SEMINUEVO', 'EXH'),            # Mejorado: DE EXH
+            (r'\bEXH\s*PREMIUM\b', 'SEMINUEVO', 'EXH'),       # Mejorado: EXH PREMIUM
+            (r'\bEXH\b', 'SEMINUEVO', 'EXH'),                 # Mejorado: EXH solo
+            (r'\b(USADO)\b', 'USADO', 'USADO'),                 # EXH ya se convirtió a USADO
+            (r'\b(OUTLET)\b', 'USADO', 'OUTLET'),                # OUTLET = USADO
+            (r'\b(NUEVO)\s+DUAL\b', 'NUEVO', 'NUEVO'),          # NUEVO DUAL -> NUEVO
+            (r'\b(NUEVO)\b', 'NUEVO', 'NUEVO')
+        ]
+        
+        # Palabras que clean_unwanted_words elimina completamente
+        self.unwanted_words = [
+            'CELULAR', 'CELULARES', 'ALL', 'GADGETS', 'ACCESORIOS', 'ACCESORIO',
+            'ELECTRONICA', 'TECNOLOGIA', 'TECH', 'CALIDAD', 'EN', 'SONIDO', 
+            'TITANNIUM', 'ADAPTADORES', 'CABLES', 'ª', 'FULL'
+        ]
+        
+        # Colores y materiales que se eliminan SIEMPRE
+        self.colors_to_remove = ['BLANCO', 'NEGRO', 'AZUL', 'ROJO', 'VERDE', 'AMARILLO', 'MORADO', 'ROSADO', 'ROSA', 'DORADO', 'GRIS', 'PLATEADO', 'LILA', 'TITANIUM', 'TITANIO', 'NATURAL']
+        
+        # Submarcas que se eliminan junto con la marca principal
+        self.related_brands = {
+            'HUAWEI': ['HONOR'],
+            'XIAOMI': ['REDMI', 'POCO', 'POCOPHONE', 'MI'],
+            'OPPO': ['REALME', 'ONEPLUS'],
+            'VIVO': ['IQOO'],
+            'APPLE': ['IPHONE', 'IPAD', 'MACBOOK', 'AIRPODS'],
+            'SAMSUNG': ['GALAXY'],
+            'MOTOROLA': ['MOTO']
+        }
+        
+        # Patrones SOLO para almacenamiento real (NO RAM), en orden de preferencia
+        self.storage_values = ['128GB', '256GB', '512GB', '1TB', '1024GB', '2TB', '2048GB']
+        
+        # RAM que se elimina del nombre pero NO se usa como capacidad
+        # (32GB y 64GB también pueden ser RAM en algunos casos)
+        self.ram_values = ['3GB', '4GB', '6GB', '8GB', '12GB', '16GB', '32GB', '64GB']
+        
+        # Palabras sueltas que quedan al final de la limpieza
+        self.final_words_to_clean = ['ALL', 'DE', 'LA', 'EL', 'UN', 'UNA']
+        
+        self._compile_patterns()
+        
+        # Caché LRU de (nombre, marca) → campos normalizados, invalidada si cambian las reglas
+        self.rules_version = self._rules_version()
+        self.cache = shared_cache(cache_file, self.rules_version, cache_size) if cache_size else None
+        
+        # Tiendas cuyo feed y reglas no cambiaron desde la última normalización
+        self.manifest = NormalizationManifest(manifest_file) if manifest_file else None
+        
+        # Perfilado opt-in: solo entonces se envuelven los métodos de profile_stages
+        self.profiler = None
+        if profile if profile is not None else PROFILE_NORMALIZATION:
+            self.profiler = StageProfiler()
+            self.profiler.instrument(self, self.profile_stages)
+
+    def _rules_version(self):
+        """Huella de las tablas de reglas: si cambia alguna, los resultados cacheados ya no sirven"""
+        tables = {
+            'logic': RULES_VERSION,
+            'brand_mapping': self.brand_mapping,
+            'implicit_brands': self.implicit_brands,
+            'brand_patterns': self.brand_patterns,
+            'capacity_mapping': self.capacity_mapping,
+            'condition_mapping': self.condition_mapping,
+            'sim_type_mapping': self.sim_type_mapping,
+            'words_to_remove': self.words_to_remove,
+            'condition_priority': self.condition_priority,
+            'condition_rank': self.condition_rank,
+            'mobile_keywords': self.mobile_keywords,
+            'non_mobile_keywords': self.non_mobile_keywords,
+            'sim_patterns': self.sim_patterns,
+            'condition_patterns': self.condition_patterns,
+            'unwanted_words': self.unwanted_words,
+            'colors_to_remove': self.colors_to_remove,
+            'related_brands': self.related_brands,
+            'storage_values': self.storage_values,
+            'ram_values': self.ram_values,
+            'final_words_to_clean': self.final_words_to_clean
+        }
+        serialized = json.dumps(tables, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:16]
+
+    def save_cache(self):
+        """Guarda en disco la caché de normalización (si hay algo nuevo)"""
+        if self.cache is not None:
+            self.cache.save()
+
+    def _word_alternation(self, words, escape=True):
+        """Compila una lista de palabras como una sola alternancia \\b(?:A|B|...)\\b"""
+        alternatives = [re.escape(word) if escape else word for word in words]
+        return re.compile(rf'\b(?:{"|".join(alternatives)})\b', re.IGNORECASE)
+
+    def _compile_patterns(self):
+        """Compila una sola vez todas las regex de los caminos calientes
+        
+        Las listas de palabras (colores, palabras a eliminar, RAM/almacenamiento)
+        se unen en una sola alternancia, así cada nombre se recorre una vez por
+        lista en lugar de una vez por palabra. Como todas las palabras van entre
+        \\b, quitar una no puede crear ni destruir coincidencias de otra y el
+        resultado es el mismo que con los re.sub secuenciales.
+        """
+        self.re_whitespace = re.compile(r'\s+')
+        self.re_multi_space = re.compile(r'\s{2,}')
+        self.re_separators = re.compile(r'[-|]')
+        
+        # clean_name: EXH → SEMINUEVO (alternativas en el orden de los re.sub originales)
+        self.re_exh = re.compile(
+            r'\bDE\s+EXH\s*PREMIUM\b|\bDE\s+EXH\b|\bEXH\s*PREMIUM\b|\bEXH\b', re.IGNORECASE
+        )
+        
+        # extract_sim_type
+        self.re_sim_patterns = {
+            pattern: re.compile(rf'\b{re.escape(pattern)}\b', re.IGNORECASE)
+            for patterns in self.sim_patterns.values() for pattern in patterns
+        }
+        
+        # extract_condition_with_priority
+        self.re_condition_patterns = [
+            (re.compile(pattern, re.IGNORECASE), condition, literal)
+            for pattern, condition, literal in self.condition_patterns
+        ]
+        self.re_dual = re.compile(r'\bDUAL\b', re.IGNORECASE)
+        self.re_dash_spacing = re.compile(r'\s*-\s*')
+        self.re_trim_dashes = re.compile(r'^[\s\-]+|[\s\-]+$')
+        
+        # clean_unwanted_words
+        self.re_de_exh = re.compile(r'\bDE\s+EXH', re.IGNORECASE)
+        self.re_otras_marcas = re.compile(r'\b(OTRAS\s*-?\s*MARCAS?)\b', re.IGNORECASE)
+        self.re_otras_marcas_dash = re.compile(r'\b(OTRAS)\s*-\s*(MARCAS?)\b', re.IGNORECASE)
+        self.re_audifonos = re.compile(r'\b(AUDIFONOS)\b', re.IGNORECASE)
+        self.re_celular = re.compile(r'\b(CELULAR|CELULARES)\b', re.IGNORECASE)
+        self.re_network = re.compile(r'\b(4G|5G|LTE|3G|2G)\+?\b', re.IGNORECASE)
+        self.re_ram_plus_gb = re.compile(r'\b([1-9]|1[0-6])\+\s*(GB)?\b', re.IGNORECASE)
+        self.re_ram_plus = re.compile(r'\b([1-9]|1[0-6])\s*\+\b', re.IGNORECASE)
+        self.re_sim_fis = re.compile(r'\b(S\s*-?\s*FIS)\b', re.IGNORECASE)
+        self.re_e_sim = re.compile(r'\b(E\s*-?\s*SIM)\b', re.IGNORECASE)
+        self.re_sfis_esim = re.compile(r'\b(SFIS|ESIM)\b', re.IGNORECASE)
+        self.re_year = re.compile(r'\s*\((\d{4})\)\s*', re.IGNORECASE)
+        self.re_year_spaced = re.compile(r'\s*\(\s*(\d{4})\s*\)\s*', re.IGNORECASE)
+        self.re_colors = self._word_alternation(self.colors_to_remove, escape=False)
+        self.re_plus_six = re.compile(r'\+\s*6\b', re.IGNORECASE)
+        self.re_unwanted_words = self._word_alternation(self.unwanted_words)
+        self.re_unwanted_words_de = self._word_alternation(self.unwanted_words + ['DE'])
+        
+        # remove_brand_duplication: una alternancia por marca (se completa bajo demanda)
+        self.re_brand_duplication = {}
+        
+        # extract_capacity_from_name
+        self.storage_priority = {value: index for index, value in enumerate(self.storage_values)}
+        self.re_storage = self._word_alternation(self.storage_values)
+        self.re_storage_and_ram = self._word_alternation(self.storage_values + self.ram_values)
+        
+        # clean_final_name
+        self.re_final_words = self._word_alternation(self.final_words_to_clean)
+        
+        # Detección de marca, móvil y condición: un solo autómata para todas las palabras clave.
+        # Los patrones de marca van entre espacios y se buscan en ' NOMBRE ' (palabra completa);
+        # el resto son subcadenas. El rango conserva el orden de prioridad de las tablas.
+        self.implicit_rank = {
+            keyword: (rank, brand) for rank, (keyword, brand) in enumerate(self.implicit_brands.items())
+        }
+        self.brand_rank = {}
+        for brand, patterns in self.brand_patterns.items():
+            for pattern in patterns:
+                self.brand_rank.setdefault(f' {pattern} ', (len(self.brand_rank), brand))
+        self.mobile_set = frozenset(self.mobile_keywords)
+        self.non_mobile_set = frozenset(self.non_mobile_keywords)
+        self.seminuevo_set = frozenset(['SEMINUEVO', 'SEMI NUEVO', 'EXH', 'DE EXH'])
+        self.excluded_set = frozenset(['LAMPERT', 'OPEN BOX', 'CPO'])
+        self.keyword_automaton = KeywordAutomaton(
+            list(self.implicit_rank) + list(self.brand_rank) + self.mobile_keywords + self.non_mobile_keywords
+            + list(self.seminuevo_set) + list(self.excluded_set)
+        )
+        self._last_scan = (None, frozenset())
+
+    def remove_accents(self, text):
+        """Elimina tildes y caracteres especiales"""
+        return unicodedata.normalize('NFD', text).translate(COMBINING_MARKS)
+
+    def keyword_hits(self, text):
+        """Palabras clave del autómata presentes en el texto (una pasada, en mayúsculas)
+        
+        Recuerda el último texto recorrido: el mismo nombre se consulta varias
+        veces seguidas (marca, móvil, seminuevo) y solo se recorre una vez.
+        """
+        last_text, hits = self._last_scan
+        if text != last_text:
+            hits = self.keyword_automaton.find(f' {text.upper()} ')
+            self._last_scan = (text, hits)
+        return hits
+
+    def detect_brand_from_product_name(self, product_name):
+        """Detecta la marca a partir del nombre del producto - UNA SOLA MARCA"""
+        hits = self.keyword_hits(product_name)
+        
+        # PRIMERO: Buscar marcas implícitas (más específicas)
+        ranked = [self.implicit_rank[hit] for hit in hits if hit in self.implicit_rank]
+        if ranked:
+            return min(ranked)[1]
+        
+        # SEGUNDO: Buscar patrones de marca en ORDEN DE PRIORIDAD
+        # Esto evita que XIAOMI capture HONOR, MOTOROLA, etc.
+        ranked = [self.brand_rank[hit] for hit in hits if hit in self.brand_rank]
+        if ranked:
+            return min(ranked)[1]
+                
+        return None
+
+    def is_mobile_device(self, name):
+        """Detecta si es un dispositivo móvil que usa SIM"""
+        if not name:
+            return False
+            
+        hits = self.keyword_hits(name)
+        
         # Primero verificar si contiene palabras que definitivamente NO son móviles
-        for keyword in non_mobile_keywords:
-            if keyword in name_upper:
-                return False
+        if not self.non_mobile_set.isdisjoint(hits):
+            return False
         
         # Luego verificar si contiene palabras que SÍ son móviles
-        for keyword in mobile_keywords:
-            if keyword in name_upper:
-                return True
-                
-        return False
+        return not self.mobile_set.isdisjoint(hits)
 
     def extract_sim_type(self, name):
         """Extrae y normaliza el tipo de SIM SOLO para dispositivos móviles"""
@@ -215,18 +588,12 @@ class DataNormalizer:
         name_upper = name.upper()
         
         # Buscar patrones de SIM más específicos
-        sim_patterns = {
-            'SIM VIRTUAL': ['E-SIM', 'ESIM', 'SIM VIRTUAL', 'VIRTUAL'],
-            'SIM FISICA': ['SIM FISICA', 'SIM FÍSICO', 'S-FIS', 'SFIS', 'FISICA', 'FÍSICO'],
-            'DUAL SIM': ['DUAL SIM']
-        }
-        
-        for sim_type, patterns in sim_patterns.items():
+        for sim_type, patterns in self.sim_patterns.items():
             for pattern in patterns:
                 if pattern in name_upper:
                     # Remover el patrón del nombre
-                    cleaned_name = re.sub(rf'\b{re.escape(pattern)}\b', '', name, flags=re.IGNORECASE)
-                    cleaned_name = re.sub(r'\s+', ' ', cleaned_name).strip()
+                    cleaned_name = self.re_sim_patterns[pattern].sub('', name)
+                    cleaned_name = self.re_whitespace.sub(' ', cleaned_name).strip()
                     return sim_type, cleaned_name
         
         # Si es un dispositivo móvil pero no especifica SIM, usar SIM FISICA por defecto
@@ -237,56 +604,35 @@ class DataNormalizer:
         if not name:
             return "", name
         
-        # Mapeo de condiciones con prioridad (mayor número = mayor prioridad)
-        condition_priority = {
-            'USADO': 4,      # OUTLET se convierte a USADO
-            'COMO NUEVO': 3, 
-            'SEMINUEVO': 2,  # EXH se convierte a SEMINUEVO
-            'SEMI NUEVO': 2,
-            'NUEVO': 1
-        }
-        
-        # Patrones más específicos primero - ORDEN IMPORTANTE
-        condition_patterns = [
-            (r'\b(COMO\s+NUEVO)\b', 'COMO NUEVO'),
-            (r'\b(SEMI\s*NUEVO)\b', 'SEMINUEVO'),
-            (r'\b(SEMINUEVO)\b', 'SEMINUEVO'),
-            (r'\bDE\s+EXH\s*PREMIUM\b', 'SEMINUEVO'),  # Mejorado: DE EXH PREMIUM
-            (r'\bDE\s+EXH\b', 'SEMINUEVO'),            # Mejorado: DE EXH
-            (r'\bEXH\s*PREMIUM\b', 'SEMINUEVO'),       # Mejorado: EXH PREMIUM
-            (r'\bEXH\b', 'SEMINUEVO'),                 # Mejorado: EXH solo
-            (r'\b(USADO)\b', 'USADO'),                 # EXH ya se convirtió a USADO
-            (r'\b(OUTLET)\b', 'USADO'),                # OUTLET = USADO
-            (r'\b(NUEVO)\s+DUAL\b', 'NUEVO'),          # NUEVO DUAL -> NUEVO
-            (r'\b(NUEVO)\b', 'NUEVO')
-        ]
-        
         found_conditions = []
         cleaned_name = name
+        # Quitar una condición nunca agrega letras, así que el literal de cada
+        # patrón alcanza para descartar los que no pueden coincidir
+        name_upper = name.upper()
         
-        # Buscar todas las condiciones y removerlas
-        for pattern, condition in condition_patterns:
-            matches = list(re.finditer(pattern, cleaned_name, re.IGNORECASE))
-            for match in matches:
-                found_conditions.append(condition)
-            # Remover TODAS las ocurrencias del patrón
-            cleaned_name = re.sub(pattern, '', cleaned_name, flags=re.IGNORECASE)
+        # Buscar todas las condiciones y removerlas (patrones en ORDEN de self.condition_patterns)
+        for pattern, condition, literal in self.re_condition_patterns:
+            if literal not in name_upper:
+                continue
+            # Remover TODAS las ocurrencias del patrón, contando cuántas había
+            cleaned_name, matches = pattern.subn('', cleaned_name)
+            found_conditions.extend([condition] * matches)
         
         # Eliminar "DUAL" suelto cuando ya hay "NUEVO"
         if 'NUEVO' in found_conditions:
-            cleaned_name = re.sub(r'\bDUAL\b', '', cleaned_name, flags=re.IGNORECASE)
+            cleaned_name = self.re_dual.sub('', cleaned_name)
         
         # Limpiar espacios múltiples y separadores
-        cleaned_name = re.sub(r'\s+', ' ', cleaned_name).strip()
-        cleaned_name = re.sub(r'\s*-\s*', ' - ', cleaned_name)
-        cleaned_name = re.sub(r'^[\s\-]+|[\s\-]+$', '', cleaned_name)
+        cleaned_name = self.re_whitespace.sub(' ', cleaned_name).strip()
+        cleaned_name = self.re_dash_spacing.sub(' - ', cleaned_name)
+        cleaned_name = self.re_trim_dashes.sub('', cleaned_name)
         
         if not found_conditions:
             return "NUEVO", cleaned_name  # Por defecto NUEVO
         
         # Obtener la condición con mayor prioridad (eliminar duplicados)
         unique_conditions = list(set(found_conditions))
-        best_condition = max(unique_conditions, key=lambda x: condition_priority.get(x, 0))
+        best_condition = max(unique_conditions, key=lambda x: self.condition_rank.get(x, 0))
         
         return best_condition, cleaned_name
 
@@ -295,73 +641,64 @@ class DataNormalizer:
         if not name:
             return name
         
-        # Lista de palabras a eliminar completamente
-        words_to_remove = [
-            'CELULAR', 'CELULARES', 'ALL', 'GADGETS', 'ACCESORIOS', 'ACCESORIO',
-            'ELECTRONICA', 'TECNOLOGIA', 'TECH', 'CALIDAD', 'EN', 'SONIDO', 
-            'TITANNIUM', 'ADAPTADORES', 'CABLES', 'ª', 'FULL'
-        ]
-        
         # NO eliminar la palabra "DE" cuando forma parte de "DE EXH" o "DE EXH PREMIUM"
         # Esto preserva los patrones importantes para la detección de condición
-        if not re.search(r'\bDE\s+EXH', name, re.IGNORECASE):
-            words_to_remove.append('DE')
+        if self.re_de_exh.search(name):
+            unwanted_words = self.re_unwanted_words
+        else:
+            unwanted_words = self.re_unwanted_words_de
         
         # PATRONES ESPECÍFICOS MUY IMPORTANTES - Ejecutar PRIMERO
         
         # 1. Eliminar "OTRAS MARCAS" o "OTRAS - MARCAS" COMPLETAMENTE
-        name = re.sub(r'\b(OTRAS\s*-?\s*MARCAS?)\b', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\b(OTRAS)\s*-\s*(MARCAS?)\b', '', name, flags=re.IGNORECASE)
+        name = self.re_otras_marcas.sub('', name)
+        name = self.re_otras_marcas_dash.sub('', name)
         
         # 2. Eliminar "AUDIFONOS" SOLO cuando aparece con AIRPODS
-        if 'AIRPODS' in name.upper():
-            name = re.sub(r'\b(AUDIFONOS)\b', '', name, flags=re.IGNORECASE)
+        if 'AIRPODS' in self.keyword_hits(name):
+            name = self.re_audifonos.sub('', name)
         
         # 3. Eliminar "CELULAR" de TODOS los dispositivos móviles
         if self.is_mobile_device(name):
-            name = re.sub(r'\b(CELULAR|CELULARES)\b', '', name, flags=re.IGNORECASE)
+            name = self.re_celular.sub('', name)
         
         # 4. Eliminar patrones técnicos generales
         
         # Eliminar patrones de RED solo para productos NO Android
         # Mantener 4G/5G para dispositivos Android (celulares)
         if not self.is_mobile_device(name):
-            name = re.sub(r'\b(4G|5G|LTE|3G|2G)\+?\b', '', name, flags=re.IGNORECASE)
+            name = self.re_network.sub('', name)
         
         # Eliminar patrones de RAM (SOLO números de 1-2 dígitos: 4+, 8+, 6+, 12+, etc.)
         # NO eliminar almacenamiento válido como 128+, 256+, etc.
-        name = re.sub(r'\b([1-9]|1[0-6])\+\s*(GB)?\b', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\b([1-9]|1[0-6])\s*\+\b', '', name, flags=re.IGNORECASE)
+        name = self.re_ram_plus_gb.sub('', name)
+        name = self.re_ram_plus.sub('', name)
         
         # Eliminar patrones de SIM (S-FIS, E-SIM, etc.) ya que se maneja por separado
-        name = re.sub(r'\b(S\s*-?\s*FIS)\b', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\b(E\s*-?\s*SIM)\b', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\b(SFIS|ESIM)\b', '', name, flags=re.IGNORECASE)
+        name = self.re_sim_fis.sub('', name)
+        name = self.re_e_sim.sub('', name)
+        name = self.re_sfis_esim.sub('', name)
         
         # Eliminar años entre paréntesis (2020), (2022), etc.
-        name = re.sub(r'\s*\((\d{4})\)\s*', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\s*\(\s*(\d{4})\s*\)\s*', '', name, flags=re.IGNORECASE)
+        name = self.re_year.sub('', name)
+        name = self.re_year_spaced.sub('', name)
         
-        # Eliminar colores y materiales SIEMPRE
-        colors_to_remove = ['BLANCO', 'NEGRO', 'AZUL', 'ROJO', 'VERDE', 'AMARILLO', 'MORADO', 'ROSADO', 'ROSA', 'DORADO', 'GRIS', 'PLATEADO', 'LILA', 'TITANIUM', 'TITANIO', 'NATURAL']
-        for color in colors_to_remove:
-            # Eliminar SIEMPRE estos colores/materiales
-            name = re.sub(rf'\b{color}\b', '', name, flags=re.IGNORECASE)
+        # Eliminar colores y materiales SIEMPRE (self.colors_to_remove)
+        name = self.re_colors.sub('', name)
         
         # Eliminar "+6" solo si es un celular/dispositivo móvil
         if self.is_mobile_device(name):
-            name = re.sub(r'\+\s*6\b', '', name, flags=re.IGNORECASE)
+            name = self.re_plus_six.sub('', name)
         
         # NO eliminar patrones EXH aquí, ya que son importantes para la condición
         # y se manejan en extract_condition_with_priority
         
-        # Eliminar palabras no deseadas generales
-        for word in words_to_remove:
-            name = re.sub(rf'\b{re.escape(word)}\b', '', name, flags=re.IGNORECASE)
+        # Eliminar palabras no deseadas generales (self.unwanted_words)
+        name = unwanted_words.sub('', name)
         
         # Eliminar TODOS los guiones, pipes y limpiar espacios múltiples
-        name = re.sub(r'[-|]', '', name)
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = self.re_separators.sub('', name)
+        name = self.re_whitespace.sub(' ', name).strip()
         
         return name
 
@@ -373,31 +710,30 @@ class DataNormalizer:
         name_upper = name.upper()
         brand_upper = brand.upper()
         
-        # Eliminar TODAS las menciones de la marca detectada
-        name_clean = re.sub(rf'\b{re.escape(brand_upper)}\b', '', name_upper, flags=re.IGNORECASE)
-        
-        # También eliminar submarcas relacionadas para evitar duplicaciones
-        related_brands = {
-            'HUAWEI': ['HONOR'],
-            'XIAOMI': ['REDMI', 'POCO', 'POCOPHONE', 'MI'],
-            'OPPO': ['REALME', 'ONEPLUS'],
-            'VIVO': ['IQOO'],
-            'APPLE': ['IPHONE', 'IPAD', 'MACBOOK', 'AIRPODS'],
-            'SAMSUNG': ['GALAXY'],
-            'MOTOROLA': ['MOTO']
-        }
-        
-        # Si es una marca principal, eliminar también sus submarcas
-        if brand_upper in related_brands:
-            for submarca in related_brands[brand_upper]:
-                # Solo eliminar si no es el producto principal (ej: mantener IPHONE en productos iPhone)
-                if brand_upper == 'APPLE' and submarca in ['IPHONE', 'IPAD', 'MACBOOK', 'AIRPODS']:
-                    continue  # No eliminar estos ya que son el nombre del producto
-                name_clean = re.sub(rf'\b{re.escape(submarca)}\b', '', name_clean, flags=re.IGNORECASE)
+        # Eliminar TODAS las menciones de la marca detectada y de sus submarcas
+        pattern = self.re_brand_duplication.get(brand_upper)
+        if pattern is None:
+            pattern = self._compile_brand_pattern(brand_upper)
+            self.re_brand_duplication[brand_upper] = pattern
+        name_clean = pattern.sub('', name_upper)
         
-        name_clean = re.sub(r'\s+', ' ', name_clean).strip()
+        name_clean = self.re_whitespace.sub(' ', name_clean).strip()
         return name_clean
 
+    def _compile_brand_pattern(self, brand_upper):
+        """Compila la alternancia de una marca con sus submarcas relacionadas"""
+        if brand_upper not in self.related_brands:
+            # Marcas sin submarcas (o desconocidas): solo la marca, tal cual
+            return re.compile(rf'\b{re.escape(brand_upper)}\b', re.IGNORECASE)
+        
+        words = [brand_upper]
+        for submarca in self.related_brands[brand_upper]:
+            # Solo eliminar si no es el producto principal (ej: mantener IPHONE en productos iPhone)
+            if brand_upper == 'APPLE' and submarca in ['IPHONE', 'IPAD', 'MACBOOK', 'AIRPODS']:
+                continue  # No eliminar estos ya que son el nombre del producto
+            words.append(submarca)
+        return self._word_alternation(words)
+
     def normalize_brand(self, brand, product_name=None):
         """Normaliza la marca, detectando desde el nombre del producto si es necesario"""
         if not brand or brand.upper() == 'UNKNOWN':
@@ -415,46 +751,21 @@ class DataNormalizer:
         if not name:
             return "", name
         
-        # Patrones SOLO para almacenamiento real (NO RAM)
-        storage_patterns = [
-            r'\b(128GB)\b',
-            r'\b(256GB)\b', 
-            r'\b(512GB)\b',
-            r'\b(1TB)\b',
-            r'\b(1024GB)\b',  # Convertir a 1TB
-            r'\b(2TB)\b',
-            r'\b(2048GB)\b'   # Convertir a 2TB
-        ]
-        
-        # Patrones de RAM que debemos ELIMINAR del nombre pero NO usar como capacidad
-        ram_patterns_to_remove = [
-            r'\b3GB\b',
-            r'\b4GB\b',
-            r'\b6GB\b',
-            r'\b8GB\b',
-            r'\b12GB\b',
-            r'\b16GB\b',
-            r'\b32GB\b',  # También puede ser RAM en algunos casos
-            r'\b64GB\b'   # También puede ser RAM en algunos casos
-        ]
-        
-        # Buscar SOLO almacenamiento real
-        storage_matches = []
-        for pattern in storage_patterns:
-            matches = re.findall(pattern, name, re.IGNORECASE)
-            storage_matches.extend(matches)
+        # Buscar SOLO almacenamiento real (self.storage_values)
+        storage_matches = [match.upper() for match in self.re_storage.findall(name)]
         
         # Limpiar el nombre eliminando TODA la RAM y capacidades
-        cleaned_name = name
-        for pattern in storage_patterns + ram_patterns_to_remove:
-            cleaned_name = re.sub(pattern, '', cleaned_name, flags=re.IGNORECASE)
-        
-        cleaned_name = re.sub(r'\s+', ' ', cleaned_name).strip()
+        cleaned_name = self.re_storage_and_ram.sub('', name)
+        cleaned_name = self.re_whitespace.sub(' ', cleaned_name).strip()
         
         # Si encontramos almacenamiento real, usar eso
         if storage_matches:
-            # Tomar el último (más probable que sea el almacenamiento principal)
-            storage = storage_matches[-1].upper()
+            # Tomar el último del patrón de mayor preferencia (más probable que sea
+            # el almacenamiento principal)
+            storage = max(
+                enumerate(storage_matches),
+                key=lambda item: (self.storage_priority[item[1]], item[0])
+            )[1]
             normalized_capacity = self.normalize_capacity(storage)
             return normalized_capacity, cleaned_name
         
@@ -475,10 +786,10 @@ class DataNormalizer:
             return text
         
         # Eliminar TODOS los guiones y pipes
-        text = re.sub(r'[-|]', '', text)
+        text = self.re_separators.sub('', text)
         
         # Limpiar espacios múltiples
-        text = re.sub(r'\s{2,}', ' ', text)
+        text = self.re_multi_space.sub(' ', text)
         
         # Limpiar espacios al inicio y final
         text = text.strip()
@@ -490,12 +801,47 @@ class DataNormalizer:
         if not name:
             return None
         
+        # El resultado solo depende de (nombre, marca): precio y URL se agregan al final
+        if self.cache is not None:
+            fields = self.cache.get(name, brand)
+            if fields is NormalizationCache.MISS:
+                fields = self.normalize_fields(name, brand)
+                self.cache.put(name, brand, fields)
+        else:
+            fields = self.normalize_fields(name, brand)
+        
+        return self.build_product(fields, name, price, url)
+
+    def build_product(self, fields, name, price, url):
+        """Arma el producto normalizado a partir de los campos de normalize_fields"""
+        if fields is None:
+            return None
+        
+        normalized_name, brand_info, condition, sim_type, storage_capacity = fields
+        
+        # Registro de depuración para productos seminuevos
+        if condition == 'SEMINUEVO':
+            print(f"✓ Producto SEMINUEVO detectado: {normalized_name}")
+        
+        return {
+            'normalized_name': normalized_name,
+            'original_name': name,
+            'brand': brand_info,
+            'condition': condition,
+            'sim_type': sim_type if sim_type else None,
+            'storage_capacity': storage_capacity,
+            'price': price,
+            'url': url
+        }
+
+    def normalize_fields(self, name, brand):
+        """Calcula los campos normalizados de un nombre, o None si el producto se filtra"""
         # Limpiar el nombre inicial
         original_name = name
         cleaned_name = self.clean_name(name)
         
         # Verificar explícitamente patrones de productos seminuevos
-        is_seminuevo = any(pattern in cleaned_name.upper() for pattern in ['SEMINUEVO', 'SEMI NUEVO', 'EXH', 'DE EXH'])
+        is_seminuevo = not self.seminuevo_set.isdisjoint(self.keyword_hits(cleaned_name))
         
         # Extraer información del producto
         brand_info = self.extract_brand(cleaned_name, brand)
@@ -547,28 +893,11 @@ class DataNormalizer:
         if condition not in ['NUEVO', 'SEMINUEVO']:
             return None
         
-        # FILTRO: Eliminar productos de LAMPERT
-        if 'LAMPERT' in original_name.upper():
-            return None
-        
-        # FILTRO: Eliminar productos OPEN BOX y CPO explícitamente
-        if any(term in original_name.upper() for term in ['OPEN BOX', 'CPO']):
+        # FILTRO: Eliminar productos de LAMPERT, OPEN BOX y CPO explícitamente
+        if not self.excluded_set.isdisjoint(self.keyword_hits(original_name)):
             return None
         
-        # Registro de depuración para productos seminuevos
-        if condition == 'SEMINUEVO':
-            print(f"✓ Producto SEMINUEVO detectado: {normalized_name}")
-        
-        return {
-            'normalized_name': normalized_name,
-            'original_name': original_name,
-            'brand': brand_info,
-            'condition': condition,
-            'sim_type': sim_type if sim_type else None,
-            'storage_capacity': storage_capacity,
-            'price': price,
-            'url': url
-        }
+        return normalized_name, brand_info, condition, sim_type, storage_capacity
 
     def remove_final_duplications(self, text):
         """Elimina duplicaciones finales en el texto normalizado"""
@@ -588,105 +917,102 @@ class DataNormalizer:
         
         return ' '.join(clean_words)
 
-    def normalize_store_data(self, input_file, output_file):
-        """Normaliza los datos de una tienda específica, manejando múltiples arrays JSON"""
-        try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Extraer todos los arrays JSON del contenido
-            arrays = []
-            depth_level = 0
-            start_idx = -1
+    def iter_normalized_products(self, products, stats):
+        """Normaliza los productos uno a uno (generador) y acumula contadores en `stats`"""
+        for product in products:
+            stats['total'] += 1
             
-            for i, char in enumerate(content):
-                if char == '[':
-                    if depth_level == 0:
-                        start_idx = i
-                    depth_level += 1
-                elif char == ']':
-                    depth_level -= 1
-                    if depth_level == 0 and start_idx != -1:
-                        # Extraer el array completo
-                        array_content = content[start_idx:i + 1]
-                        arrays.append(array_content)
-                        start_idx = -1
+            # Extraer campos con valores por defecto seguros
+            name = product.get('name', '')
+            price = product.get('price', '0')
+            brand = product.get('brand', '')  # Campo que puede no existir
+            store = product.get('store', '')  # Campo que puede no existir  
+            url = product.get('url', '')      # Campo que puede no existir
             
-            if not arrays:
-                print(f"⚠️ No se encontraron arrays JSON en {input_file}")
-                return 0
+            # Verificar si el nombre contiene patrones de seminuevo
+            contains_seminuevo = not self.seminuevo_set.isdisjoint(self.keyword_hits(name))
+            if contains_seminuevo:
+                print(f"👉 Producto potencialmente SEMINUEVO: {name}")
             
-            # Parsear y combinar todos los arrays
-            all_products = []
-            for j, array_str in enumerate(arrays):
-                try:
-                    array_data = json.loads(array_str)
-                    if isinstance(array_data, list):
-                        all_products.extend(array_data)
-                    else:
-                        all_products.append(array_data)
-                except json.JSONDecodeError as e:
-                    print(f"⚠️ Error parseando array {j+1} en {input_file}: {e}")
-                    continue
+            normalized_product = self.normalize_product(name, brand, price, store, url)
+            if normalized_product:  # Solo entregar si la normalización fue exitosa
+                stats['normalized'] += 1
+                
+                # Contar por condición
+                if normalized_product['condition'] == 'NUEVO':
+                    stats['nuevos'] += 1
+                elif normalized_product['condition'] == 'SEMINUEVO':
+                    stats['seminuevos'] += 1
+                
+                yield normalized_product
+            else:
+                stats['filtrados'] += 1
+
+    def normalize_store_data(self, input_file, output_file, force=False):
+        """Normaliza los datos de una tienda específica (feed JSON Lines o arrays JSON concatenados)
+        
+        Todo el camino es un generador: lectura incremental → normalización por
+        registro → escritura incremental. La memoria no crece con el tamaño del
+        archivo y los primeros productos se escriben antes de terminar de leer.
+        
+        Si el feed y las reglas no cambiaron desde la última vez (ver
+        NormalizationManifest) se conserva el archivo normalizado; force=True lo rehace.
+        """
+        if self.manifest is not None and not force:
+            entry = self.manifest.unchanged(input_file, output_file, self.rules_version)
+            if entry is not None:
+                print(f"\n⏭️ {input_file} sin cambios: se conserva {output_file} ({entry['stats']['normalized']} productos)")
+                return entry['stats']['normalized']
+        
+        writer = None
+        try:
+            print(f"\n🔍 Procesando productos de {input_file}")
             
-            if not all_products:
+            products = iter_json_records(input_file)
+            if self.profiler is not None:
+                self.profiler.reset()
+                products = self.profiler.iter_timed(products, 'json_read')
+            first_product = next(products, None)
+            if first_product is None:
                 print(f"⚠️ No se pudieron extraer productos de {input_file}")
                 return 0
             
             # Contadores para estadísticas
-            total_products = len(all_products)
-            normalized_count = 0
-            nuevos_count = 0
-            seminuevos_count = 0
-            filtrados_count = 0
+            stats = {'total': 0, 'normalized': 0, 'nuevos': 0, 'seminuevos': 0, 'filtrados': 0}
+            cache_hits, cache_misses = (self.cache.hits, self.cache.misses) if self.cache is not None else (0, 0)
             
-            print(f"\n🔍 Procesando {total_products} productos de {input_file}")
-            
-            # Normalizar todos los productos
-            normalized_data = []
-            for product in all_products:
-                # Extraer campos con valores por defecto seguros
-                name = product.get('name', '')
-                price = product.get('price', '0')
-                brand = product.get('brand', '')  # Campo que puede no existir
-                store = product.get('store', '')  # Campo que puede no existir  
-                url = product.get('url', '')      # Campo que puede no existir
-                
-                # Verificar si el nombre contiene patrones de seminuevo
-                contains_seminuevo = any(pattern in name.upper() for pattern in ['EXH', 'DE EXH', 'SEMINUEVO', 'SEMI NUEVO'])
-                if contains_seminuevo:
-                    print(f"👉 Producto potencialmente SEMINUEVO: {name}")
-                
-                normalized_product = self.normalize_product(name, brand, price, store, url)
-                if normalized_product:  # Solo agregar si la normalización fue exitosa
-                    normalized_data.append(normalized_product)
-                    normalized_count += 1
-                    
-                    # Contar por condición
-                    if normalized_product['condition'] == 'NUEVO':
-                        nuevos_count += 1
-                    elif normalized_product['condition'] == 'SEMINUEVO':
-                        seminuevos_count += 1
-                else:
-                    filtrados_count += 1
-            
-            # Crear directorio de salida si no existe
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(normalized_data, f, ensure_ascii=False, indent=2)
+            writer = NormalizedJsonWriter(output_file)
+            if self.profiler is not None:
+                self.profiler.instrument(writer, ['write'], prefix='json_')
+            for normalized_product in self.iter_normalized_products(itertools.chain([first_product], products), stats):
+                writer.write(normalized_product)
+            writer.close()
+            self.save_cache()
+            if self.manifest is not None:
+                self.manifest.record(input_file, output_file, self.rules_version, stats)
+                self.manifest.save()
             
             # Mostrar estadísticas detalladas
             print(f"✅ Normalizado {input_file} → {output_file}")
-            print(f"   📊 Total productos originales: {total_products}")
-            print(f"   ✓ Productos normalizados: {normalized_count}")
-            print(f"   🆕 Productos NUEVOS: {nuevos_count}")
-            print(f"   🔄 Productos SEMINUEVOS: {seminuevos_count}")
-            print(f"   ❌ Productos filtrados: {filtrados_count}")
+            print(f"   📊 Total productos originales: {stats['total']}")
+            print(f"   ✓ Productos normalizados: {stats['normalized']}")
+            print(f"   🆕 Productos NUEVOS: {stats['nuevos']}")
+            print(f"   🔄 Productos SEMINUEVOS: {stats['seminuevos']}")
+            print(f"   ❌ Productos filtrados: {stats['filtrados']}")
+            if self.cache is not None:
+                print(f"   ⚡ Caché de normalización: {self.cache.hits - cache_hits} aciertos, "
+                      f"{self.cache.misses - cache_misses} calculados")
+            if self.profiler is not None:
+                store_name = os.path.basename(input_file).split('.')[0]
+                self.profiler.report(store_name)
+                self.profiler.save(profile_file(store_name), archivo=input_file, productos=stats['total'])
             
-            return len(normalized_data)
+            return writer.count
             
         except Exception as e:
+            # Conservar el archivo normalizado anterior si algo falla a mitad de camino
+            if writer is not None and not writer.file.closed:
+                writer.abort()
             print(f"❌ Error procesando {input_file}: {str(e)}")
             return 0
 
@@ -699,13 +1025,10 @@ class DataNormalizer:
         cleaned = self.remove_accents(name).upper()
         
         # Limpiar EXH ANTES de otras operaciones - MEJORADO para capturar más patrones
-        cleaned = re.sub(r'\bDE\s+EXH\s*PREMIUM\b', 'SEMINUEVO', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r'\bDE\s+EXH\b', 'SEMINUEVO', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r'\bEXH\s*PREMIUM\b', 'SEMINUEVO', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r'\bEXH\b', 'SEMINUEVO', cleaned, flags=re.IGNORECASE)
+        cleaned = self.re_exh.sub('SEMINUEVO', cleaned)
         
         # Limpiar espacios múltiples
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        cleaned = self.re_whitespace.sub(' ', cleaned).strip()
         
         return cleaned
 
@@ -736,13 +1059,11 @@ class DataNormalizer:
         # Limpiar separadores múltiples (elimina todos los guiones)
         cleaned = self.clean_multiple_separators(cleaned)
         
-        # Eliminar palabras sueltas comunes que quedan
-        words_to_clean = ['ALL', 'DE', 'LA', 'EL', 'UN', 'UNA']
-        for word in words_to_clean:
-            cleaned = re.sub(rf'\b{re.escape(word)}\b', '', cleaned, flags=re.IGNORECASE)
+        # Eliminar palabras sueltas comunes que quedan (self.final_words_to_clean)
+        cleaned = self.re_final_words.sub('', cleaned)
         
         # Limpiar espacios finales
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        cleaned = self.re_whitespace.sub(' ', cleaned).strip()
         
         return cleaned.strip()
 
@@ -754,16 +1075,411 @@ class DataNormalizer:
             return normalized_capacity, cleaned_name
         return "", name
 
+class NormalizedJsonWriter:
+    """Escribe un array JSON registro a registro, con el mismo formato que json.dump(indent=2)"""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.tmp_file = f"{output_file}.tmp"
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        self.file = open(self.tmp_file, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, record):
+        """Agrega un registro al array"""
+        text = json.dumps(record, ensure_ascii=False, indent=2)
+        self.file.write('[\n  ' if self.count == 0 else ',\n  ')
+        self.file.write(text.replace('\n', '\n  '))
+        self.count += 1
+
+    def close(self):
+        """Cierra el array y reemplaza el archivo de salida de forma atómica"""
+        self.file.write('\n]' if self.count else '[]')
+        self.file.close()
+        os.replace(self.tmp_file, self.output_file)
+
+    def abort(self):
+        """Descarta lo escrito y deja intacto el archivo de salida anterior"""
+        self.file.close()
+        if os.path.exists(self.tmp_file):
+            os.remove(self.tmp_file)
+
+class KeywordAutomaton:
+    """Autómata Aho-Corasick: encuentra todas las palabras clave de un texto en una sola pasada
+    
+    Las transiciones se precalculan para cada estado (incluyendo los enlaces de
+    fallo), así que recorrer un nombre cuesta un acceso a diccionario por
+    carácter sin importar cuántas palabras clave haya.
+    """
+    
+    def __init__(self, keywords):
+        goto = [{}]
+        outputs = [[]]
+        for keyword in dict.fromkeys(keywords):
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(keyword)
+        
+        # Enlaces de fallo por niveles (BFS) y transiciones completas por estado
+        alphabet = {char for keyword in keywords for char in keyword}
+        fail = [0] * len(goto)
+        self.transitions = [None] * len(goto)
+        self.transitions[0] = {char: goto[0].get(char, 0) for char in alphabet}
+        queue = list(goto[0].values())
+        for state in queue:
+            fail_state = fail[state]
+            outputs[state] = outputs[state] + outputs[fail_state]
+            self.transitions[state] = dict(self.transitions[fail_state])
+            for char, next_state in goto[state].items():
+                fail[next_state] = self.transitions[fail_state][char] if state else 0
+                self.transitions[state][char] = next_state
+                queue.append(next_state)
+        # La raíz ya tiene las transiciones de primer nivel: sus hijos fallan a 0
+        for char, next_state in goto[0].items():
+            fail[next_state] = 0
+        self.outputs = [tuple(output) for output in outputs]
+    
+    def find(self, text):
+        """Devuelve el conjunto de palabras clave que aparecen en `text`"""
+        transitions = self.transitions
+        outputs = self.outputs
+        found = set()
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+class NormalizationCache:
+    """Caché LRU acotada de normalize_product persistida en JSON entre ejecuciones
+    
+    Las entradas se guardan junto con la versión de reglas del normalizador; si
+    la versión del archivo no coincide, se descarta entera al cargar.
+    """
+    
+    MISS = object()
+    
+    def __init__(self, cache_file, version, max_entries=CACHE_SIZE):
+        self.cache_file = cache_file
+        self.version = version
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        # Entradas nuevas para take_new (None = no se registran; ver track_new)
+        self.new_entries = None
+        for key, fields in self._load():
+            self.entries[key] = fields
+        self._trim()
+    
+    def get(self, name, brand):
+        fields = self.entries.get((name, brand), self.MISS)
+        if fields is self.MISS:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end((name, brand))
+        return fields
+    
+    def put(self, name, brand, fields):
+        self.entries[(name, brand)] = fields
+        self.entries.move_to_end((name, brand))
+        self.dirty = True
+        if self.new_entries is not None:
+            self.new_entries[(name, brand)] = fields
+        self._trim()
+    
+    def track_new(self):
+        """Empieza a registrar las entradas nuevas (workers que no guardan la caché por su cuenta)"""
+        if self.new_entries is None:
+            self.new_entries = {}
+    
+    def take_new(self):
+        """Entradas [nombre, marca, campos] agregadas desde la última llamada"""
+        new = [[name, brand, fields] for (name, brand), fields in (self.new_entries or {}).items()]
+        if self.new_entries is not None:
+            self.new_entries = {}
+        return new
+    
+    def merge(self, entries):
+        """Agrega entradas de take_new de otro proceso"""
+        for name, brand, fields in entries:
+            self.put(name, brand, tuple(fields) if fields is not None else None)
+    
+    def save(self):
+        """Escritura atómica; conserva lo que otros procesos guardaron con la misma versión"""
+        if not self.cache_file or not self.dirty:
+            return
+        merged = OrderedDict(self._load())
+        for key, fields in self.entries.items():
+            merged.pop(key, None)
+            merged[key] = fields
+        while len(merged) > self.max_entries:
+            merged.popitem(last=False)
+        
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        # Un temporal por proceso: varios workers pueden guardar a la vez
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.version,
+                'entries': [[name, brand, fields] for (name, brand), fields in merged.items()]
+            }, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+        self.dirty = False
+    
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return []
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if data.get('version') != self.version:
+            return []
+        return [((name, brand), tuple(fields) if fields is not None else None)
+                for name, brand, fields in data.get('entries', [])]
+    
+    def _trim(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+# Una caché por archivo y versión de reglas en cada proceso: los normalizadores que conviven
+# (un NormalizationPipeline por spider en el mismo CrawlerProcess) la cargan una sola vez
+_SHARED_CACHES = {}
+
+def shared_cache(cache_file, version, max_entries=CACHE_SIZE):
+    """NormalizationCache compartida del proceso para (cache_file, version); sin archivo, una propia"""
+    if not cache_file:
+        return NormalizationCache(cache_file, version, max_entries)
+    key = (os.path.abspath(cache_file), version)
+    cache = _SHARED_CACHES.get(key)
+    if cache is None:
+        cache = _SHARED_CACHES[key] = NormalizationCache(cache_file, version, max_entries)
+    elif max_entries > cache.max_entries:
+        cache.max_entries = max_entries
+    return cache
+
+class NormalizationManifest:
+    """Manifiesto JSON de la última normalización de cada archivo de salida
+
+    Guarda el hash SHA-256 del feed de entrada, la versión de reglas y el tamaño y
+    la fecha de modificación de la salida. Si nada de eso cambió, volver a
+    normalizar daría el mismo archivo y se puede conservar el existente.
+    """
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.entries = self._load()
+        self.updated = {}
+        # (ruta, tamaño, mtime) → hash: cada feed se lee una sola vez por ejecución
+        self._hashes = {}
+
+    def input_hash(self, input_file):
+        stat = os.stat(input_file)
+        key = (os.path.abspath(input_file), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            digest = hashlib.sha256()
+            with open(input_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            self._hashes[key] = digest.hexdigest()
+        return self._hashes[key]
+
+    def unchanged(self, input_file, output_file, rules_version):
+        """Entrada del manifiesto si la salida sigue vigente, o None si hay que normalizar"""
+        entry = self.entries.get(self._key(output_file))
+        if entry is None or entry['rules_version'] != rules_version:
+            return None
+        if not os.path.exists(input_file) or not os.path.exists(output_file):
+            return None
+        # La salida pudo reescribirse por otro camino (ej: el pipeline de Scrapy)
+        stat = os.stat(output_file)
+        if [stat.st_size, stat.st_mtime_ns] != [entry['output_size'], entry['output_mtime_ns']]:
+            return None
+        if self.input_hash(input_file) != entry['input_hash']:
+            return None
+        return entry
+
+    def record(self, input_file, output_file, rules_version, stats):
+        """Registra una normalización completa de `input_file` en `output_file`"""
+        stat = os.stat(output_file)
+        self.updated[self._key(output_file)] = self.entries[self._key(output_file)] = {
+            'input_file': input_file,
+            'input_hash': self.input_hash(input_file),
+            'rules_version': rules_version,
+            'output_size': stat.st_size,
+            'output_mtime_ns': stat.st_mtime_ns,
+            'stats': {key: stats[key] for key in ('total', 'normalized', 'nuevos', 'seminuevos', 'filtrados')},
+            'updated': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def save(self):
+        """Escritura atómica; conserva las entradas que otros procesos guardaron"""
+        if not self.manifest_file or not self.updated:
+            return
+        merged = self._load()
+        merged.update(self.updated)
+        os.makedirs(os.path.dirname(self.manifest_file) or '.', exist_ok=True)
+        tmp_file = f'{self.manifest_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+        self.entries = merged
+        self.updated = {}
+
+    def _key(self, output_file):
+        return os.path.normpath(os.path.abspath(output_file))
+
+    def _load(self):
+        if not self.manifest_file or not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+class StageProfiler:
+    """Llamadas, tiempo acumulado y entradas más lentas de cada etapa de la normalización"""
+
+    def __init__(self, slowest=5, keep_samples=False):
+        self.slowest = slowest
+        # keep_samples guarda cada duración (percentiles del benchmark); el perfilado normal solo suma
+        self.keep_samples = keep_samples
+        self.reset()
+
+    def reset(self):
+        # etapa → [llamadas, segundos, heap de (segundos, entrada) con las más lentas]
+        self.stages = {}
+        # etapa → [segundos de cada llamada] (solo con keep_samples)
+        self.samples = {}
+
+    def instrument(self, obj, stages, prefix=''):
+        """Reemplaza los métodos `stages` de `obj` por versiones cronometradas (atributos de instancia)"""
+        for stage in stages:
+            method = getattr(obj, stage, None)
+            if method is not None:
+                setattr(obj, stage, self._timed(prefix + stage, method))
+
+    def restore(self, obj, stages):
+        """Deshace instrument(): quita las versiones cronometradas y vuelven los métodos de la clase"""
+        for stage in stages:
+            obj.__dict__.pop(stage, None)
+
+    def _timed(self, stage, method):
+        clock = time.perf_counter
+        record = self.record
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(stage, clock() - start, args[0] if args else None)
+        return timed
+
+    def iter_timed(self, iterable, stage):
+        """Recorre un iterable cronometrando cada next() (ej: lectura del feed)"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            self.record(stage, time.perf_counter() - start, item)
+            yield item
+
+    def record(self, stage, seconds, entry=None):
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = [0, 0.0, []]
+        totals[0] += 1
+        totals[1] += seconds
+        if self.keep_samples:
+            self.samples.setdefault(stage, []).append(seconds)
+        slowest = totals[2]
+        if len(slowest) < self.slowest:
+            heapq.heappush(slowest, (seconds, self._describe(entry)))
+        elif seconds > slowest[0][0]:
+            heapq.heapreplace(slowest, (seconds, self._describe(entry)))
+
+    def _describe(self, entry):
+        """Texto de la entrada: el nombre del producto, o un resumen si es un lote o un registro"""
+        if isinstance(entry, str):
+            return entry
+        if isinstance(entry, dict):
+            return str(entry.get('original_name') or entry.get('name') or '')
+        if isinstance(entry, list):
+            # Tokens de un nombre (motor de tokens) o un lote de productos/nombres
+            if all(isinstance(token, str) and ' ' not in token for token in entry):
+                return ' '.join(entry)
+            return f'<lote de {len(entry)}>'
+        return ''
+
+    def to_dict(self):
+        return {
+            stage: {
+                'llamadas': calls,
+                'segundos': round(seconds, 6),
+                'mas_lentos': [{'segundos': round(t, 6), 'entrada': entry} for t, entry in sorted(slowest, reverse=True)]
+            }
+            for stage, (calls, seconds, slowest) in self.stages.items()
+        }
+
+    def merge(self, data):
+        """Suma un perfil de to_dict() (ej: el de cada fragmento de la normalización paralela)"""
+        for stage, values in data.items():
+            totals = self.stages.setdefault(stage, [0, 0.0, []])
+            totals[0] += values['llamadas']
+            totals[1] += values['segundos']
+            slowest = totals[2] + [(item['segundos'], item['entrada']) for item in values['mas_lentos']]
+            totals[2] = heapq.nlargest(self.slowest, slowest)
+            heapq.heapify(totals[2])
+
+    def report(self, title):
+        """Imprime la tabla de etapas ordenada por tiempo acumulado"""
+        print(f"   🔬 Perfil por etapa de {title} (tiempo inclusivo):")
+        for stage, (calls, seconds, slowest) in sorted(self.stages.items(), key=lambda item: -item[1][1]):
+            slowest_entry = max(slowest)[1] if slowest else ''
+            print(f"      {stage:<32} {calls:>8} llamadas {seconds:>9.3f}s "
+                  f"{seconds / calls * 1e6 if calls else 0:>9.1f}µs/llamada  más lenta: {slowest_entry[:50]!r}")
+
+    def save(self, output_file, **extra):
+        """Guarda el perfil como JSON (con los datos de `extra`, ej: archivo y productos)"""
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(extra, fecha=datetime.now().isoformat(timespec='seconds'), etapas=self.to_dict()),
+                      f, ensure_ascii=False, indent=2)
+        print(f"   📁 Perfil guardado en {output_file}")
+
+def create_normalizer(engine=None, **kwargs):
+    """Crea el normalizador del motor indicado (por defecto NORMALIZE_ENGINE)"""
+    engine = engine or NORMALIZE_ENGINE
+    if engine == 'tokens':
+        # Import diferido: token_normalize importa este módulo
+        from token_normalize import TokenNormalizer
+        return TokenNormalizer(**kwargs)
+    if engine != 'regex':
+        raise ValueError(f"Motor de normalización desconocido: {engine} (usar 'regex' o 'tokens')")
+    return DataNormalizer(**kwargs)
+
 def main():
-    normalizer = DataNormalizer()
+    # Import diferido: parallel_normalize importa este módulo
+    from parallel_normalize import normalizar_tiendas
     
     # Configuración de archivos
     stores = {
-        'clevercel': 'price_comparison/results_scrap/clevercel.json',
-        'itech': 'price_comparison/results_scrap/itech.json',
-        'phoneelectric': 'price_comparison/results_scrap/phoneelectric.json',
-        'tooho': 'price_comparison/results_scrap/tooho.json',
-        'celudmovil': 'price_comparison/results_scrap/celudmovil.json'
+        store_name: scrap_file(store_name)
+        for store_name in ['clevercel', 'itech', 'phoneelectric', 'tooho', 'celudmovil']
     }
     
     total_products = 0
@@ -771,20 +1487,12 @@ def main():
     
     print("🔄 Iniciando normalización de datos...\n")
     
-    for store_name, input_file in stores.items():
-        output_file = f'price_comparison/results_normalized/{store_name}_normalized.json'
-        count = normalizer.normalize_store_data(input_file, output_file)
-        total_products += count
-        
-        # Contar productos seminuevos en el archivo normalizado
-        try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                normalized_data = json.load(f)
-                seminuevos = sum(1 for item in normalized_data if item.get('condition') == 'SEMINUEVO')
-                total_seminuevos += seminuevos
-                print(f"   📱 {store_name}: {seminuevos} productos SEMINUEVOS de {count} totales")
-        except Exception as e:
-            print(f"   ⚠️ Error contando seminuevos en {output_file}: {str(e)}")
+    # Las tiendas (y los fragmentos de las tiendas grandes) se normalizan en paralelo
+    resultados = normalizar_tiendas(stores, 'price_comparison/results_normalized')
+    for store_name, resultado in resultados.items():
+        total_products += resultado['productos']
+        total_seminuevos += resultado['seminuevos']
+        print(f"   📱 {store_name}: {resultado['seminuevos']} productos SEMINUEVOS de {resultado['productos']} totales")
     
     print(f"\n✅ Normalización completada!")
     print(f"📊 Total de productos normalizados: {total_products}")
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NORMALIZACIÓN PARALELA
+======================
+
+Reparte la normalización de las tiendas entre varios procesos
+(ProcessPoolExecutor). Cada tienda es una tarea y los feeds JSON Lines
+grandes se dividen además en fragmentos por rango de bytes, así una tienda
+enorme también aprovecha varios núcleos. Cada fragmento deja un archivo
+parcial y los parciales se combinan en orden (tienda y fragmento), por lo que
+el archivo normalizado es idéntico al de DataNormalizer.normalize_store_data.
+
+El número de workers se toma de --workers, de la variable de entorno
+NORMALIZE_WORKERS o, si no hay ninguno, de la cantidad de núcleos. El motor
+de normalización de cada worker se elige con NORMALIZE_ENGINE (regex o tokens).
+Con --perfil (o NORMALIZE_PROFILE=1) cada worker perfila sus fragmentos y los
+perfiles se suman por tienda.
+
+Las tiendas cuyo feed y reglas no cambiaron desde la última normalización
+(normalize_manifest.json) conservan su archivo normalizado; --forzar las rehace.
+
+Ejecutar con:
+    python parallel_normalize.py [--workers 4]
+    python parallel_normalize.py --benchmark
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from normalize_data import (
+    CACHE_FILE, CACHE_SIZE, MANIFEST_FILE, NormalizationManifest, NormalizedJsonWriter, StageProfiler,
+    create_normalizer, iter_json_records, iter_jsonl_range, profile_file, scrap_file, split_jsonl
+)
+
+TIENDAS = ['clevercel', 'itech', 'phoneelectric', 'tooho', 'celudmovil', 'celetiene', 'celucambio']
+CARPETA_NORMALIZED = 'price_comparison/results_normalized'
+
+# Los feeds JSON Lines más grandes que esto se parten en fragmentos de este tamaño
+FRAGMENTO_BYTES = 2 * 1024 * 1024
+
+# Workers por defecto (0 o vacío = un worker por núcleo)
+WORKERS = int(os.environ.get('NORMALIZE_WORKERS') or 0) or None
+
+# Normalizador de cada proceso worker (se crea una sola vez en _iniciar_worker)
+_normalizer = None
+
+
+def _iniciar_worker(cache_file, cache_size, perfil=None):
+    """Crea el normalizador del worker: las regex y la caché se cargan una vez por proceso"""
+    global _normalizer
+    # El manifiesto y el guardado de la caché los lleva el proceso principal
+    _normalizer = create_normalizer(cache_file=cache_file, cache_size=cache_size, profile=perfil, manifest_file=None)
+    if _normalizer.cache is not None:
+        _normalizer.cache.track_new()
+
+
+def _normalizar_fragmento(tarea):
+    """Normaliza un fragmento (o una tienda entera) y lo deja en un archivo parcial JSON Lines"""
+    # Tiempo de CPU del proceso: con más workers que núcleos el tiempo real se infla
+    inicio = time.process_time()
+    stats = {'total': 0, 'normalized': 0, 'nuevos': 0, 'seminuevos': 0, 'filtrados': 0}
+
+    if tarea['inicio'] is None:
+        productos = iter_json_records(tarea['entrada'])
+    else:
+        productos = iter_jsonl_range(tarea['entrada'], tarea['inicio'], tarea['fin'])
+    if _normalizer.profiler is not None:
+        _normalizer.profiler.reset()
+        productos = _normalizer.profiler.iter_timed(productos, 'json_read')
+
+    # Los mensajes por producto de varios procesos saldrían mezclados: se descartan
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        with open(tarea['parcial'], 'w', encoding='utf-8') as f:
+            for producto in _normalizer.iter_normalized_products(productos, stats):
+                f.write(json.dumps(producto, ensure_ascii=False))
+                f.write('\n')
+
+    stats['duracion'] = time.process_time() - inicio
+    # Las entradas nuevas de la caché vuelven al proceso principal, que guarda una sola vez
+    stats['cache'] = _normalizer.cache.take_new() if _normalizer.cache is not None else []
+    if _normalizer.profiler is not None:
+        stats['perfil'] = _normalizer.profiler.to_dict()
+    return stats
+
+
+def planificar_tareas(stores, carpeta_salida, fragmento_bytes=FRAGMENTO_BYTES):
+    """Arma las tareas de cada tienda: una por fragmento JSON Lines, o una sola para el formato legacy"""
+    tareas_por_tienda = {}
+    for store_name, entrada in stores.items():
+        if not os.path.exists(entrada):
+            print(f"[ADVERTENCIA] Archivo no encontrado: {entrada}")
+            continue
+
+        salida = os.path.join(carpeta_salida, f'{store_name}_normalized.json')
+        rangos = split_jsonl(entrada, fragmento_bytes)
+        if rangos is None:
+            rangos = [(None, None)]
+
+        tareas_por_tienda[store_name] = [
+            {
+                'tienda': store_name,
+                'entrada': entrada,
+                'salida': salida,
+                'inicio': inicio,
+                'fin': fin,
+                'parcial': f'{salida}.part{i}',
+                'bytes': (fin - inicio) if inicio is not None else os.path.getsize(entrada)
+            }
+            for i, (inicio, fin) in enumerate(rangos)
+        ]
+    return tareas_por_tienda
+
+
+def _borrar_parciales(tareas):
+    for tarea in tareas:
+        if os.path.exists(tarea['parcial']):
+            os.remove(tarea['parcial'])
+
+
+def _combinar_tienda(store_name, tareas, futuros, cache=None):
+    """Espera los fragmentos de una tienda y los une en orden en su archivo normalizado
+
+    Las entradas de caché que calcularon los workers se agregan a `cache` (si hay).
+    """
+    resultado = {'productos': 0, 'total': 0, 'nuevos': 0, 'seminuevos': 0, 'filtrados': 0,
+                 'fragmentos': len(tareas), 'duracion': 0.0, 'error': None}
+    writer = None
+    perfil = None
+    try:
+        for tarea in tareas:
+            stats = futuros[id(tarea)].result()
+            if cache is not None:
+                cache.merge(stats['cache'])
+            for clave in ('total', 'nuevos', 'seminuevos', 'filtrados', 'duracion'):
+                resultado[clave] += stats[clave]
+            if 'perfil' in stats:
+                perfil = perfil or StageProfiler()
+                perfil.merge(stats['perfil'])
+
+        # Sin productos (feed vacío) se conserva el archivo anterior, igual que normalize_store_data
+        if resultado['total'] == 0:
+            print(f"⚠️ No se pudieron extraer productos de {tareas[0]['entrada'] if tareas else store_name}")
+            return resultado
+
+        writer = NormalizedJsonWriter(tareas[0]['salida'])
+        if perfil is not None:
+            perfil.instrument(writer, ['write'], prefix='json_')
+        for tarea in tareas:
+            with open(tarea['parcial'], 'r', encoding='utf-8') as f:
+                for linea in f:
+                    writer.write(json.loads(linea))
+        writer.close()
+        resultado['productos'] = writer.count
+
+        print(f"✅ Normalizado {tareas[0]['entrada']} → {tareas[0]['salida']} "
+              f"({len(tareas)} fragmento{'s' if len(tareas) != 1 else ''})")
+        print(f"   📊 Total productos originales: {resultado['total']}")
+        print(f"   ✓ Productos normalizados: {resultado['productos']}")
+        print(f"   🆕 Productos NUEVOS: {resultado['nuevos']}")
+        print(f"   🔄 Productos SEMINUEVOS: {resultado['seminuevos']}")
+        print(f"   ❌ Productos filtrados: {resultado['filtrados']}")
+        if perfil is not None:
+            perfil.report(store_name)
+            perfil.save(profile_file(store_name), archivo=tareas[0]['entrada'], productos=resultado['total'],
+                        fragmentos=len(tareas))
+    except Exception as e:
+        # Conservar el archivo normalizado anterior si algún fragmento falló
+        if writer is not None and not writer.file.closed:
+            writer.abort()
+        resultado['error'] = str(e)
+        print(f"❌ Error procesando {store_name}: {str(e)}")
+    finally:
+        _borrar_parciales(tareas)
+    return resultado
+
+
+def _tiendas_sin_cambios(stores, carpeta_salida, manifest, rules_version):
+    """{tienda: resultado} de las tiendas cuyo feed y reglas no cambiaron desde la última normalización"""
+    omitidas = {}
+    for store_name, entrada in stores.items():
+        salida = os.path.join(carpeta_salida, f'{store_name}_normalized.json')
+        entry = manifest.unchanged(entrada, salida, rules_version)
+        if entry is None:
+            continue
+        stats = entry['stats']
+        omitidas[store_name] = {'productos': stats['normalized'], 'total': stats['total'], 'nuevos': stats['nuevos'],
+                                'seminuevos': stats['seminuevos'], 'filtrados': stats['filtrados'],
+                                'fragmentos': 0, 'duracion': 0.0, 'error': None, 'omitida': True}
+        print(f"⏭️ {store_name}: {entrada} sin cambios, se conserva {salida} ({stats['normalized']} productos)")
+    return omitidas
+
+
+def normalizar_tiendas(stores, carpeta_salida=CARPETA_NORMALIZED, workers=WORKERS,
+                       fragmento_bytes=FRAGMENTO_BYTES, cache_file=CACHE_FILE, cache_size=CACHE_SIZE, perfil=None,
+                       manifest_file=MANIFEST_FILE, forzar=False):
+    """Normaliza {tienda: feed} en paralelo y devuelve {tienda: resultado} en el mismo orden
+
+    perfil=None usa NORMALIZE_PROFILE; True/False lo fuerza en todos los workers.
+    Con manifest_file, las tiendas sin cambios se omiten (salvo forzar=True).
+    """
+    workers = workers or os.cpu_count() or 1
+    manifest = NormalizationManifest(manifest_file) if manifest_file else None
+    omitidas = {}
+    rules_version = None
+    normalizador = None
+    if manifest is not None or (cache_file and cache_size):
+        # Versión de reglas y caché del proceso principal: los workers le devuelven sus entradas nuevas
+        normalizador = create_normalizer(cache_file=cache_file, cache_size=cache_size, manifest_file=None)
+        rules_version = normalizador.rules_version
+    if manifest is not None:
+        if not forzar:
+            omitidas = _tiendas_sin_cambios(stores, carpeta_salida, manifest, rules_version)
+
+    tareas_por_tienda = planificar_tareas(
+        {store_name: entrada for store_name, entrada in stores.items() if store_name not in omitidas},
+        carpeta_salida, fragmento_bytes
+    )
+    todas = [tarea for tareas in tareas_por_tienda.values() for tarea in tareas]
+    if not todas:
+        resultados = {store_name: _combinar_tienda(store_name, [], {}) for store_name in tareas_por_tienda}
+        return _en_orden(stores, resultados, omitidas)
+
+    os.makedirs(carpeta_salida, exist_ok=True)
+    inicio = time.time()
+    resultados = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(todas)), initializer=_iniciar_worker,
+                             initargs=(cache_file, cache_size, perfil)) as pool:
+        # Los fragmentos más grandes primero reparten mejor la carga entre workers
+        futuros = {}
+        for tarea in sorted(todas, key=lambda tarea: tarea['bytes'], reverse=True):
+            futuros[id(tarea)] = pool.submit(_normalizar_fragmento, tarea)
+
+        # Combinar en orden mientras los workers siguen con las tiendas siguientes
+        for store_name, tareas in tareas_por_tienda.items():
+            resultados[store_name] = _combinar_tienda(store_name, tareas, futuros,
+                                                      normalizador.cache if normalizador is not None else None)
+            resultado = resultados[store_name]
+            if manifest is not None and resultado['error'] is None and resultado['total'] > 0:
+                manifest.record(stores[store_name], tareas[0]['salida'], rules_version,
+                                dict(resultado, normalized=resultado['productos']))
+    if manifest is not None:
+        manifest.save()
+    if normalizador is not None:
+        normalizador.save_cache()
+
+    duracion = time.time() - inicio
+    trabajo = sum(resultado['duracion'] for resultado in resultados.values())
+    print(f"\n⏱️ Normalización paralela: {len(todas)} tareas en {workers} workers, "
+          f"{duracion:.2f}s reales para {trabajo:.2f}s de CPU "
+          f"(speedup {trabajo / duracion if duracion else 1:.2f}x)")
+    return _en_orden(stores, resultados, omitidas)
+
+
+def _en_orden(stores, resultados, omitidas):
+    """Resultados normalizados y omitidos en el orden de `stores`"""
+    return {store_name: resultados.get(store_name) or omitidas[store_name]
+            for store_name in stores if store_name in resultados or store_name in omitidas}
+
+
+def medir_speedup(stores, max_workers=None, fragmento_bytes=FRAGMENTO_BYTES):
+    """Normaliza lo mismo con 1, 2, 4... workers (sin caché) e imprime el speedup de cada uno"""
+    max_workers = max_workers or os.cpu_count() or 1
+    conteos = []
+    workers = 1
+    while workers < max_workers:
+        conteos.append(workers)
+        workers *= 2
+    conteos.append(max_workers)
+
+    print(f"🏁 Midiendo speedup con {conteos} workers ({os.cpu_count()} núcleos disponibles)")
+    tiempos = {}
+    productos = 0
+    for workers in conteos:
+        inicio = time.time()
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            resultados = normalizar_tiendas(stores, workers=workers, fragmento_bytes=fragmento_bytes, cache_size=0,
+                                            manifest_file=None)
+        tiempos[workers] = time.time() - inicio
+        productos = sum(resultado['total'] for resultado in resultados.values())
+
+    print("-" * 52)
+    print(f"{'Workers':>8} {'Segundos':>10} {'Productos/s':>14} {'Speedup':>10}")
+    for workers in conteos:
+        print(f"{workers:>8} {tiempos[workers]:>10.2f} {productos / tiempos[workers]:>14,.0f} "
+              f"{tiempos[conteos[0]] / tiempos[workers]:>9.2f}x")
+    print("-" * 52)
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalización paralela de las tiendas")
+    parser.add_argument("tiendas", nargs="*", help="Tiendas a normalizar (por defecto todas)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Procesos worker (por defecto uno por núcleo)")
+    parser.add_argument("--fragmento-mb", type=float, default=FRAGMENTO_BYTES / (1024 * 1024),
+                        help="Tamaño de fragmento para partir los feeds JSON Lines grandes")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Medir el speedup con 1, 2, 4... workers hasta --workers")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Normalizar también las tiendas cuyo feed y reglas no cambiaron")
+    parser.add_argument("--perfil", action="store_true", default=None,
+                        help="Perfilar cada etapa y guardar un perfil por tienda en price_comparison/profiles")
+    args = parser.parse_args()
+
+    stores = {store_name: scrap_file(store_name) for store_name in (args.tiendas or TIENDAS)}
+    fragmento_bytes = int(args.fragmento_mb * 1024 * 1024)
+
+    if args.benchmark:
+        medir_speedup(stores, args.workers, fragmento_bytes)
+        return
+
+    resultados = normalizar_tiendas(stores, workers=args.workers, fragmento_bytes=fragmento_bytes, perfil=args.perfil,
+                                    forzar=args.forzar)
+    total = sum(resultado['productos'] for resultado in resultados.values())
+    print(f"[OK] Normalizacion completada! Total: {total} productos")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,110 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import os
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
 
 
 class PriceComparisonPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class NormalizationPipeline:
+    """Normaliza cada producto apenas se extrae y lo escribe en results_normalized/<spider>_normalized.json
+
+    Así la normalización se solapa con el crawling (que está limitado por red) y
+    no hace falta releer el JSON crudo al final. El item sigue su camino sin
+    cambios, por lo que el feed crudo de results_scrap se genera igual que antes.
+    """
+
+    def __init__(self, crawler, output_dir):
+        self.crawler = crawler
+        self.output_dir = output_dir
+        self.normalizer = None
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("NORMALIZE_IN_PIPELINE"):
+            raise NotConfigured
+        # normalize_data.py vive en la raíz del repositorio: importable cuando el crawl
+        # se lanza desde ahí (crawl_engine.py, run_complete_process.py)
+        try:
+            import normalize_data
+        except ImportError:
+            raise NotConfigured("normalize_data no es importable: lanzar el crawl con crawl_engine.py")
+        pipeline = cls(crawler, crawler.settings.get("NORMALIZED_OUTPUT_DIR"))
+        pipeline.normalize_data = normalize_data
+        # La razón de cierre solo llega con spider_closed (después de close_spider)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(pipeline.engine_stopped, signal=signals.engine_stopped)
+        return pipeline
+
+    def open_spider(self, spider=None):
+        spider = spider or self.crawler.spider
+        self.normalizer = self.normalize_data.create_normalizer()
+        self.output_file = os.path.join(self.output_dir, f"{spider.name}_normalized.json")
+        self.writer = self.normalize_data.NormalizedJsonWriter(self.output_file)
+        self.total_count = 0
+        self.nuevos_count = 0
+        self.seminuevos_count = 0
+        self.filtrados_count = 0
+
+    def process_item(self, item, spider=None):
+        adapter = ItemAdapter(item)
+        self.total_count += 1
+
+        # Mismos valores por defecto que DataNormalizer.normalize_store_data
+        normalized_product = self.normalizer.normalize_product(
+            adapter.get('name') or '',
+            adapter.get('brand') or '',
+            adapter.get('price', '0'),
+            adapter.get('store') or '',
+            adapter.get('url') or ''
+        )
+        if normalized_product:
+            self.writer.write(normalized_product)
+            if normalized_product['condition'] == 'NUEVO':
+                self.nuevos_count += 1
+            elif normalized_product['condition'] == 'SEMINUEVO':
+                self.seminuevos_count += 1
+        else:
+            self.filtrados_count += 1
+        return item
+
+    def close_spider(self, spider=None):
+        if self.total_count:
+            stats = self.crawler.stats
+            stats.set_value("normalizacion/productos", self.writer.count)
+            stats.set_value("normalizacion/filtrados", self.filtrados_count)
+
+    def spider_closed(self, spider, reason):
+        # Sin productos (spider caído o tienda vacía) o con un crawl incompleto (shutdown,
+        # closespider, timeout) se conserva el archivo anterior completo
+        if self.writer is None:
+            return
+        if self.total_count == 0:
+            self.writer.abort()
+            spider.logger.warning(f"Sin productos para normalizar; se conserva {self.output_file}")
+            return
+        if reason != "finished":
+            self.writer.abort()
+            spider.logger.warning(f"Crawl incompleto ({reason}); se descartan {self.writer.count} productos "
+                                  f"normalizados y se conserva {self.output_file}")
+            return
+
+        self.writer.close()
+        spider.logger.info(
+            f"Normalizados en streaming → {self.output_file}: {self.writer.count} de {self.total_count} "
+            f"(nuevos: {self.nuevos_count}, seminuevos: {self.seminuevos_count}, filtrados: {self.filtrados_count})"
+        )
+
+    def engine_stopped(self):
+        # Una escritura de normalize_cache.json por crawler (la caché es compartida: solo si hay entradas nuevas)
+        if self.normalizer is not None:
+            self.normalizer.save_cache()
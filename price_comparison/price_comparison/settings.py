@@ -1,3 +1,4 @@
+import os
 
 
 BOT_NAME = "price_comparison"
@@ -8,6 +9,66 @@ NEWSPIDER_MODULE = "price_comparison.spiders"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
 
 ROBOTSTXT_OBEY = False
+# Delay por defecto si se desactiva el throttle adaptativo
 DOWNLOAD_DELAY = 1
 FEED_EXPORT_ENCODING = "utf-8"
 LOG_LEVEL = "INFO"
+
+# Cada tienda es un dominio distinto: el límite real lo pone el perfil de cada spider
+CONCURRENT_REQUESTS = 32
+CONCURRENT_REQUESTS_PER_DOMAIN = 2
+
+DOWNLOADER_MIDDLEWARES = {
+    "price_comparison.sharding.ShardDedupMiddleware": 50,
+    "price_comparison.throttle.AdaptiveThrottleMiddleware": 950,
+}
+
+SPIDER_MIDDLEWARES = {
+    "price_comparison.sharding.ShardStartMiddleware": 50,
+}
+
+ITEM_PIPELINES = {
+    "price_comparison.pipelines.NormalizationPipeline": 300,
+}
+
+# Normalización en streaming: cada item se normaliza mientras se extrae. Apagada por defecto:
+# un `scrapy crawl` suelto (o parcial) no debe reescribir results_normalized. La activan
+# crawl_engine.py y run_complete_process.py (o -s NORMALIZE_IN_PIPELINE=True)
+NORMALIZE_IN_PIPELINE = False
+NORMALIZED_OUTPUT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results_normalized"
+)
+
+# Sharding: solo activo si se pasa -s SHARD_DB=<ruta>.sqlite (ver sharded_crawl.py)
+SHARD_DB = None
+SHARD_WORKER = "0"
+SHARD_PREFETCH = 2
+# Latido de las colecciones en curso y tiempo sin latido para devolverlas a la cola (worker caído)
+SHARD_HEARTBEAT = 60
+SHARD_CLAIM_TIMEOUT = 600
+
+# Throttle adaptativo: ajusta delay y concurrencia según latencia y errores,
+# y guarda lo aprendido para la siguiente ejecución
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_DEBUG = False
+ADAPTIVE_THROTTLE_WINDOW = 20
+ADAPTIVE_THROTTLE_ERROR_THRESHOLD = 0.1
+ADAPTIVE_THROTTLE_STATE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "throttle_state.json"
+)
+
+# Perfiles por spider:
+#   concurrency    -> máximo de peticiones simultáneas al dominio
+#   target_latency -> latencia (s) a partir de la cual se frena
+#   min_delay / max_delay / start_delay -> límites del delay entre peticiones (s)
+THROTTLE_PROFILES = {
+    # Tiendas Shopify: responden rápido y toleran más concurrencia
+    "phoneelectric": {"concurrency": 8, "target_latency": 0.6, "min_delay": 0.1, "max_delay": 5.0, "start_delay": 0.25},
+    "celudmovil": {"concurrency": 6, "target_latency": 0.6, "min_delay": 0.1, "max_delay": 5.0, "start_delay": 0.25},
+    "clevercel": {"concurrency": 4, "target_latency": 0.8, "min_delay": 0.2, "max_delay": 5.0, "start_delay": 0.5},
+    "celetiene": {"concurrency": 4, "target_latency": 0.8, "min_delay": 0.2, "max_delay": 5.0, "start_delay": 0.5},
+    "celucambio": {"concurrency": 4, "target_latency": 0.8, "min_delay": 0.2, "max_delay": 5.0, "start_delay": 0.5},
+    # VTEX y WooCommerce: más lentos, ir con cuidado
+    "tooho": {"concurrency": 2, "target_latency": 1.5, "min_delay": 0.5, "max_delay": 10.0, "start_delay": 1.0},
+    "itech": {"concurrency": 2, "target_latency": 1.5, "min_delay": 0.5, "max_delay": 10.0, "start_delay": 1.0},
+}
@@ -0,0 +1,302 @@
+# Crawling fragmentado (sharding) entre varios procesos o máquinas
+#
+# Varios workers ejecutan el mismo spider apuntando a una base SQLite compartida
+# (setting SHARD_DB). La base hace de cola de start_urls y de almacén de
+# fingerprints: cada worker reclama colecciones de la cola a medida que se
+# queda libre y ninguna petición se descarga dos veces entre workers.
+# Sin SHARD_DB los middlewares se desactivan y el spider funciona como siempre.
+#
+# Cada worker renueva claimed_at de sus colecciones cada SHARD_HEARTBEAT segundos
+# y al cerrar las marca 'done' (o las devuelve a 'pending' si no terminó). Una
+# colección 'claimed' sin latido desde hace SHARD_CLAIM_TIMEOUT segundos es de un
+# worker caído: el próximo claim() la devuelve a la cola.
+
+import sqlite3
+import time
+
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall, deferLater
+
+# Segundos sin latido tras los que una colección reclamada se considera abandonada
+# (valores por defecto de SHARD_CLAIM_TIMEOUT y SHARD_HEARTBEAT)
+CLAIM_TIMEOUT = 600.0
+HEARTBEAT_INTERVAL = 60.0
+
+
+class ShardStore:
+    """Cola de start_urls y fingerprints compartida sobre SQLite"""
+
+    def __init__(self, db_path, timeout=30.0, claim_timeout=CLAIM_TIMEOUT):
+        self.db_path = db_path
+        self.claim_timeout = claim_timeout
+        # isolation_level=None: las transacciones se abren explícitamente
+        self.conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS queue (
+                spider TEXT NOT NULL,
+                url TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                claimed_at REAL,
+                PRIMARY KEY (spider, url)
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS fingerprints (
+                spider TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                worker TEXT,
+                PRIMARY KEY (spider, fingerprint)
+            )"""
+        )
+
+    def reset(self, spider):
+        """Borra la cola y los fingerprints de un spider antes de una ejecución nueva"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute("DELETE FROM queue WHERE spider = ?", (spider,))
+        self.conn.execute("DELETE FROM fingerprints WHERE spider = ?", (spider,))
+        self.conn.execute("COMMIT")
+
+    def seed(self, spider, urls):
+        """Agrega start_urls a la cola (idempotente: los workers pueden sembrar la misma lista)"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        for position, url in enumerate(urls):
+            self.conn.execute(
+                "INSERT OR IGNORE INTO queue (spider, url, position) VALUES (?, ?, ?)",
+                (spider, url, position)
+            )
+        self.conn.execute("COMMIT")
+
+    def claim(self, spider, worker):
+        """Reclama atómicamente la siguiente URL pendiente, o None si la cola está vacía
+
+        Antes devuelve a la cola las colecciones de workers sin latido desde hace claim_timeout.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.claim_timeout:
+                self._release(spider, older_than=self.claim_timeout)
+            row = self.conn.execute(
+                "SELECT url FROM queue WHERE spider = ? AND status = 'pending' "
+                "ORDER BY position LIMIT 1",
+                (spider,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE queue SET status = 'claimed', worker = ?, claimed_at = ? "
+                "WHERE spider = ? AND url = ?",
+                (worker, time.time(), spider, row[0])
+            )
+            return row[0]
+        finally:
+            self.conn.execute("COMMIT")
+
+    def heartbeat(self, spider, worker):
+        """Renueva claimed_at de las colecciones que el worker tiene en curso"""
+        self.conn.execute(
+            "UPDATE queue SET claimed_at = ? WHERE spider = ? AND worker = ? AND status = 'claimed'",
+            (time.time(), spider, worker)
+        )
+
+    def finish(self, spider, worker, completed):
+        """Cierre del worker: sus colecciones quedan 'done', o vuelven a 'pending' si no terminó"""
+        if completed:
+            self.conn.execute(
+                "UPDATE queue SET status = 'done' WHERE spider = ? AND worker = ? AND status = 'claimed'",
+                (spider, worker)
+            )
+        else:
+            self.release(spider, worker)
+
+    def release(self, spider, worker=None, older_than=None):
+        """Devuelve a 'pending' las colecciones reclamadas (de `worker`, o sin latido desde hace
+        `older_than` segundos); devuelve cuántas
+
+        También borra los fingerprints de esos workers para que las páginas que
+        alcanzaron a descargar se puedan volver a pedir. Lo que ya escribieron en su
+        feed parcial puede quedar repetido en el combinado: mejor que perderlo.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            return self._release(spider, worker, older_than)
+        finally:
+            self.conn.execute("COMMIT")
+
+    def _release(self, spider, worker=None, older_than=None):
+        condition, params = "spider = ? AND status = 'claimed'", [spider]
+        if worker is not None:
+            condition += " AND worker = ?"
+            params.append(worker)
+        if older_than is not None:
+            condition += " AND claimed_at < ?"
+            params.append(time.time() - older_than)
+        workers = [row[0] for row in self.conn.execute(
+            f"SELECT DISTINCT worker FROM queue WHERE {condition}", params
+        ).fetchall()]
+        if not workers:
+            return 0
+        released = self.conn.execute(
+            f"UPDATE queue SET status = 'pending', worker = NULL, claimed_at = NULL WHERE {condition}", params
+        ).rowcount
+        self.conn.executemany(
+            "DELETE FROM fingerprints WHERE spider = ? AND worker = ?", [(spider, w) for w in workers]
+        )
+        return released
+
+    def mark_seen(self, spider, fingerprint, worker):
+        """Registra un fingerprint; devuelve False si otro worker ya lo había registrado"""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO fingerprints (spider, fingerprint, worker) VALUES (?, ?, ?)",
+            (spider, fingerprint, worker)
+        )
+        return cursor.rowcount == 1
+
+    def unmark_seen(self, spider, fingerprint, worker):
+        """Borra un fingerprint de `worker` (descarga fallida) para que se pueda volver a pedir"""
+        self.conn.execute(
+            "DELETE FROM fingerprints WHERE spider = ? AND fingerprint = ? AND worker = ?",
+            (spider, fingerprint, worker)
+        )
+
+    def progress(self, spider):
+        """Devuelve {status: cantidad} de la cola de un spider"""
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM queue WHERE spider = ? GROUP BY status", (spider,)
+        ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self.conn.close()
+
+
+def _open_store(crawler):
+    db_path = crawler.settings.get("SHARD_DB")
+    if not db_path:
+        raise NotConfigured
+    store = ShardStore(db_path, claim_timeout=crawler.settings.getfloat("SHARD_CLAIM_TIMEOUT", CLAIM_TIMEOUT))
+    return store, crawler.settings.get("SHARD_WORKER", "0")
+
+
+class ShardStartMiddleware:
+    """Reparte los start_urls del spider entre workers usando la cola compartida"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.store, self.worker = _open_store(crawler)
+        # Colecciones en vuelo por worker antes de reclamar otra
+        self.prefetch = crawler.settings.getint("SHARD_PREFETCH", 2)
+        self.poll_interval = crawler.settings.getfloat("SHARD_POLL_INTERVAL", 0.5)
+        self.heartbeat = LoopingCall(self._heartbeat)
+        self.heartbeat_interval = crawler.settings.getfloat("SHARD_HEARTBEAT", HEARTBEAT_INTERVAL)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.heartbeat.start(self.heartbeat_interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.heartbeat.running:
+            self.heartbeat.stop()
+        self.store.finish(spider.name, self.worker, completed=reason == "finished")
+
+    def _heartbeat(self):
+        self.store.heartbeat(self.crawler.spider.name, self.worker)
+
+    async def process_start(self, start):
+        spider = self.crawler.spider
+
+        # Los items del start pasan tal cual; las peticiones van a la cola
+        requests = {}
+        async for item_or_request in start:
+            if isinstance(item_or_request, Request):
+                requests.setdefault(item_or_request.url, item_or_request)
+            else:
+                yield item_or_request
+        self.store.seed(spider.name, list(requests))
+
+        # El engine consume el start de golpe: reclamar solo cuando hay capacidad
+        # para que los demás workers se lleven el resto de colecciones
+        while True:
+            while self._busy():
+                if not self.crawler.engine.running:
+                    return
+                await maybe_deferred_to_future(deferLater(reactor, self.poll_interval, lambda: None))
+            url = self.store.claim(spider.name, self.worker)
+            if url is None:
+                break
+            spider.logger.info(f"[shard {self.worker}] Colección reclamada: {url}")
+            yield requests.get(url) or Request(url, dont_filter=True)
+
+    def _busy(self):
+        engine = self.crawler.engine
+        # Downloader lleno, o engine cerrando
+        if engine.needs_backout():
+            return True
+        pending = len(engine.downloader.active)
+        # engine.scheduler es público desde Scrapy 2.19; antes solo cuenta lo que se descarga
+        scheduler = getattr(engine, "scheduler", None)
+        if scheduler is not None and scheduler.has_pending_requests():
+            pending += len(scheduler)
+        return pending >= self.prefetch
+
+
+class ShardDedupMiddleware:
+    """Descarta peticiones que otro worker ya descargó (fingerprint compartido)
+
+    Solo cuenta como descargada una petición que terminó con respuesta: las que fallan
+    (excepción o código reintentable tras agotar los reintentos) liberan su fingerprint.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.store, self.worker = _open_store(crawler)
+        self.retry_http_codes = set(int(code) for code in crawler.settings.getlist("RETRY_HTTP_CODES"))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_request(self, request, spider=None):
+        # Los reintentos reutilizan el fingerprint de la petición original; dont_filter
+        # pide descargar igual aunque ya se haya visto
+        if request.meta.get("retry_times") or request.dont_filter:
+            return None
+        # Una redirección copia el meta de la petición original: su fingerprint no es de esta
+        request.meta.pop("shard_fingerprint", None)
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        if not self.store.mark_seen(self.crawler.spider.name, fingerprint, self.worker):
+            self.crawler.stats.inc_value("shard/duplicados")
+            raise IgnoreRequest(f"Ya descargada por otro worker: {request.url}")
+        # Se registra antes de descargar para que dos workers no la pidan a la vez;
+        # si la descarga falla se borra y otro worker (o un reintento) la puede volver a pedir
+        request.meta["shard_fingerprint"] = fingerprint
+        return None
+
+    def process_response(self, request, response, spider=None):
+        # Llega después de RetryMiddleware: un código reintentable aquí es un fallo definitivo
+        if response.status in self.retry_http_codes:
+            self._unmark(request)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        if not isinstance(exception, IgnoreRequest):
+            self._unmark(request)
+        return None
+
+    def _unmark(self, request):
+        fingerprint = request.meta.pop("shard_fingerprint", None)
+        if fingerprint:
+            self.store.unmark_seen(self.crawler.spider.name, fingerprint, self.worker)
+            self.crawler.stats.inc_value("shard/fallidas")
@@ -0,0 +1,227 @@
+# Throttling adaptativo por spider
+#
+# Cada tienda tiene su propio perfil (THROTTLE_PROFILES en settings.py) con la
+# concurrencia máxima por dominio, la latencia objetivo y los límites de delay.
+# El middleware ajusta el delay y la concurrencia del slot de descarga según la
+# latencia medida y la tasa de errores, y guarda lo aprendido al cerrar el spider
+# para que la siguiente ejecución arranque cerca del mejor ritmo conocido.
+
+import json
+import os
+from collections import deque
+from datetime import datetime
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+
+# Respuestas que indican que el servidor nos está frenando
+THROTTLE_STATUS_CODES = {408, 429, 500, 502, 503, 504, 520, 521, 522, 524}
+
+# Perfil usado cuando el spider no tiene uno propio
+DEFAULT_PROFILE = {
+    "concurrency": 2,
+    "target_latency": 1.0,
+    "min_delay": 0.5,
+    "max_delay": 10.0,
+    "start_delay": 1.0
+}
+
+
+class AdaptiveThrottleMiddleware:
+    """Ajusta delay y concurrencia por dominio usando latencia y tasa de errores"""
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_THROTTLE_ENABLED"):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.profiles = settings.getdict("THROTTLE_PROFILES")
+        self.state_file = settings.get("ADAPTIVE_THROTTLE_STATE_FILE")
+        self.window_size = settings.getint("ADAPTIVE_THROTTLE_WINDOW", 20)
+        self.error_threshold = settings.getfloat("ADAPTIVE_THROTTLE_ERROR_THRESHOLD", 0.1)
+        self.debug = settings.getbool("ADAPTIVE_THROTTLE_DEBUG")
+
+        self.profile = dict(DEFAULT_PROFILE)
+        self.latency = None
+        self.window = deque(maxlen=self.window_size)
+        self.responses = 0
+        self.errors = 0
+        self.slots = {}
+        self.start_delay = None
+        self.start_concurrency = None
+
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self._seed_slot, signal=signals.request_reached_downloader)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_opened(self, spider):
+        self.profile = dict(DEFAULT_PROFILE)
+        self.profile.update(self.profiles.get(spider.name, {}))
+
+        # Arrancar desde lo aprendido en la ejecución anterior (si existe)
+        learned = self._load_state().get(spider.name, {})
+        start_delay = self._clamp_delay(learned.get("delay", self.profile["start_delay"]))
+        start_concurrency = max(1, min(
+            int(learned.get("concurrency", self.profile["concurrency"])),
+            self.profile["concurrency"]
+        ))
+        self.latency = learned.get("latency")
+
+        # Valores iniciales de los slots que cree el downloader (ver _seed_slot)
+        self.start_delay = start_delay
+        self.start_concurrency = start_concurrency
+
+        spider.logger.info(
+            "Throttle adaptativo: delay inicial %.2fs, concurrencia %d, latencia objetivo %.2fs%s",
+            start_delay, start_concurrency, self.profile["target_latency"],
+            " (aprendido)" if learned else ""
+        )
+
+    def spider_closed(self, spider, reason):
+        if not self.slots:
+            return
+
+        # Promedio de los slots usados (normalmente uno por tienda)
+        delays = [slot.delay for slot in self.slots.values()]
+        concurrencies = [slot.concurrency for slot in self.slots.values()]
+        learned = {
+            "delay": round(sum(delays) / len(delays), 3),
+            "concurrency": max(1, round(sum(concurrencies) / len(concurrencies))),
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.errors / self.responses, 4) if self.responses else 0.0,
+            "responses": self.responses,
+            "updated": datetime.now().isoformat()
+        }
+
+        stats = self.crawler.stats
+        stats.set_value("adaptive_throttle/delay", learned["delay"])
+        stats.set_value("adaptive_throttle/concurrency", learned["concurrency"])
+        stats.set_value("adaptive_throttle/error_rate", learned["error_rate"])
+
+        state = self._load_state()
+        state[spider.name] = learned
+        self._save_state(state)
+        spider.logger.info("Throttle adaptativo guardado: %s", learned)
+
+    def _seed_slot(self, request, spider):
+        """Aplica el delay y la concurrencia iniciales a cada slot nuevo
+
+        La señal llega con el slot ya creado y antes de que el downloader despache la
+        petición, así que incluso la primera usa los valores del perfil. Si el
+        downloader recicló un slot inactivo, el nuevo hereda lo que había aprendido.
+        """
+        key = request.meta.get("download_slot")
+        slot = self.crawler.engine.downloader.slots.get(key) if key else None
+        if slot is None or self.start_delay is None:
+            return
+        previous = self.slots.get(key)
+        if previous is slot:
+            return
+        if previous is None:
+            slot.delay, slot.concurrency = self.start_delay, self.start_concurrency
+        else:
+            slot.delay, slot.concurrency = previous.delay, previous.concurrency
+        self.slots[key] = slot
+
+    def process_response(self, request, response, spider=None):
+        is_error = response.status in THROTTLE_STATUS_CODES
+        self._register(request, is_error, response.status)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        # Timeouts y conexiones rechazadas cuentan como señal de saturación
+        self._register(request, True, None)
+        return None
+
+    def _register(self, request, is_error, status):
+        key = request.meta.get("download_slot")
+        slot = self.crawler.engine.downloader.slots.get(key) if key else None
+        if slot is None:
+            return
+        self.slots[key] = slot
+
+        self.responses += 1
+        self.window.append(is_error)
+        old_delay, old_concurrency = slot.delay, slot.concurrency
+
+        if is_error:
+            self.errors += 1
+            self._back_off(slot)
+        else:
+            latency = request.meta.get("download_latency")
+            if latency is not None:
+                self._adjust_delay(slot, latency, status)
+
+        self._adjust_concurrency(slot)
+
+        if self.debug and (slot.delay != old_delay or slot.concurrency != old_concurrency):
+            self.crawler.spider.logger.info(
+                "slot: %s | delay: %.2fs -> %.2fs | conc: %d -> %d | latencia: %s | status: %s",
+                key, old_delay, slot.delay, old_concurrency, slot.concurrency,
+                f"{self.latency:.2f}s" if self.latency is not None else "-", status
+            )
+
+    def _back_off(self, slot):
+        """Duplica el delay ante un error (mínimo 0.5s)"""
+        slot.delay = self._clamp_delay(max(slot.delay * 2, self.profile["min_delay"], 0.5))
+
+    def _adjust_delay(self, slot, latency, status):
+        """Acerca el delay al ritmo que mantiene `concurrency` peticiones en vuelo"""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+
+        # Si la latencia supera la objetivo, el servidor está sufriendo: frenar en proporción
+        overload = max(1.0, self.latency / self.profile["target_latency"])
+        target_delay = latency / max(slot.concurrency, 1) * overload
+        new_delay = self._clamp_delay((slot.delay + target_delay) / 2.0)
+
+        # Igual que AutoThrottle: las páginas de error/redirección son rápidas y
+        # no deben servir para reducir el delay
+        if status != 200 and new_delay <= slot.delay:
+            return
+        slot.delay = new_delay
+
+    def _adjust_concurrency(self, slot):
+        """Baja la concurrencia si hay muchos errores y la sube si todo va bien"""
+        if len(self.window) < self.window_size:
+            return
+
+        error_rate = sum(self.window) / len(self.window)
+        if error_rate > self.error_threshold and slot.concurrency > 1:
+            slot.concurrency -= 1
+            self.window.clear()
+        elif (error_rate == 0
+              and self.latency is not None
+              and self.latency < self.profile["target_latency"]
+              and slot.concurrency < self.profile["concurrency"]):
+            slot.concurrency += 1
+            self.window.clear()
+
+    def _clamp_delay(self, delay):
+        return min(max(self.profile["min_delay"], delay), self.profile["max_delay"])
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        if not self.state_file:
+            return
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.state_file)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DELTAS DE PRECIOS ENTRE SNAPSHOTS
+=================================
+
+Compara el archivo normalizado de cada tienda (results_normalized/<tienda>_normalized.json)
+con su snapshot anterior (<tienda>_normalized_<AAAA-MM-DD>.json, el más reciente
+de una fecha anterior) y deja en results_delta/<tienda>_delta.json:
+
+- agregados: productos que no estaban en el snapshot anterior
+- eliminados: productos que ya no aparecen
+- cambios_precio: productos cuyo precio (el mínimo si el nombre se repite) cambió
+
+Ambos snapshots se indexan por normalized_name en un diccionario, así que el
+cruce es lineal en la cantidad de productos. Después de comparar, el archivo
+actual se archiva como snapshot de hoy para la próxima ejecución.
+
+Ejecutar con:
+    python price_delta.py [tienda1 tienda2 ...]
+    python price_delta.py itech --anterior results_normalized/itech_normalized_2025-07-11.json
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+from normalize_data import iter_json_records
+
+TIENDAS = ['clevercel', 'itech', 'phoneelectric', 'tooho', 'celudmovil', 'celetiene', 'celucambio']
+CARPETA_NORMALIZED = 'price_comparison/results_normalized'
+CARPETA_DELTA = 'price_comparison/results_delta'
+
+RE_SNAPSHOT = re.compile(r'^(?P<tienda>.+)_normalized_(?P<fecha>\d{4}-\d{2}-\d{2})\.json$')
+
+
+def parse_price(valor):
+    """Precio como número: '$1.679.998,95' → 1679998.95, '3,299,999' → 3299999.0 (None si no hay precio)"""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = re.sub(r'[^\d.,]', '', str(valor or ''))
+    if not any(c.isdigit() for c in texto):
+        return None
+
+    # Con los dos separadores, el último es el decimal
+    if '.' in texto and ',' in texto:
+        decimal = '.' if texto.rfind('.') > texto.rfind(',') else ','
+    else:
+        separador = '.' if '.' in texto else ','
+        partes = texto.split(separador)
+        # Un solo separador seguido de 1-2 dígitos es decimal; si no, de miles (574.900, 3,299,999)
+        decimal = separador if len(partes) == 2 and 0 < len(partes[1]) <= 2 else None
+
+    miles = {'.', ','} - {decimal}
+    for separador in miles:
+        texto = texto.replace(separador, '')
+    if decimal:
+        entero, _, fraccion = texto.rpartition(decimal)
+        texto = f'{entero or 0}.{fraccion}'
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def indexar(productos):
+    """Índice normalized_name → (precio mínimo, producto con ese precio, repeticiones)"""
+    indice = {}
+    for producto in productos:
+        nombre = producto.get('normalized_name')
+        if not nombre:
+            continue
+        precio = parse_price(producto.get('price'))
+        actual = indice.get(nombre)
+        if actual is None:
+            indice[nombre] = (precio, producto, 1)
+            continue
+        mejor_precio, mejor, repeticiones = actual
+        if precio is not None and (mejor_precio is None or precio < mejor_precio):
+            mejor_precio, mejor = precio, producto
+        indice[nombre] = (mejor_precio, mejor, repeticiones + 1)
+    return indice
+
+
+def comparar_snapshots(anteriores, actuales):
+    """Delta entre dos listas de productos normalizados: agregados, eliminados y cambios de precio"""
+    indice_anterior = indexar(anteriores)
+    indice_actual = indexar(actuales)
+
+    agregados = [producto for nombre, (_, producto, _) in indice_actual.items() if nombre not in indice_anterior]
+    eliminados = [producto for nombre, (_, producto, _) in indice_anterior.items() if nombre not in indice_actual]
+
+    cambios_precio = []
+    sin_cambios = 0
+    for nombre, (precio_actual, producto, _) in indice_actual.items():
+        anterior = indice_anterior.get(nombre)
+        if anterior is None:
+            continue
+        precio_anterior = anterior[0]
+        if precio_actual == precio_anterior:
+            sin_cambios += 1
+            continue
+        diferencia = None
+        variacion = None
+        if precio_actual is not None and precio_anterior is not None:
+            diferencia = round(precio_actual - precio_anterior, 2)
+            variacion = round(diferencia / precio_anterior * 100, 2) if precio_anterior else None
+        cambios_precio.append({
+            'normalized_name': nombre,
+            'precio_anterior': precio_anterior,
+            'precio_actual': precio_actual,
+            'diferencia': diferencia,
+            'variacion_pct': variacion,
+            'producto': producto
+        })
+
+    return {
+        'resumen': {
+            'productos_anteriores': len(indice_anterior),
+            'productos_actuales': len(indice_actual),
+            'agregados': len(agregados),
+            'eliminados': len(eliminados),
+            'cambios_precio': len(cambios_precio),
+            'sin_cambios': sin_cambios
+        },
+        'agregados': agregados,
+        'eliminados': eliminados,
+        'cambios_precio': cambios_precio
+    }
+
+
+def snapshot_anterior(store_name, carpeta=CARPETA_NORMALIZED, antes_de=None):
+    """Snapshot fechado más reciente de la tienda con fecha anterior a `antes_de` (por defecto hoy)"""
+    antes_de = antes_de or datetime.now().strftime('%Y-%m-%d')
+    candidatos = []
+    if os.path.isdir(carpeta):
+        for archivo in os.listdir(carpeta):
+            match = RE_SNAPSHOT.match(archivo)
+            if match and match.group('tienda') == store_name and match.group('fecha') < antes_de:
+                candidatos.append((match.group('fecha'), os.path.join(carpeta, archivo)))
+    return max(candidatos)[1] if candidatos else None
+
+
+def archivar_snapshot(store_name, carpeta=CARPETA_NORMALIZED, fecha=None):
+    """Copia el normalizado actual como <tienda>_normalized_<fecha>.json (reemplaza el del mismo día)"""
+    fecha = fecha or datetime.now().strftime('%Y-%m-%d')
+    actual = os.path.join(carpeta, f'{store_name}_normalized.json')
+    destino = os.path.join(carpeta, f'{store_name}_normalized_{fecha}.json')
+    tmp_file = f'{destino}.tmp'
+    shutil.copyfile(actual, tmp_file)
+    os.replace(tmp_file, destino)
+    return destino
+
+
+def calcular_delta_tienda(store_name, carpeta=CARPETA_NORMALIZED, carpeta_delta=CARPETA_DELTA,
+                          anterior=None, archivar=True):
+    """Calcula y guarda el delta de una tienda; devuelve el resumen, o None si no hay con qué comparar"""
+    actual = os.path.join(carpeta, f'{store_name}_normalized.json')
+    if not os.path.exists(actual):
+        print(f"[ADVERTENCIA] Archivo no encontrado: {actual}")
+        return None
+
+    fecha = datetime.now().strftime('%Y-%m-%d')
+    anterior = anterior or snapshot_anterior(store_name, carpeta, fecha)
+    resumen = None
+    if anterior is None:
+        print(f"ℹ️ {store_name}: sin snapshot anterior, se toma el actual como punto de partida")
+    else:
+        delta = comparar_snapshots(list(iter_json_records(anterior)), list(iter_json_records(actual)))
+        os.makedirs(carpeta_delta, exist_ok=True)
+        salida = os.path.join(carpeta_delta, f'{store_name}_delta.json')
+        with open(salida, 'w', encoding='utf-8') as f:
+            json.dump(dict({'tienda': store_name, 'anterior': anterior, 'actual': actual,
+                            'fecha': datetime.now().isoformat(timespec='seconds')}, **delta),
+                      f, ensure_ascii=False, indent=2)
+        resumen = delta['resumen']
+        print(f"📈 {store_name}: +{resumen['agregados']} agregados, -{resumen['eliminados']} eliminados, "
+              f"{resumen['cambios_precio']} cambios de precio, {resumen['sin_cambios']} sin cambios "
+              f"(vs {os.path.basename(anterior)}) → {salida}")
+
+    if archivar:
+        archivar_snapshot(store_name, carpeta, fecha)
+    return resumen
+
+
+def calcular_deltas(tiendas=None, carpeta=CARPETA_NORMALIZED, carpeta_delta=CARPETA_DELTA, archivar=True):
+    """Deltas de `tiendas` (None: todas): {tienda: resumen} (solo las que tenían snapshot anterior)"""
+    resumenes = {}
+    for store_name in TIENDAS if tiendas is None else tiendas:
+        try:
+            resumen = calcular_delta_tienda(store_name, carpeta, carpeta_delta, archivar=archivar)
+        except Exception as e:
+            print(f"❌ Error calculando el delta de {store_name}: {str(e)}")
+            continue
+        if resumen is not None:
+            resumenes[store_name] = resumen
+    return resumenes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deltas de precios contra el snapshot anterior de cada tienda")
+    parser.add_argument("tiendas", nargs="*", help="Tiendas a comparar (por defecto todas)")
+    parser.add_argument("--anterior", help="Snapshot anterior explícito (solo con una tienda)")
+    parser.add_argument("--sin-archivar", action="store_true",
+                        help="No guardar el normalizado actual como snapshot de hoy")
+    args = parser.parse_args()
+
+    if args.anterior:
+        if len(args.tiendas) != 1:
+            parser.error("--anterior requiere exactamente una tienda")
+        calcular_delta_tienda(args.tiendas[0], anterior=args.anterior, archivar=not args.sin_archivar)
+        return
+
+    resumenes = calcular_deltas(args.tiendas or None, archivar=not args.sin_archivar)
+    cambios = sum(r['agregados'] + r['eliminados'] + r['cambios_precio'] for r in resumenes.values())
+    print(f"[OK] Deltas calculados para {len(resumenes)} tiendas: {cambios} productos con cambios")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+HISTORIAL DE PRECIOS (SQLITE)
+=============================
+
+Cada ejecución normalizada de una tienda se agrega a una base SQLite local,
+particionada por fecha de ejecución y tienda (tabla runs: una fila por
+(fecha, tienda)). Los precios se guardan como enteros (pesos, redondeados) y
+marca, condición y almacenamiento como columnas codificadas con diccionario
+(tablas brands/conditions/storages, los productos guardan solo el id).
+
+La tabla prices (run_id, product_id, price) es WITHOUT ROWID con clave
+(run_id, product_id): las filas de una partición quedan juntas en disco. El
+índice (product_id, run_id, price) cubre las consultas por producto, que así
+solo leen las filas de ese producto y nunca las de otras particiones.
+
+Ejecutar con:
+    python price_history.py importar                       # snapshots existentes de results_normalized
+    python price_history.py buscar "IPHONE 16 PRO"
+    python price_history.py historial "APPLE IPHONE 16 PRO SIM FISICA NUEVO 256GB" --ultimas 5
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from normalize_data import iter_json_records
+from price_delta import RE_SNAPSHOT, indexar
+
+TIENDAS = ['clevercel', 'itech', 'phoneelectric', 'tooho', 'celudmovil', 'celetiene', 'celucambio']
+CARPETA_NORMALIZED = 'price_comparison/results_normalized'
+DB_HISTORIAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_comparison', 'price_history.sqlite')
+
+RE_ACTUAL = re.compile(r'^(?P<tienda>.+)_normalized\.json$')
+
+# Columnas codificadas con diccionario: columna del producto → tabla de valores
+DICCIONARIOS = {'brand_id': 'brands', 'condition_id': 'conditions', 'storage_id': 'storages'}
+
+
+class PriceHistory:
+    """Historial de precios por ejecución y tienda sobre SQLite"""
+
+    def __init__(self, db_path=DB_HISTORIAL, timeout=30.0):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # isolation_level=None: las transacciones se abren explícitamente
+        self.conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stores (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+        for tabla in DICCIONARIOS.values():
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {tabla} (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY,
+                normalized_name TEXT NOT NULL UNIQUE,
+                brand_id INTEGER REFERENCES brands(id),
+                condition_id INTEGER REFERENCES conditions(id),
+                storage_id INTEGER REFERENCES storages(id)
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                run_date TEXT NOT NULL,
+                store_id INTEGER NOT NULL REFERENCES stores(id),
+                source TEXT,
+                products INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (run_date, store_id)
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS prices (
+                run_id INTEGER NOT NULL REFERENCES runs(id),
+                product_id INTEGER NOT NULL REFERENCES products(id),
+                price INTEGER,
+                PRIMARY KEY (run_id, product_id)
+            ) WITHOUT ROWID"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS prices_by_product ON prices (product_id, run_id, price)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS runs_by_date ON runs (run_date)")
+        # Ids de diccionario ya vistos: evitan un SELECT por producto al importar
+        self._ids = {}
+
+    def close(self):
+        self.conn.close()
+
+    def _value_id(self, tabla, value):
+        """Id de `value` en una tabla de diccionario (lo crea si no existe)"""
+        if value is None or value == '':
+            return None
+        key = (tabla, value)
+        if key not in self._ids:
+            self.conn.execute(f"INSERT OR IGNORE INTO {tabla} (value) VALUES (?)", (value,))
+            self._ids[key] = self.conn.execute(f"SELECT id FROM {tabla} WHERE value = ?", (value,)).fetchone()[0]
+        return self._ids[key]
+
+    def _product_id(self, producto):
+        key = ('products', producto['normalized_name'])
+        if key not in self._ids:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO products (normalized_name, brand_id, condition_id, storage_id) "
+                "VALUES (?, ?, ?, ?)",
+                (producto['normalized_name'], self._value_id('brands', producto.get('brand')),
+                 self._value_id('conditions', producto.get('condition')),
+                 self._value_id('storages', producto.get('storage_capacity')))
+            )
+            self._ids[key] = self.conn.execute(
+                "SELECT id FROM products WHERE normalized_name = ?", (producto['normalized_name'],)
+            ).fetchone()[0]
+        return self._ids[key]
+
+    def append_run(self, store, productos, run_date=None, source=None):
+        """Agrega (o reemplaza, si ya existe) la partición (run_date, store); devuelve los productos guardados
+
+        Un nombre repetido en la tienda guarda su precio mínimo, igual que price_delta.
+        """
+        run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        indice = indexar(productos)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            store_id = self._value_id('stores', store)
+            previo = self.conn.execute(
+                "SELECT id FROM runs WHERE run_date = ? AND store_id = ?", (run_date, store_id)
+            ).fetchone()
+            if previo is not None:
+                self.conn.execute("DELETE FROM prices WHERE run_id = ?", (previo[0],))
+                self.conn.execute("DELETE FROM runs WHERE id = ?", (previo[0],))
+            run_id = self.conn.execute(
+                "INSERT INTO runs (run_date, store_id, source, products, created_at) VALUES (?, ?, ?, ?, ?)",
+                (run_date, store_id, source, len(indice), time.time())
+            ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO prices (run_id, product_id, price) VALUES (?, ?, ?)",
+                [(run_id, self._product_id(producto), round(precio) if precio is not None else None)
+                 for precio, producto, _ in indice.values()]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            # Los ids creados dentro de la transacción se deshicieron
+            self._ids.clear()
+            raise
+        return len(indice)
+
+    def runs(self, store=None):
+        """Particiones guardadas: lista de (run_date, tienda, productos), de la más reciente a la más antigua"""
+        query = ("SELECT r.run_date, s.value, r.products FROM runs r JOIN stores s ON s.id = r.store_id "
+                 + ("WHERE s.value = ? " if store else "") + "ORDER BY r.run_date DESC, s.value")
+        return self.conn.execute(query, (store,) if store else ()).fetchall()
+
+    def find_products(self, texto, limit=20):
+        """Nombres normalizados que contienen `texto` (sin distinguir mayúsculas)"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT normalized_name FROM products WHERE normalized_name LIKE ? ORDER BY normalized_name LIMIT ?",
+            (f"%{texto.upper()}%", limit)
+        )]
+
+    def price_history(self, normalized_name, last_runs=5, stores=None):
+        """Precio de un producto en cada tienda durante las últimas `last_runs` fechas de ejecución
+
+        Devuelve una lista de (run_date, tienda, precio) ordenada por fecha y tienda.
+        """
+        query = (
+            "SELECT r.run_date, s.value, p.price "
+            "FROM products pr "
+            "JOIN prices p ON p.product_id = pr.id "
+            "JOIN runs r ON r.id = p.run_id "
+            "JOIN stores s ON s.id = r.store_id "
+            "WHERE pr.normalized_name = ? "
+            "AND r.run_date IN (SELECT DISTINCT run_date FROM runs ORDER BY run_date DESC LIMIT ?)"
+        )
+        params = [normalized_name.upper(), last_runs]
+        if stores:
+            query += f" AND s.value IN ({', '.join('?' for _ in stores)})"
+            params += list(stores)
+        query += " ORDER BY r.run_date, s.value"
+        return self.conn.execute(query, params).fetchall()
+
+
+def registrar_ejecucion(tiendas=None, carpeta=CARPETA_NORMALIZED, db_path=DB_HISTORIAL, run_date=None):
+    """Agrega el normalizado actual de cada tienda de `tiendas` (None: todas) al historial como ejecución de `run_date` (hoy)"""
+    historial = PriceHistory(db_path)
+    guardadas = {}
+    try:
+        for store_name in TIENDAS if tiendas is None else tiendas:
+            archivo = os.path.join(carpeta, f'{store_name}_normalized.json')
+            if not os.path.exists(archivo):
+                continue
+            try:
+                guardadas[store_name] = historial.append_run(store_name, iter_json_records(archivo), run_date, archivo)
+            except Exception as e:
+                print(f"❌ Error guardando el historial de {store_name}: {str(e)}")
+    finally:
+        historial.close()
+    print(f"🗃️ Historial de precios: {sum(guardadas.values())} productos de {len(guardadas)} tiendas → {db_path}")
+    return guardadas
+
+
+def importar_snapshots(carpeta=CARPETA_NORMALIZED, db_path=DB_HISTORIAL):
+    """Carga al historial los snapshots fechados y los normalizados actuales (con la fecha del archivo)"""
+    historial = PriceHistory(db_path)
+    total = 0
+    try:
+        for archivo in sorted(os.listdir(carpeta)):
+            ruta = os.path.join(carpeta, archivo)
+            match = RE_SNAPSHOT.match(archivo)
+            if match:
+                store_name, run_date = match.group('tienda'), match.group('fecha')
+            else:
+                match = RE_ACTUAL.match(archivo)
+                if not match:
+                    continue
+                store_name = match.group('tienda')
+                run_date = datetime.fromtimestamp(os.path.getmtime(ruta)).strftime('%Y-%m-%d')
+                # El snapshot archivado del mismo día tiene los mismos datos
+                if os.path.exists(os.path.join(carpeta, f'{store_name}_normalized_{run_date}.json')):
+                    continue
+            productos = historial.append_run(store_name, iter_json_records(ruta), run_date, ruta)
+            total += productos
+            print(f"   ✓ {store_name} {run_date}: {productos} productos")
+    finally:
+        historial.close()
+    print(f"[OK] {total} precios importados en {db_path}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historial de precios por ejecución y tienda")
+    parser.add_argument("--db", default=DB_HISTORIAL, help="Base SQLite del historial")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("importar", help="Importar los snapshots de results_normalized")
+    registrar = comandos.add_parser("registrar", help="Agregar el normalizado actual como ejecución de hoy")
+    registrar.add_argument("tiendas", nargs="*")
+    buscar = comandos.add_parser("buscar", help="Buscar nombres normalizados")
+    buscar.add_argument("texto")
+    historial = comandos.add_parser("historial", help="Precio de un producto por tienda en las últimas ejecuciones")
+    historial.add_argument("nombre", help="normalized_name exacto")
+    historial.add_argument("--ultimas", type=int, default=5, help="Cantidad de fechas de ejecución")
+    historial.add_argument("--tiendas", nargs="*", help="Limitar a estas tiendas")
+    args = parser.parse_args()
+
+    if args.comando == "importar":
+        importar_snapshots(db_path=args.db)
+        return
+    if args.comando == "registrar":
+        registrar_ejecucion(args.tiendas or None, db_path=args.db)
+        return
+
+    store = PriceHistory(args.db)
+    try:
+        if args.comando == "buscar":
+            for nombre in store.find_products(args.texto):
+                print(nombre)
+            return
+
+        inicio = time.perf_counter()
+        filas = store.price_history(args.nombre, args.ultimas, args.tiendas)
+        duracion = (time.perf_counter() - inicio) * 1000
+        if not filas:
+            print(f"[ADVERTENCIA] Sin precios para {args.nombre!r} en las últimas {args.ultimas} ejecuciones")
+            return
+        print(f"{'Fecha':<12} {'Tienda':<15} {'Precio':>14}")
+        for run_date, tienda, precio in filas:
+            print(f"{run_date:<12} {tienda:<15} {f'{precio:,}' if precio is not None else '-':>14}")
+        print(f"⏱️ {len(filas)} filas en {duracion:.1f} ms")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+EMPAREJAMIENTO DE PRODUCTOS ENTRE TIENDAS
+=========================================
+
+El mismo teléfono suele llegar con normalized_name distintos según la tienda
+("IPHONE 16 PRO 5G" / "IPHONE 16 PRO", "S24ULTRA" / "S24 ULTRA"). Este módulo
+asigna a cada nombre un id de producto canónico:
+
+1. Bloqueo: solo se comparan nombres con la misma marca, condición, tipo de
+   SIM y almacenamiento, y con los mismos códigos (X8, S24, 15T...) y
+   variantes (PRO, MAX, PLUS...) en el modelo.
+2. Dentro del bloque, el modelo se parte en palabras (separando sufijos
+   pegados como S24ULTRA, sin relleno, categorías ni colores). Dos modelos del
+   mismo bloque son el mismo producto si su similitud de conjuntos de tokens
+   (Jaccard) llega al umbral.
+3. Candidatos: con pocos productos por tienda, un índice invertido token →
+   canónicos del bloque; por encima de UMBRAL_LSH productos en alguna tienda,
+   un índice MinHash/LSH por bandas, para que el costo siga siendo casi lineal.
+
+Los ids quedan en price_comparison/product_ids.json: en las ejecuciones
+siguientes los nombres ya vistos se resuelven con una búsqueda en diccionario
+y solo los nuevos pasan por el emparejamiento.
+
+Ejecutar con:
+    python product_matching.py                  # empareja los normalizados actuales
+    python product_matching.py --reiniciar      # descarta los ids guardados
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import zlib
+
+CARPETA_NORMALIZED = 'price_comparison/results_normalized'
+ARCHIVO_IDS = 'price_comparison/product_ids.json'
+
+# Similitud mínima (Jaccard de tokens) para considerar dos modelos el mismo producto
+UMBRAL_SIMILITUD = 0.7
+
+# Productos por tienda a partir de los cuales se buscan candidatos con MinHash/LSH
+UMBRAL_LSH = 3000
+
+# Con LSH activo, los bloques chicos igual usan el índice invertido (más barato que firmar)
+MIN_BLOQUE_LSH = 50
+
+# MinHash: BANDAS × FILAS permutaciones; con 12 × 3 dos modelos con Jaccard 0.7
+# caen en el mismo bucket en alguna banda con probabilidad ~0.99 (y con 0.1, ~0.01)
+BANDAS = 12
+FILAS = 3
+PRIMO_MINHASH = (1 << 61) - 1
+
+# Permutaciones h(x) = (a·x + b) mod p, fijas para que las firmas sean comparables entre bloques
+_rng = random.Random(1)
+COEFICIENTES_MINHASH = [(_rng.randrange(1, PRIMO_MINHASH), _rng.randrange(0, PRIMO_MINHASH))
+                        for _ in range(BANDAS * FILAS)]
+
+# Palabras que no distinguen un producto de otro: relleno, categorías que algunas
+# tiendas agregan al nombre y colores
+TOKENS_RELLENO = {
+    'ORIGINAL', 'NUEVO', 'DUAL', 'LIBERADO', 'Y', 'DE', 'EL', 'LA', 'CELULAR', 'SMARTPHONE', 'TELEFONO',
+    'SMARTWATCH', 'TABLETS', 'TABLET', 'AUDIFONOS', 'AUDIO',
+    'BLACK', 'WHITE', 'SILVER', 'GOLD', 'GRAY', 'GREY', 'BLUE', 'GREEN', 'PINK', 'PURPLE', 'VIOLET',
+    'CREAM', 'DESERT', 'MIDNIGHT', 'STARLIGHT', 'NATURAL', 'TITANIUM',
+    'NEGRO', 'BLANCO', 'AZUL', 'VERDE', 'ROSA', 'ROJO', 'MORADO', 'GRIS', 'DORADO', 'PLATEADO', 'NARANJA'
+}
+
+# Red: si los dos nombres la indican debe coincidir (NOTE 15 4G ≠ NOTE 15 5G), si uno no la indica se ignora
+TOKENS_RED = {'4G', '5G'}
+
+# Palabras que sí distinguen variantes del mismo modelo (IPHONE 15 ≠ IPHONE 15 PRO)
+TOKENS_VARIANTE = {'PRO', 'MAX', 'PLUS', 'MINI', 'ULTRA', 'LITE', 'FE', 'SE', 'NEO', 'AIR', 'FOLD', 'FLIP',
+                   'EDGE', 'NOTE', 'CON', 'SIN', 'GPS', 'CELL', 'CELLULAR', 'WIFI'}
+
+# Sufijos que a veces vienen pegados al código del modelo ('S24ULTRA', '12RAM')
+SUFIJOS_PEGADOS = (TOKENS_VARIANTE | {'RAM', 'GB', 'TB', 'MM'}) - {'CON', 'SIN'}
+RE_SUFIJO = re.compile('|'.join(sorted(SUFIJOS_PEGADOS, key=len, reverse=True)))
+RE_SUFIJOS_PEGADOS = re.compile(r'^(.*\d)((?:%s)+)$' % RE_SUFIJO.pattern)
+
+RE_NO_ALFANUMERICO = re.compile(r'[^A-Z0-9.+]+')
+
+
+def _separar(palabra):
+    """'S24ULTRA' → ['S24', 'ULTRA'], '16PROMAX' → ['16', 'PRO', 'MAX'], 'S25+' → ['S25', 'PLUS']"""
+    mas = palabra[-1] == '+' and len(palabra) > 1
+    if mas:
+        palabra = palabra.rstrip('+')
+    match = RE_SUFIJOS_PEGADOS.match(palabra)
+    separadas = [match.group(1)] + RE_SUFIJO.findall(match.group(2)) if match else [palabra]
+    return separadas + ['PLUS'] if mas else separadas
+
+
+def tokens_modelo(modelo):
+    """'IPHONE 16PRO MAX 5G BLACK' → frozenset({'IPHONE', '16', 'PRO', 'MAX', '5G'})"""
+    tokens = set()
+    for palabra in RE_NO_ALFANUMERICO.sub(' ', (modelo or '').upper()).split():
+        if palabra == '+':
+            continue
+        for token in _separar(palabra):
+            if token and token not in TOKENS_RELLENO:
+                tokens.add(token)
+    return frozenset(tokens)
+
+
+def firma(tokens):
+    """Códigos (palabras con dígitos) y variantes del modelo: deben coincidir exactamente para emparejar"""
+    return (frozenset(t for t in tokens if t not in TOKENS_RED and any(c.isdigit() for c in t)),
+            tokens & TOKENS_VARIANTE)
+
+
+def compatibles(a, b):
+    """Mismos códigos y variantes, y la misma red si los dos la indican"""
+    red_a, red_b = a & TOKENS_RED, b & TOKENS_RED
+    return firma(a) == firma(b) and (not red_a or not red_b or red_a == red_b)
+
+
+def similitud(a, b):
+    """Jaccard entre dos conjuntos de tokens (sin contar la red)"""
+    a, b = a - TOKENS_RED, b - TOKENS_RED
+    if not a and not b:
+        return 1.0
+    comunes = len(a & b)
+    return comunes / (len(a) + len(b) - comunes)
+
+
+def id_canonico(bloque, nombre):
+    """Id estable del producto canónico a partir de su bloque y su primer nombre"""
+    texto = '|'.join(list(bloque) + [nombre])
+    return 'P' + hashlib.sha1(texto.encode('utf-8')).hexdigest()[:12]
+
+
+class MinHashLSH:
+    """Índice LSH por bandas sobre firmas MinHash de conjuntos de tokens"""
+
+    # token → sus valores en cada permutación (los tokens se repiten mucho entre modelos)
+    token_hashes = {}
+
+    def __init__(self, bands=BANDAS, rows=FILAS):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = {}
+
+    def _hashes(self, token):
+        valores = self.token_hashes.get(token)
+        if valores is None:
+            # crc32 y no hash(): la firma no cambia entre procesos
+            base = zlib.crc32(token.encode('utf-8'))
+            valores = self.token_hashes[token] = tuple((a * base + b) % PRIMO_MINHASH
+                                                       for a, b in COEFICIENTES_MINHASH)
+        return valores
+
+    def signature(self, tokens):
+        columnas = zip(*(self._hashes(token) for token in tokens or ('',)))
+        return [min(columna) for columna in columnas][:self.bands * self.rows]
+
+    def _band_keys(self, signature):
+        for banda in range(self.bands):
+            yield banda, tuple(signature[banda * self.rows:(banda + 1) * self.rows])
+
+    def add(self, key, tokens):
+        for banda in self._band_keys(self.signature(tokens)):
+            self.buckets.setdefault(banda, []).append(key)
+
+    def candidates(self, tokens):
+        encontrados = set()
+        for banda in self._band_keys(self.signature(tokens)):
+            encontrados.update(self.buckets.get(banda, ()))
+        return encontrados
+
+
+class BlockIndex:
+    """Canónicos de un bloque (marca, condición, SIM, almacenamiento, firma) indexados por tokens"""
+
+    def __init__(self, use_lsh=False):
+        self.tokens = {}       # id → tokens del representante
+        self.exact = {}        # tokens → id (mismo conjunto de tokens, sin calcular similitud)
+        self.inverted = {}     # token → ids (solo sin LSH)
+        self.lsh = MinHashLSH() if use_lsh else None
+
+    def add(self, product_id, tokens):
+        self.tokens[product_id] = tokens
+        self.exact.setdefault(tokens, product_id)
+        if self.lsh is not None:
+            self.lsh.add(product_id, tokens - TOKENS_RED)
+        else:
+            for token in tokens:
+                self.inverted.setdefault(token, set()).add(product_id)
+
+    def best_match(self, tokens, threshold=UMBRAL_SIMILITUD):
+        """Id del canónico más parecido (None si ninguno llega al umbral)"""
+        if tokens in self.exact:
+            return self.exact[tokens]
+        if self.lsh is not None:
+            candidatos = self.lsh.candidates(tokens - TOKENS_RED)
+        else:
+            candidatos = set()
+            for token in tokens:
+                candidatos.update(self.inverted.get(token, ()))
+
+        mejor, mejor_puntaje = None, threshold
+        for product_id in sorted(candidatos):
+            otros = self.tokens[product_id]
+            if not compatibles(tokens, otros):
+                continue
+            puntaje = similitud(tokens, otros)
+            if puntaje >= mejor_puntaje and (mejor is None or puntaje > mejor_puntaje):
+                mejor, mejor_puntaje = product_id, puntaje
+        return mejor
+
+
+class ProductMatcher:
+    """Asigna ids canónicos a normalized_name; persiste nombre → id entre ejecuciones"""
+
+    def __init__(self, ids_file=ARCHIVO_IDS, threshold=UMBRAL_SIMILITUD, lsh_threshold=UMBRAL_LSH):
+        self.ids_file = ids_file
+        self.threshold = threshold
+        self.lsh_threshold = lsh_threshold
+        self.names = {}        # normalized_name → id
+        self.canonical = {}    # id → {'nombre', 'bloque', 'modelo'}
+        self.updated = False
+        self._load()
+
+    def _load(self):
+        if not self.ids_file or not os.path.exists(self.ids_file):
+            return
+        try:
+            with open(self.ids_file, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo leer {self.ids_file}: {str(e)}; se empieza sin ids guardados")
+            return
+        self.names = datos.get('nombres', {})
+        self.canonical = datos.get('canonicos', {})
+
+    def save(self):
+        """Escritura atómica de los ids (solo si hubo nombres nuevos)"""
+        if not self.ids_file or not self.updated:
+            return
+        os.makedirs(os.path.dirname(self.ids_file) or '.', exist_ok=True)
+        tmp_file = f'{self.ids_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'nombres': self.names, 'canonicos': self.canonical}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.ids_file)
+        self.updated = False
+
+    def canonical_name(self, product_id):
+        return self.canonical[product_id]['nombre']
+
+    def resolve(self, productos, por_tienda=None, use_lsh=None):
+        """{normalized_name: id} para productos (nombre, marca, condición, sim, capacidad, modelo)
+
+        Los nombres ya conocidos se resuelven por diccionario (su modelo puede ser
+        None); el resto se empareja contra los canónicos de su bloque o crea uno
+        nuevo. use_lsh=None decide según por_tienda ({tienda: productos}).
+        """
+        ids = {}
+        nuevos = {}
+        for nombre, marca, condicion, sim_type, capacidad, modelo in productos:
+            if nombre in self.names:
+                ids[nombre] = self.names[nombre]
+            elif nombre not in nuevos:
+                nuevos[nombre] = ((marca, condicion, sim_type, capacidad), modelo)
+        if not nuevos:
+            return ids
+
+        if use_lsh is None:
+            use_lsh = max((por_tienda or {}).values(), default=0) > self.lsh_threshold
+
+        # La firma (códigos y variantes) también bloquea: solo puede emparejar con su misma firma.
+        # Solo se indexan los bloques que tienen nombres nuevos
+        tokens_nuevos = {nombre: tokens_modelo(modelo) for nombre, (_, modelo) in nuevos.items()}
+        claves = {nombre: (bloque, firma(tokens_nuevos[nombre])) for nombre, (bloque, _) in nuevos.items()}
+        existentes = {clave: [] for clave in claves.values()}
+        for product_id, canonico in self.canonical.items():
+            tokens = tokens_modelo(canonico['modelo'])
+            lista = existentes.get((tuple(canonico['bloque']), firma(tokens)))
+            if lista is not None:
+                lista.append((product_id, tokens))
+        tamanos = {}
+        for clave in claves.values():
+            tamanos[clave] = tamanos.get(clave, len(existentes[clave])) + 1
+
+        bloques = {}
+        for clave, lista in existentes.items():
+            indice = bloques[clave] = BlockIndex(use_lsh and tamanos[clave] > MIN_BLOQUE_LSH)
+            for product_id, tokens in lista:
+                indice.add(product_id, tokens)
+
+        for nombre in sorted(nuevos):
+            bloque, modelo = nuevos[nombre]
+            tokens = tokens_nuevos[nombre]
+            indice = bloques[claves[nombre]]
+            product_id = indice.best_match(tokens, self.threshold)
+            if product_id is None:
+                product_id = id_canonico(bloque, nombre)
+                self.canonical[product_id] = {'nombre': nombre, 'bloque': list(bloque), 'modelo': modelo}
+                indice.add(product_id, tokens)
+            self.names[nombre] = ids[nombre] = product_id
+        self.updated = True
+        return ids
+
+
+def emparejar_productos(archivos=None, ids_file=ARCHIVO_IDS, use_lsh=None):
+    """Empareja los normalizados actuales y guarda los ids; devuelve {normalized_name: nombre canónico}"""
+    from compare_prices import archivos_normalizados, canonizar, cargar_filas
+
+    filas = cargar_filas(archivos or archivos_normalizados(CARPETA_NORMALIZED))
+    inicio = time.perf_counter()
+    nombres, _ = canonizar(filas, ids_file, use_lsh=use_lsh)
+    duracion = time.perf_counter() - inicio
+
+    canonicos = len(set(nombres.values()))
+    print(f"🔗 {len(nombres)} nombres → {canonicos} productos canónicos "
+          f"({len(nombres) - canonicos} nombres unidos a otro) en {duracion * 1000:.0f} ms")
+    return nombres
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ids canónicos de producto entre tiendas")
+    parser.add_argument("--ids", default=ARCHIVO_IDS, help="Archivo de ids persistidos")
+    parser.add_argument("--reiniciar", action="store_true", help="Descartar los ids guardados")
+    parser.add_argument("--lsh", action="store_true", help="Forzar la búsqueda de candidatos con MinHash/LSH")
+    args = parser.parse_args()
+
+    if args.reiniciar and os.path.exists(args.ids):
+        os.remove(args.ids)
+    nombres = emparejar_productos(ids_file=args.ids, use_lsh=True if args.lsh else None)
+
+    grupos = {}
+    for nombre, canonico in nombres.items():
+        grupos.setdefault(canonico, []).append(nombre)
+    unidos = [nombres for nombres in grupos.values() if len(nombres) > 1]
+    for nombres in sorted(unidos)[:10]:
+        print(f"   {' ≈ '.join(sorted(nombres))}")
+
+
+if __name__ == "__main__":
+    main()
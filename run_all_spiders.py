@@ -1,37 +1,16 @@
 import os
-import subprocess
 from datetime import datetime
 from connect_microsoft import subir_archivo
-from normalize_data import DataNormalizer
-
-def ejecutar_spider(spider_name):
-    """Ejecuta un spider específico y guarda los resultados en JSON"""
-    try:
-        # Crear el comando para ejecutar el spider
-        comando = f"scrapy crawl {spider_name} -o results_scrap/{spider_name}.json"
-        
-        # Ejecutar el comando
-        print(f"\n[INFO] Ejecutando spider: {spider_name}")
-        resultado = subprocess.run(comando, shell=True, capture_output=True, text=True)
-        
-        if resultado.returncode == 0:
-            print(f"[OK] Spider {spider_name} ejecutado exitosamente")
-            return True
-        else:
-            print(f"[ERROR] Error al ejecutar spider {spider_name}:")
-            print(resultado.stderr)
-            return False
-            
-    except Exception as e:
-        print(f"[ERROR] Error inesperado al ejecutar spider {spider_name}: {str(e)}")
-        return False
+from normalize_data import scrap_file
+from parallel_normalize import TIENDAS, normalizar_tiendas
+from crawl_engine import ejecutar_spiders, mostrar_resumen
 
 def normalizar_datos():
     """Normaliza todos los datos después del scraping"""
     try:
         print("\n[INFO] Iniciando normalización de datos...")
-        normalizer = DataNormalizer()
-        normalizer.normalize_all_stores()
+        stores = {store_name: scrap_file(store_name) for store_name in TIENDAS}
+        normalizar_tiendas(stores)
         print("[OK] Normalización completada exitosamente")
         return True
     except Exception as e:
@@ -97,16 +76,10 @@ def main():
     print("[INFO] 🚀 Iniciando proceso completo de scraping...")
     print("=" * 60)
     
-    # Asegurarse de estar en el directorio correcto
-    os.chdir("price_comparison")
-    
-    # Ejecutar cada spider
+    # Ejecutar todos los spiders a la vez en un solo reactor
     print("\n[INFO] 📊 PASO 1: Ejecutando spiders...")
-    for spider in spiders:
-        ejecutar_spider(spider)
-    
-    # Volver al directorio raíz para la normalización
-    os.chdir("..")
+    resultados_spiders = ejecutar_spiders(spiders)
+    mostrar_resumen(resultados_spiders)
     
     # Normalizar los datos
     print("\n[INFO] 🔧 PASO 2: Normalizando datos...")
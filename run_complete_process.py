@@ -7,82 +7,76 @@ EJECUTOR DEL PROCESO COMPLETO DE WEB SCRAPING
 
 Este script ejecuta el proceso completo de:
 1. Web scraping de todas las tiendas
-2. Normalización de datos
+2. Normalización de datos (y deltas de precios contra el snapshot anterior)
 3. Subida a SharePoint
 
 Ejecutar con: python ejecutar_proceso_completo.py
 """
 
 import os
-import subprocess
 import json
 from datetime import datetime
-from normalize_data import DataNormalizer
+from normalize_data import scrap_file
+from parallel_normalize import normalizar_tiendas
+from price_delta import calcular_deltas
+from price_history import registrar_ejecucion
+from compare_prices import comparar_tiendas
+from excel_report import generar_reporte
+from crawl_engine import ejecutar_spiders, mostrar_resumen
 
 # Intentar importar connect_microsoft, pero continuar si no está disponible
 try:
-    from connect_microsoft import subir_archivos_normalizados
+    from connect_microsoft import subir_archivos_normalizados, subir_reporte_comparacion
     SHAREPOINT_DISPONIBLE = True
 except ImportError:
     print("ADVERTENCIA: Modulo de SharePoint no disponible. Se omitira la subida.")
     SHAREPOINT_DISPONIBLE = False
 
-def ejecutar_spider(spider_name):
-    """Ejecuta un spider específico y guarda los resultados en JSON"""
-    try:
-        # Ruta del archivo de salida
-        output_path = f"price_comparison/results_scrap/{spider_name}.json"
-        # Borrar el archivo si existe antes de ejecutar el spider
-        if os.path.exists(output_path):
-            os.remove(output_path)
-        # Crear el comando para ejecutar el spider
-        comando = f"scrapy crawl {spider_name} -o results_scrap/{spider_name}.json"
-        # Ejecutar el comando
-        print(f"🕷️ Ejecutando spider: {spider_name}")
-        resultado = subprocess.run(comando, shell=True, capture_output=True, text=True, cwd="price_comparison")
-        if resultado.returncode == 0:
-            print(f"[OK] Spider {spider_name} ejecutado exitosamente")
-            return True
-        else:
-            print(f"[ERROR] Error al ejecutar spider {spider_name}:")
-            print(resultado.stderr)
-            return False
-    except Exception as e:
-        print(f"[ERROR] Error inesperado al ejecutar spider {spider_name}: {str(e)}")
-        return False
-
-def normalizar_datos():
-    """Normaliza todos los datos después del scraping"""
+def normalizar_datos(tiendas, tiendas_normalizadas=None):
+    """Normaliza los datos de las tiendas scrapeadas en esta ejecución
+    
+    Las tiendas de `tiendas_normalizadas` ya se normalizaron en streaming durante
+    el crawling (NormalizationPipeline) y solo se suman a la cuenta. Devuelve
+    (éxito, total de productos, tiendas cuyo normalizado corresponde a esta ejecución).
+    """
+    tiendas_normalizadas = tiendas_normalizadas or {}
     try:
         print("\n[INFO] Iniciando normalizacion de datos...")
-        normalizer = DataNormalizer()
-        
-        # Configuración de archivos
-        stores = {
-            'clevercel': 'price_comparison/results_scrap/clevercel.json',
-            'itech': 'price_comparison/results_scrap/itech.json',
-            'phoneelectric': 'price_comparison/results_scrap/phoneelectric.json',
-            'tooho': 'price_comparison/results_scrap/tooho.json',
-            'celudmovil': 'price_comparison/results_scrap/celudmovil.json',
-            'celetiene': 'price_comparison/results_scrap/celetiene.json',
-            'celucambio': 'price_comparison/results_scrap/celucambio.json'
-        }
         
         total_products = 0
+        actualizadas = []
+        pendientes = {}
         
-        for store_name, input_file in stores.items():
-            if os.path.exists(input_file):
-                output_file = f'price_comparison/results_normalized/{store_name}_normalized.json'
-                count = normalizer.normalize_store_data(input_file, output_file)
-                total_products += count
+        for store_name in tiendas:
+            input_file = scrap_file(store_name)
+            if store_name in tiendas_normalizadas:
+                print(f"[OK] {store_name}: {tiendas_normalizadas[store_name]} productos normalizados durante el scraping")
+                total_products += tiendas_normalizadas[store_name]
+                actualizadas.append(store_name)
+            elif os.path.exists(input_file):
+                pendientes[store_name] = input_file
             else:
                 print(f"[ADVERTENCIA] Archivo no encontrado: {input_file}")
         
+        # El resto de tiendas se normaliza en paralelo (NORMALIZE_WORKERS procesos)
+        if pendientes:
+            resultados = normalizar_tiendas(pendientes, 'price_comparison/results_normalized')
+            for store_name, resultado in resultados.items():
+                if resultado['error'] is not None:
+                    print(f"[ERROR] {store_name}: {resultado['error']}")
+                elif resultado['total'] == 0:
+                    # Feed vacío: se conservó el normalizado anterior, que no es de esta ejecución
+                    print(f"[ADVERTENCIA] {store_name}: feed vacío, se conserva el normalizado anterior "
+                          f"(sin deltas ni historial)")
+                else:
+                    total_products += resultado['productos']
+                    actualizadas.append(store_name)
+        
         print(f"[OK] Normalizacion completada! Total: {total_products} productos")
-        return True, total_products
+        return True, total_products, actualizadas
     except Exception as e:
         print(f"[ERROR] Error durante la normalizacion: {str(e)}")
-        return False, 0
+        return False, 0, []
 
 def mostrar_estadisticas():
     """Muestra estadísticas detalladas de los archivos normalizados"""
@@ -150,11 +144,11 @@ def verificar_archivos_entrada():
         print(f"[ERROR] Carpeta no encontrada: {carpeta_scrap}")
         return False
     
-    archivos_requeridos = ['clevercel.json', 'itech.json', 'phoneelectric.json', 'tooho.json', 'celudmovil.json']
+    archivos_requeridos = ['clevercel', 'itech', 'phoneelectric', 'tooho', 'celudmovil']
     archivos_encontrados = []
     
     for archivo in archivos_requeridos:
-        ruta_archivo = os.path.join(carpeta_scrap, archivo)
+        ruta_archivo = scrap_file(archivo, carpeta_scrap)
         if os.path.exists(ruta_archivo):
             archivos_encontrados.append(archivo)
         else:
@@ -185,11 +179,10 @@ def main():
     print("\n[PASO 1: EJECUTANDO WEB SCRAPING]")
     print("-" * 40)
     
-    spiders_exitosos = 0
-    for i, spider in enumerate(spiders, 1):
-        print(f"\n[{i}/{len(spiders)}] {spider.upper()}")
-        if ejecutar_spider(spider):
-            spiders_exitosos += 1
+    # Todos los spiders corren a la vez en un solo reactor
+    resultados_spiders = ejecutar_spiders(spiders)
+    mostrar_resumen(resultados_spiders)
+    spiders_exitosos = sum(1 for r in resultados_spiders.values() if r["exitoso"])
     
     print(f"\n[OK] Scraping completado: {spiders_exitosos}/{len(spiders)} spiders exitosos")
     
@@ -206,7 +199,14 @@ def main():
     print("\n[PASO 2: NORMALIZANDO DATOS]")
     print("-" * 40)
     
-    exito_normalizacion, total_productos = normalizar_datos()
+    tiendas_normalizadas = {
+        spider: resultado["normalizados"]
+        for spider, resultado in resultados_spiders.items()
+        if resultado["exitoso"] and resultado["normalizados"] is not None
+    }
+    # Las tiendas cuyo spider falló conservan su normalizado anterior y no entran a deltas
+    spiders_ok = [spider for spider, resultado in resultados_spiders.items() if resultado["exitoso"]]
+    exito_normalizacion, total_productos, tiendas_actualizadas = normalizar_datos(spiders_ok, tiendas_normalizadas)
     
     if not exito_normalizacion:
         print("[ERROR] Error en la normalizacion. Abortando proceso.")
@@ -215,6 +215,31 @@ def main():
     # Mostrar estadísticas detalladas
     total_productos = mostrar_estadisticas()
     
+    # Cambios contra el snapshot anterior de cada tienda actualizada en esta ejecución (results_delta/)
+    print("\n[INFO] Calculando deltas de precios...")
+    calcular_deltas(tiendas_actualizadas)
+    
+    # Precios de esta ejecución al historial (price_history.sqlite): un normalizado viejo quedaría como precio de hoy
+    try:
+        registrar_ejecucion(tiendas_actualizadas)
+    except Exception as e:
+        print(f"[ADVERTENCIA] No se pudo actualizar el historial de precios: {str(e)}")
+    
+    # Matriz producto × tienda (results_comparison/) y su reporte Excel
+    print("\n[INFO] Comparando precios entre tiendas...")
+    matriz = None
+    reporte = None
+    try:
+        matriz = comparar_tiendas()
+    except Exception as e:
+        print(f"[ADVERTENCIA] No se pudo generar la comparación de precios: {str(e)}")
+    if matriz is not None:
+        # El reporte reutiliza la matriz: no se vuelven a cargar ni a emparejar los normalizados
+        try:
+            reporte = generar_reporte(matriz=matriz)
+        except Exception as e:
+            print(f"[ADVERTENCIA] No se pudo generar el reporte Excel: {str(e)}")
+    
     # PASO 3: Subir a SharePoint (opcional)
     if SHAREPOINT_DISPONIBLE:
         print("\n[PASO 3: SUBIENDO A SHAREPOINT]")
@@ -225,6 +250,8 @@ def main():
                 print("[OK] Archivos subidos exitosamente a SharePoint")
             else:
                 print("[ADVERTENCIA] Algunos archivos no se pudieron subir a SharePoint")
+            if reporte:
+                subir_reporte_comparacion(reporte)
         except Exception as e:
             print(f"[ERROR] Error al subir a SharePoint: {str(e)}")
             print("[INFO] Los archivos estan disponibles localmente en results_normalized/")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CRAWLING FRAGMENTADO (SHARDING)
+===============================
+
+Reparte los start_urls/colecciones de un spider grande (ej: phoneelectric con
+24 colecciones) entre N procesos worker. Los workers comparten una base SQLite
+que hace de cola de colecciones y de almacén de fingerprints, así que cada
+colección la procesa un solo worker y ninguna página se descarga dos veces.
+Al final los feeds parciales se combinan en results_scrap/<spider>.jsonl.
+
+Para repartir entre máquinas, todas deben ver la misma base y la carpeta
+results_scrap/shards (carpeta compartida) y lanzar workers con --solo-worker
+y un --worker-id distinto. Cuando terminen, --combinar une todos los parciales.
+
+Las colecciones de un worker caído vuelven solas a la cola cuando llevan
+SHARD_CLAIM_TIMEOUT segundos sin latido. Para no esperar, --liberar <worker-id>
+las devuelve ya (--liberar sin id: todas las que están sin latido).
+
+Ejecutar con:
+    python sharded_crawl.py phoneelectric --workers 4
+    python sharded_crawl.py phoneelectric --solo-worker --worker-id nodo2 --db /compartido/shards.sqlite
+    python sharded_crawl.py phoneelectric --combinar
+    python sharded_crawl.py phoneelectric --liberar nodo2 --db /compartido/shards.sqlite
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from crawl_engine import PROYECTO_SCRAPY, CARPETA_SCRAP, obtener_configuracion
+from normalize_data import iter_json_records
+
+CARPETA_SHARDS = os.path.join(CARPETA_SCRAP, "shards")
+DB_POR_DEFECTO = os.path.join(CARPETA_SHARDS, "shards.sqlite")
+
+# Cada cuánto se revisa si algún worker terminó (segundos)
+INTERVALO_SONDEO = 0.5
+# Workers de reemplazo por cada worker lanzado al inicio, para colecciones que quedaron sin procesar
+REEMPLAZOS_POR_WORKER = 2
+
+
+def _store(db_path):
+    """Abre la base compartida de sharding"""
+    if PROYECTO_SCRAPY not in sys.path:
+        sys.path.insert(0, PROYECTO_SCRAPY)
+    from price_comparison.sharding import ShardStore
+    return ShardStore(db_path)
+
+
+def obtener_start_urls(spider_name):
+    """Lee los start_urls declarados en la clase del spider"""
+    from scrapy.spiderloader import get_spider_loader
+
+    spider_cls = get_spider_loader(obtener_configuracion()).load(spider_name)
+    return list(spider_cls.start_urls)
+
+
+def ruta_parcial(spider_name, worker_id):
+    """Ruta del feed parcial que escribe un worker"""
+    return os.path.join(CARPETA_SHARDS, f"{spider_name}_{worker_id}.jsonl")
+
+
+def parciales_de(spider_name):
+    """Feeds parciales de todos los workers (locales o remotos) de un spider"""
+    return sorted(glob.glob(os.path.join(CARPETA_SHARDS, f"{spider_name}_*.jsonl")))
+
+
+def lanzar_worker(spider_name, db_path, worker_id):
+    """Lanza un worker `scrapy crawl` que toma colecciones de la cola compartida"""
+    salida = ruta_parcial(spider_name, worker_id)
+    # El log va a archivo: con varios workers un PIPE lleno bloquearía al proceso
+    log = open(os.path.join(CARPETA_SHARDS, f"{spider_name}_{worker_id}.log"), "w", encoding="utf-8")
+    comando = [
+        sys.executable, "-m", "scrapy", "crawl", spider_name,
+        "-s", f"SHARD_DB={db_path}",
+        "-s", f"SHARD_WORKER={worker_id}",
+        # Cada worker solo ve una parte de la tienda: se normaliza el feed combinado
+        "-s", "NORMALIZE_IN_PIPELINE=False",
+        "-O", Path(salida).as_uri() + ":jsonlines"
+    ]
+    proceso = subprocess.Popen(comando, cwd=PROYECTO_SCRAPY, stdout=subprocess.DEVNULL, stderr=log)
+    proceso.log_path = log.name
+    log.close()
+    return proceso
+
+
+def esperar_worker(proceso, worker_id):
+    """Espera a un worker y muestra el final de su log si falló"""
+    proceso.wait()
+    if proceso.returncode != 0:
+        print(f"[ERROR] Worker {worker_id} terminó con código {proceso.returncode} (log: {proceso.log_path})")
+        with open(proceso.log_path, "r", encoding="utf-8", errors="replace") as f:
+            print(f.read()[-2000:])
+    return proceso.returncode == 0
+
+
+def combinar_parciales(parciales, salida):
+    """Combina los feeds parciales (JSON Lines) en un único feed por tienda, línea a línea"""
+    total = 0
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f_out:
+        for parcial in parciales:
+            if not os.path.exists(parcial):
+                continue
+            for producto in iter_json_records(parcial):
+                f_out.write(json.dumps(producto, ensure_ascii=False))
+                f_out.write("\n")
+                total += 1
+    return total
+
+
+def ejecutar_spider_fragmentado(spider_name, workers=4, db_path=DB_POR_DEFECTO):
+    """Ejecuta un spider repartido entre `workers` procesos y combina los resultados"""
+    os.makedirs(CARPETA_SHARDS, exist_ok=True)
+    inicio = time.time()
+
+    # Preparar la cola: una entrada por colección
+    store = _store(db_path)
+    store.reset(spider_name)
+    start_urls = obtener_start_urls(spider_name)
+    store.seed(spider_name, start_urls)
+    print(f"🧩 {spider_name}: {len(start_urls)} colecciones repartidas entre {workers} workers")
+
+    for parcial in parciales_de(spider_name):
+        os.remove(parcial)
+
+    procesos = {}
+    for i in range(workers):
+        procesos[str(i)] = lanzar_worker(spider_name, db_path, str(i))
+    siguiente_id = workers
+    reemplazos = workers * REEMPLAZOS_POR_WORKER
+
+    # Sondeo de todos los workers: las colecciones que un worker deja reclamadas vuelven a la cola en
+    # cuanto termina, y mientras queden colecciones sin terminar se lanzan reemplazos
+    # (cada worker sale apenas la cola no le da más, así que nadie más las tomaría)
+    workers_ok = 0
+    workers_fallidos = 0
+    while True:
+        for worker_id, proceso in list(procesos.items()):
+            if proceso.poll() is None:
+                continue
+            del procesos[worker_id]
+            if esperar_worker(proceso, worker_id):
+                workers_ok += 1
+            else:
+                workers_fallidos += 1
+            liberadas = store.release(spider_name, worker_id)
+            if liberadas:
+                print(f"[ADVERTENCIA] {liberadas} colecciones del worker {worker_id} devueltas a la cola")
+
+        progreso = store.progress(spider_name)
+        if not progreso.get("pending") and not progreso.get("claimed"):
+            break
+        if not procesos and not progreso.get("pending"):
+            # Solo quedan colecciones reclamadas por workers de otras máquinas: esperar a
+            # que terminen o a que pasen SHARD_CLAIM_TIMEOUT sin latido
+            store.release(spider_name, older_than=store.claim_timeout)
+        elif progreso.get("pending") and len(procesos) < workers:
+            if reemplazos == 0:
+                if not procesos:
+                    break
+            else:
+                reemplazos -= 1
+                worker_id = str(siguiente_id)
+                siguiente_id += 1
+                print(f"🔁 {progreso['pending']} colecciones pendientes: se lanza el worker de reemplazo {worker_id}")
+                procesos[worker_id] = lanzar_worker(spider_name, db_path, worker_id)
+        time.sleep(INTERVALO_SONDEO)
+
+    # Si quedan workers (sin reemplazos y con colecciones de otras máquinas), se esperan igual
+    for worker_id, proceso in procesos.items():
+        if esperar_worker(proceso, worker_id):
+            workers_ok += 1
+        else:
+            workers_fallidos += 1
+
+    progreso = store.progress(spider_name)
+    store.close()
+    completo = set(progreso) <= {"done"}
+
+    salida = os.path.join(CARPETA_SCRAP, f"{spider_name}.jsonl")
+    items = combinar_parciales(parciales_de(spider_name), salida)
+    duracion = time.time() - inicio
+
+    print(f"[{'OK' if completo else 'ERROR'}] Spider {spider_name} fragmentado: "
+          f"{items} productos de {workers_ok}/{workers_ok + workers_fallidos} workers en {duracion:.1f}s "
+          f"(cola: {progreso})")
+    if not completo:
+        sin_terminar = sum(cantidad for estado, cantidad in progreso.items() if estado != "done")
+        print(f"[ERROR] {sin_terminar} colecciones sin terminar: el feed combinado está incompleto")
+
+    return {
+        "exitoso": completo,
+        "items": items,
+        "workers": workers_ok + workers_fallidos,
+        "duracion": duracion,
+        "cola": progreso
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawling fragmentado de un spider entre varios workers")
+    parser.add_argument("spider", help="Nombre del spider (ej: phoneelectric)")
+    parser.add_argument("--workers", type=int, default=4, help="Número de procesos worker")
+    parser.add_argument("--db", default=DB_POR_DEFECTO, help="Base SQLite compartida")
+    parser.add_argument("--solo-worker", action="store_true",
+                        help="Lanzar solo un worker contra una cola ya preparada (otra máquina)")
+    parser.add_argument("--worker-id", default="0", help="Identificador del worker con --solo-worker")
+    parser.add_argument("--combinar", action="store_true",
+                        help="Solo combinar los feeds parciales existentes en results_scrap/<spider>.jsonl")
+    parser.add_argument("--liberar", nargs="?", const="", metavar="WORKER_ID",
+                        help="Devolver a la cola las colecciones de un worker caído (sin id: las que no tienen latido)")
+    args = parser.parse_args()
+
+    if args.liberar is not None:
+        store = _store(args.db)
+        if args.liberar:
+            liberadas = store.release(args.spider, args.liberar)
+        else:
+            liberadas = store.release(args.spider, older_than=store.claim_timeout)
+        print(f"[OK] {liberadas} colecciones devueltas a la cola (cola: {store.progress(args.spider)})")
+        store.close()
+        return
+
+    if args.combinar:
+        salida = os.path.join(CARPETA_SCRAP, f"{args.spider}.jsonl")
+        items = combinar_parciales(parciales_de(args.spider), salida)
+        print(f"[OK] {items} productos combinados en {salida}")
+        return
+
+    if args.solo_worker:
+        os.makedirs(CARPETA_SHARDS, exist_ok=True)
+        proceso = lanzar_worker(args.spider, args.db, args.worker_id)
+        exitoso = esperar_worker(proceso, args.worker_id)
+        print(f"Feed parcial: {ruta_parcial(args.spider, args.worker_id)}")
+        sys.exit(0 if exitoso else 1)
+
+    resultado = ejecutar_spider_fragmentado(args.spider, args.workers, args.db)
+    sys.exit(0 if resultado["exitoso"] else 1)
+
+
+if __name__ == "__main__":
+    main()
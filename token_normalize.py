@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MOTOR DE NORMALIZACIÓN POR TOKENS
+=================================
+
+TokenNormalizer produce exactamente los mismos campos que DataNormalizer, pero
+sin la cadena de re.sub: el nombre se parte una sola vez en tokens separados
+por espacios y cada paso de la normalización es una pasada sobre esa lista.
+
+Camino rápido: nombres cuyos tokens son palabras enteras ([A-Z0-9]+) o signos
+sueltos ('-', '|', '+'...). Ahí cada \\b de las regex originales cae justo en
+el borde de un token, \\s+ es el espacio entre dos tokens seguidos y quitar una
+palabra es sacar un token de la lista. Los guiones se separan con espacios al
+tokenizar: ninguna regex de condición cruza un guion, así que da lo mismo
+hacerlo antes que después.
+
+- Nombres ASCII: ni NFD ni unicodedata, solo upper().
+- Nombres con tildes: NFD + str.translate con la tabla de marcas diacríticas.
+- Nombres con signos pegados a palabras ('6+128GB', '3.5MM'), paréntesis o
+  caracteres que no son ASCII: se normalizan con el motor de regex.
+
+Se activa con NORMALIZE_ENGINE=tokens (ver normalize_data.create_normalizer).
+
+Comprobar que ambos motores coinciden (y cuánto más rápido es) sobre los feeds:
+    python token_normalize.py [feed1.jsonl feed2.json ...]
+"""
+
+import argparse
+import contextlib
+import glob
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from normalize_data import COMBINING_MARKS, SCRAP_FOLDER, DataNormalizer, iter_json_records
+
+# Un signo pegado a una palabra (o a otro signo), "_" o paréntesis: el nombre no es apto
+RE_MIXED_TOKEN = re.compile(r'[A-Z0-9][^A-Z0-9 ]|[^A-Z0-9 ][A-Z0-9]|[^A-Z0-9 ]{2}|[_()]')
+
+
+def _words(*words):
+    return frozenset(words)
+
+
+# Equivalente por tokens de cada regex de DataNormalizer.condition_patterns: lista
+# de alternativas, cada una con sus pasos (tokens aceptados, opcional). Entre dos
+# tokens seguidos hay exactamente un espacio, así que \s+ no necesita paso propio y
+# el caso sin espacio de \s* es la palabra unida (SEMINUEVO). Una regex nueva en la
+# tabla sin su equivalente aquí hace fallar la construcción del motor.
+CONDITION_TOKEN_PATTERNS = {
+    r'\b(COMO\s+NUEVO)\b': [[(_words('COMO'), False), (_words('NUEVO'), False)]],
+    r'\b(SEMI\s*NUEVO)\b': [[(_words('SEMI'), False), (_words('NUEVO'), False)],
+                            [(_words('SEMINUEVO'), False)]],
+    r'\b(SEMINUEVO)\b': [[(_words('SEMINUEVO'), False)]],
+    r'\bDE\s+EXH\s*PREMIUM\b': [[(_words('DE'), False), (_words('EXH'), False), (_words('PREMIUM'), False)],
+                                [(_words('DE'), False), (_words('EXHPREMIUM'), False)]],
+    r'\bDE\s+EXH\b': [[(_words('DE'), False), (_words('EXH'), False)]],
+    r'\bEXH\s*PREMIUM\b': [[(_words('EXH'), False), (_words('PREMIUM'), False)],
+                           [(_words('EXHPREMIUM'), False)]],
+    r'\bEXH\b': [[(_words('EXH'), False)]],
+    r'\b(USADO)\b': [[(_words('USADO'), False)]],
+    r'\b(OUTLET)\b': [[(_words('OUTLET'), False)]],
+    r'\b(NUEVO)\s+DUAL\b': [[(_words('NUEVO'), False), (_words('DUAL'), False)]],
+    r'\b(NUEVO)\b': [[(_words('NUEVO'), False)]]
+}
+
+# \b(OTRAS\s*-?\s*MARCAS?)\b y \b(OTRAS)\s*-\s*(MARCAS?)\b
+OTRAS_MARCAS_PATTERN = [
+    [(_words('OTRAS'), False), (_words('-'), True), (_words('MARCA', 'MARCAS'), False)],
+    [(_words('OTRASMARCA', 'OTRASMARCAS'), False)]
+]
+OTRAS_MARCAS_DASH_PATTERN = [
+    [(_words('OTRAS'), False), (_words('-'), False), (_words('MARCA', 'MARCAS'), False)]
+]
+
+# \b(S\s*-?\s*FIS)\b y \b(E\s*-?\s*SIM)\b
+SIM_FIS_PATTERN = [
+    [(_words('S'), False), (_words('-'), True), (_words('FIS'), False)],
+    [(_words('SFIS'), False)]
+]
+E_SIM_PATTERN = [
+    [(_words('E'), False), (_words('-'), True), (_words('SIM'), False)],
+    [(_words('ESIM'), False)]
+]
+
+# \+\s*6\b (con el "+" suelto, el 6 siempre es el token siguiente)
+PLUS_SIX_PATTERN = [[(_words('+'), False), (_words('6'), False)]]
+
+
+def _drop(tokens, words):
+    """Quita las palabras de `words` (como \\b(?:A|B)\\b con re.sub)"""
+    if words.isdisjoint(tokens):
+        return tokens
+    return [token for token in tokens if token not in words]
+
+
+def _match(tokens, i, steps):
+    """Fin de la coincidencia de `steps` desde el token i, o 0 si no coincide"""
+    n = len(tokens)
+    for accepted, optional in steps:
+        if i < n and tokens[i] in accepted:
+            i += 1
+        elif not optional:
+            return 0
+    return i
+
+
+def _first_words(alternatives):
+    return frozenset().union(*(steps[0][0] for steps in alternatives))
+
+
+def _sub(tokens, alternatives, first_words):
+    """Quita todas las coincidencias de un patrón, de izquierda a derecha (re.subn)"""
+    if first_words.isdisjoint(tokens):
+        return tokens, 0
+    kept = []
+    count = 0
+    last = 0
+    for i, token in enumerate(tokens):
+        if i < last or token not in first_words:
+            continue
+        for steps in alternatives:
+            end = _match(tokens, i, steps)
+            if end:
+                kept.extend(tokens[last:i])
+                count += 1
+                last = end
+                break
+    if not count:
+        return tokens, 0
+    kept.extend(tokens[last:])
+    return kept, count
+
+
+class _KeywordFlags(dict):
+    """Token → 2 si contiene una palabra de non_mobile_keywords, 1 si de mobile_keywords, 0 si ninguna"""
+
+    def __init__(self, mobile_keywords, non_mobile_keywords):
+        super().__init__()
+        self.mobile_keywords = mobile_keywords
+        self.non_mobile_keywords = non_mobile_keywords
+
+    def __missing__(self, token):
+        if any(keyword in token for keyword in self.non_mobile_keywords):
+            flag = 2
+        elif any(keyword in token for keyword in self.mobile_keywords):
+            flag = 1
+        else:
+            flag = 0
+        self[token] = flag
+        return flag
+
+
+class TokenNormalizer(DataNormalizer):
+    """DataNormalizer con normalize_fields por tokens (mismos resultados, una sola tokenización)"""
+
+    profile_stages = [
+        'normalize_product', 'normalize_fields', 'tokenize', 'token_brand', 'token_condition',
+        'token_sim_type', 'token_storage', 'token_final_name', 'token_unwanted_words'
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compile_token_tables()
+
+    def _compile_token_tables(self):
+        """Traduce las tablas de reglas a conjuntos de palabras y patrones por tokens"""
+        self.token_condition_patterns = []
+        for pattern, condition, literal in self.condition_patterns:
+            alternatives = CONDITION_TOKEN_PATTERNS[pattern]
+            # Patrones de una sola palabra: basta con quitarla
+            single = all(len(steps) == 1 for steps in alternatives)
+            self.token_condition_patterns.append((alternatives, _first_words(alternatives), single, condition, literal))
+        self.condition_words = frozenset().union(*(
+            accepted for alternatives in CONDITION_TOKEN_PATTERNS.values()
+            for steps in alternatives for accepted, _ in steps
+        ))
+        self.otras_marcas_first = _first_words(OTRAS_MARCAS_PATTERN)
+        self.sim_fis_first = _first_words(SIM_FIS_PATTERN)
+        self.e_sim_first = _first_words(E_SIM_PATTERN)
+        self.plus_six_first = _first_words(PLUS_SIX_PATTERN)
+
+        # Detección de marca: patrones de una palabra por token, los de varias como subcadena
+        self.brand_word_rank = {}
+        self.brand_phrase_rank = []
+        for pattern, rank in self.brand_rank.items():
+            if ' ' in pattern.strip():
+                self.brand_phrase_rank.append((pattern, rank))
+            elif pattern.strip() == pattern[1:-1]:
+                self.brand_word_rank[pattern.strip()] = rank
+            # Patrones con espacios de más ('MI ') nunca coinciden en un nombre ya limpio
+
+        # Las palabras clave de móvil solo pueden estar dentro de un token
+        if not all(keyword.isalnum() for keyword in self.mobile_keywords + self.non_mobile_keywords):
+            raise ValueError("mobile_keywords/non_mobile_keywords solo admiten letras y números en el motor de tokens")
+        self.keyword_flags = _KeywordFlags(self.mobile_keywords, self.non_mobile_keywords)
+
+        self.storage_words = frozenset(self.storage_values)
+        self.storage_and_ram_words = frozenset(self.storage_values + self.ram_values)
+        self.network_words = frozenset(['4G', '5G', 'LTE', '3G', '2G'])
+        self.sfis_esim_and_colors = frozenset(['SFIS', 'ESIM'] + self.colors_to_remove)
+        self.unwanted_and_separators = frozenset(self.unwanted_words + ['-', '|'])
+        self.unwanted_and_separators_de = frozenset(self.unwanted_words + ['DE', '-', '|'])
+        self.final_word_set = frozenset(self.final_words_to_clean)
+        self.dual_words = frozenset(['DUAL'])
+        self.audifonos_words = frozenset(['AUDIFONOS'])
+        self.celular_words = frozenset(['CELULAR', 'CELULARES'])
+        self.brand_duplication_words = {}
+
+    def tokenize(self, name):
+        """(nombre limpio como clean_name, tokens con los guiones separados), o None si no es apto"""
+        if name.isascii():
+            upper = name.upper()
+        else:
+            upper = unicodedata.normalize('NFD', name).translate(COMBINING_MARKS).upper()
+            if not upper.isascii():
+                return None
+
+        text = ' '.join(upper.split())
+        if 'EXH' in text:
+            text = self.re_exh.sub('SEMINUEVO', text)
+        spaced = text.replace('-', ' - ') if '-' in text else text
+        if RE_MIXED_TOKEN.search(spaced):
+            return None
+        return text, spaced.split()
+
+    def token_is_mobile(self, tokens):
+        """is_mobile_device sobre tokens"""
+        return max(map(self.keyword_flags.__getitem__, tokens), default=0) == 1
+
+    def token_brand(self, text, brand_hint):
+        """extract_brand sobre el nombre ya limpio"""
+        if brand_hint:
+            brand_upper = brand_hint.upper()
+            if brand_upper != 'UNKNOWN':
+                return self.brand_mapping.get(brand_upper, brand_upper)
+            return self.token_detect_brand(text) or None
+        return self.token_detect_brand(text) or ""
+
+    def token_detect_brand(self, text):
+        """detect_brand_from_product_name: marcas implícitas y luego patrones en orden de prioridad"""
+        for product_key, brand in self.implicit_brands.items():
+            if product_key in text:
+                return brand
+
+        # ' PATRON ' in ' NOMBRE ': cuenta la palabra entre espacios del nombre sin separar guiones
+        ranked = [self.brand_word_rank[word] for word in text.split(' ') if word in self.brand_word_rank]
+        if self.brand_phrase_rank:
+            padded = f' {text} '
+            ranked += [rank for pattern, rank in self.brand_phrase_rank if pattern in padded]
+        if ranked:
+            return min(ranked)[1]
+        return None
+
+    def token_condition(self, text, tokens):
+        """extract_condition_with_priority: (condición, tokens sin condición)"""
+        found_conditions = set()
+        if not self.condition_words.isdisjoint(tokens):
+            for alternatives, first_words, single, condition, literal in self.token_condition_patterns:
+                if literal not in text or first_words.isdisjoint(tokens):
+                    continue
+                if single:
+                    tokens = _drop(tokens, first_words)
+                    found_conditions.add(condition)
+                    continue
+                tokens, matches = _sub(tokens, alternatives, first_words)
+                if matches:
+                    found_conditions.add(condition)
+
+            if 'NUEVO' in found_conditions:
+                tokens = _drop(tokens, self.dual_words)
+
+        # ^[\s\-]+|[\s\-]+$
+        if tokens and (tokens[0] == '-' or tokens[-1] == '-'):
+            start = 0
+            end = len(tokens)
+            while start < end and tokens[start] == '-':
+                start += 1
+            while end > start and tokens[end - 1] == '-':
+                end -= 1
+            tokens = tokens[start:end]
+
+        if not found_conditions:
+            return "NUEVO", tokens
+        return max(found_conditions, key=lambda x: self.condition_rank.get(x, 0)), tokens
+
+    def token_sim_type(self, tokens):
+        """extract_sim_type: (tipo de SIM, tokens)"""
+        if not tokens or not self.token_is_mobile(tokens):
+            return "", tokens
+
+        text = ' '.join(tokens)
+        for sim_type, patterns in self.sim_patterns.items():
+            for pattern in patterns:
+                if pattern in text:
+                    return sim_type, self.re_sim_patterns[pattern].sub('', text).split()
+        return "SIM FISICA", tokens
+
+    def token_storage(self, tokens):
+        """extract_storage_capacity: (capacidad, tokens); la RAM solo se quita si hay almacenamiento"""
+        if self.storage_words.isdisjoint(tokens):
+            return "", tokens
+
+        storage_matches = [token for token in tokens if token in self.storage_words]
+        storage = max(
+            enumerate(storage_matches),
+            key=lambda item: (self.storage_priority[item[1]], item[0])
+        )[1]
+        return self.normalize_capacity(storage), _drop(tokens, self.storage_and_ram_words)
+
+    def token_unwanted_words(self, tokens):
+        """clean_unwanted_words sobre tokens, en el mismo orden de pasos
+
+        Con los signos sueltos las regex de RAM (8+, 8+GB) nunca coinciden: necesitan
+        el "+" pegado al número. Quitar palabras nunca une otras dos, así que los
+        pasos que no dependen de is_mobile_device se aplican juntos.
+        """
+        # \bDE\s+EXH: "DE" seguido de una palabra que empieza con EXH
+        keep_de = False
+        if 'DE' in tokens:
+            for i in range(len(tokens) - 1):
+                if tokens[i] == 'DE' and tokens[i + 1].startswith('EXH'):
+                    keep_de = True
+                    break
+        unwanted_words = self.unwanted_and_separators if keep_de else self.unwanted_and_separators_de
+
+        tokens, _ = _sub(tokens, OTRAS_MARCAS_PATTERN, self.otras_marcas_first)
+        tokens, _ = _sub(tokens, OTRAS_MARCAS_DASH_PATTERN, self.otras_marcas_first)
+
+        if 'AIRPODS' in ' '.join(tokens):
+            tokens = _drop(tokens, self.audifonos_words)
+
+        if self.token_is_mobile(tokens):
+            tokens = _drop(tokens, self.celular_words)
+
+        # \b(4G|5G|LTE|3G|2G)\+?\b: un "+" suelto nunca va pegado a la red
+        if not self.network_words.isdisjoint(tokens) and not self.token_is_mobile(tokens):
+            tokens = _drop(tokens, self.network_words)
+
+        tokens, _ = _sub(tokens, SIM_FIS_PATTERN, self.sim_fis_first)
+        tokens, _ = _sub(tokens, E_SIM_PATTERN, self.e_sim_first)
+        tokens = _drop(tokens, self.sfis_esim_and_colors)
+
+        if '+' in tokens and self.token_is_mobile(tokens):
+            tokens, _ = _sub(tokens, PLUS_SIX_PATTERN, self.plus_six_first)
+
+        return _drop(tokens, unwanted_words)
+
+    def token_brand_words(self, brand_upper):
+        """Palabras que remove_brand_duplication y re_final_words quitan, o None si la marca no es una palabra"""
+        if brand_upper not in self.brand_duplication_words:
+            words = [brand_upper]
+            if brand_upper in self.related_brands:
+                words += [submarca for submarca in self.related_brands[brand_upper]
+                          if not (brand_upper == 'APPLE' and submarca in ['IPHONE', 'IPAD', 'MACBOOK', 'AIRPODS'])]
+            simple = all(word.isascii() and word.isalnum() for word in words)
+            self.brand_duplication_words[brand_upper] = frozenset(words) | self.final_word_set if simple else None
+        return self.brand_duplication_words[brand_upper]
+
+    def token_final_name(self, tokens, brand):
+        """clean_final_name: palabras no deseadas, marca duplicada y palabras sueltas"""
+        if not tokens:
+            return ""
+
+        tokens = self.token_unwanted_words(tokens)
+
+        if brand and tokens and brand != 'UNKNOWN':
+            words = self.token_brand_words(brand.upper())
+            if words is not None:
+                return ' '.join(_drop(tokens, words))
+            tokens = self.remove_brand_duplication(' '.join(tokens), brand).split()
+
+        return ' '.join(_drop(tokens, self.final_word_set))
+
+    def normalize_fields(self, name, brand):
+        """normalize_fields por tokens; los nombres no aptos pasan al motor de regex"""
+        if not isinstance(name, str):
+            return super().normalize_fields(name, brand)
+        tokenized = self.tokenize(name)
+        if tokenized is None:
+            return super().normalize_fields(name, brand)
+        text, tokens = tokenized
+
+        # Los filtros finales no dependen del resto: si descartan el producto, no hay nada que calcular
+        original_upper = name.upper()
+        if 'LAMPERT' in original_upper or 'OPEN BOX' in original_upper or 'CPO' in original_upper:
+            return None
+        if not text:
+            return None
+
+        is_seminuevo = 'SEMINUEVO' in text or 'SEMI NUEVO' in text or 'EXH' in text
+        condition, tokens = self.token_condition(text, tokens)
+        if is_seminuevo and condition not in ['SEMINUEVO', 'USADO']:
+            condition = 'SEMINUEVO'
+        if condition not in ['NUEVO', 'SEMINUEVO']:
+            return None
+
+        brand_info = self.token_brand(text, brand)
+        sim_type, tokens = self.token_sim_type(tokens)
+        storage_capacity, tokens = self.token_storage(tokens)
+        final_name = self.token_final_name(tokens, brand_info)
+
+        parts = [part for part in (brand_info, final_name, sim_type, condition, storage_capacity) if part]
+        normalized_name = ' '.join(dict.fromkeys(' '.join(parts).split()))
+        if len(normalized_name) < 3:
+            return None
+
+        return normalized_name, brand_info, condition, sim_type, storage_capacity
+
+
+def compare_engines(names_and_brands, reference=None, candidate=None):
+    """Diferencias entre dos motores: lista de (nombre, marca, esperado, obtenido)"""
+    reference = reference or DataNormalizer(cache_size=0)
+    candidate = candidate or TokenNormalizer(cache_size=0)
+    mismatches = []
+    for name, brand in names_and_brands:
+        if not name:
+            continue
+        expected = reference.normalize_fields(name, brand)
+        got = candidate.normalize_fields(name, brand)
+        if expected != got:
+            mismatches.append((name, brand, expected, got))
+    return mismatches
+
+
+def products_per_second(normalizer, names_and_brands, rounds=3):
+    """Mejor throughput de normalize_fields sobre los pares (nombre, marca) en `rounds` vueltas"""
+    best = None
+    for _ in range(rounds):
+        inicio = time.process_time()
+        for name, brand in names_and_brands:
+            if name:
+                normalizer.normalize_fields(name, brand)
+        duracion = time.process_time() - inicio
+        best = duracion if best is None else min(best, duracion)
+    return len(names_and_brands) / best if best else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar el motor de tokens con el motor de regex")
+    parser.add_argument("feeds", nargs="*", help="Feeds crudos a comparar (por defecto todos los de results_scrap)")
+    parser.add_argument("--vueltas", type=int, default=5, help="Vueltas para medir productos/s")
+    args = parser.parse_args()
+
+    feeds = args.feeds or sorted(glob.glob(os.path.join(SCRAP_FOLDER, '*.json*')))
+    pairs = []
+    for feed in feeds:
+        pairs.extend((product.get('name', ''), product.get('brand', '')) for product in iter_json_records(feed))
+    print(f"🔎 Comparando motores sobre {len(pairs)} productos de {len(feeds)} feeds")
+
+    reference = DataNormalizer(cache_size=0)
+    candidate = TokenNormalizer(cache_size=0)
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        mismatches = compare_engines(pairs, reference, candidate)
+        regex_speed = products_per_second(reference, pairs, args.vueltas)
+        token_speed = products_per_second(candidate, pairs, args.vueltas)
+    fast = sum(1 for name, _ in pairs if isinstance(name, str) and name and candidate.tokenize(name) is not None)
+
+    for name, brand, expected, got in mismatches[:20]:
+        print(f"❌ {name!r} ({brand!r})\n   regex:  {expected}\n   tokens: {got}")
+    print(f"⚡ Camino rápido: {fast}/{len(pairs)} productos ({fast / len(pairs) * 100 if pairs else 0:.0f}%)")
+    print(f"⏱️ regex: {regex_speed:,.0f} productos/s | tokens: {token_speed:,.0f} productos/s "
+          f"({token_speed / regex_speed if regex_speed else 0:.1f}x)")
+    if mismatches:
+        print(f"[ERROR] {len(mismatches)} productos con resultados distintos")
+        sys.exit(1)
+    print("[OK] Ambos motores producen los mismos campos")
+
+
+if __name__ == "__main__":
+    main()